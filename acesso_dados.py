@@ -0,0 +1,247 @@
+# Arquivo responsável pelo acesso (somente leitura) ao banco SQLite de origem (imdb.db)
+# Em vez de cada módulo abrir a sua própria conexão a cada chamada e refazer a
+# introspecção (sqlite_master, pragma_table_info) e o COUNT(*) da tabela inteira:
+# - as conexões ficam num pool compartilhado entre threads, abertas com mode=ro
+#   (o banco nunca é criado nem alterado por engano) e com mmap e cache maiores;
+# - a estrutura do banco e as contagens de linhas ficam em memória e só são
+#   recalculadas quando o banco muda (PRAGMA data_version, ou o arquivo é trocado),
+#   verificado no máximo uma vez a cada INTERVALO_VERIFICACAO_SQLITE_MS;
+# - nomes de tabela são validados contra o próprio banco antes de entrar no SQL.
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+from configuracao import (
+    CAMINHO_BANCO, CONEXOES_LEITURA_SQLITE, MMAP_SQLITE_BYTES, CACHE_SQLITE_KIB,
+    INTERVALO_VERIFICACAO_SQLITE_MS,
+)
+
+# Tempo máximo (segundos) esperando uma conexão livre quando o pool está todo em uso
+ESPERA_CONEXAO = 30
+
+
+def citar_identificador(nome):
+    """Nome de tabela/coluna entre aspas, seguro para compor o SQL (ex.: a"b -> "a""b")."""
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+class _ConexaoLeitura(sqlite3.Connection):
+    """Conexão do pool; geracao indica de qual versão do arquivo ela é."""
+    geracao = 0
+
+
+class PoolLeitura:
+    """
+    Pool de conexões somente leitura a um banco SQLite, com a estrutura do banco
+    e as contagens de linhas em cache.
+
+    Cada conexão é usada por uma thread por vez (adquirir/devolver ou o
+    gerenciador de contexto conexao()). As conexões são abertas sob demanda,
+    até `tamanho`; com todas em uso, quem chega espera uma ser devolvida.
+    """
+
+    def __init__(self, caminho=CAMINHO_BANCO, tamanho=CONEXOES_LEITURA_SQLITE,
+                 mmap_bytes=MMAP_SQLITE_BYTES, cache_kib=CACHE_SQLITE_KIB,
+                 intervalo_verificacao_ms=INTERVALO_VERIFICACAO_SQLITE_MS):
+        self.caminho = caminho
+        self.tamanho = max(1, tamanho)
+        self.mmap_bytes = mmap_bytes
+        self.cache_kib = cache_kib
+        self.intervalo_verificacao = max(0, intervalo_verificacao_ms) / 1000
+        self._livres = queue.LifoQueue()
+        self._trava = threading.Lock()
+        self._abertas = 0
+        # Muda quando o arquivo é trocado (outro inode): conexões antigas são reabertas
+        self._geracao = 0
+        self._identidade_arquivo = None
+        # Conexão dedicada ao PRAGMA data_version (o contador é de cada conexão),
+        # com trava própria: a verificação não bloqueia quem só pega/devolve conexões
+        self._sentinela = None
+        self._trava_sentinela = threading.Lock()
+        # (instante, assinatura) da última verificação, reaproveitada dentro do intervalo
+        self._ultima_verificacao = None
+        self._cache = {}
+        self._assinatura_cache = None
+
+    def _abrir(self):
+        """Abre uma conexão somente leitura com os pragmas de desempenho."""
+        uri = f"file:{quote(os.path.abspath(self.caminho))}?mode=ro"
+        # check_same_thread=False: a conexão troca de thread entre um uso e outro (nunca fica em duas ao mesmo tempo)
+        conexao = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=_ConexaoLeitura)
+        conexao.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+        conexao.execute(f"PRAGMA cache_size = -{int(self.cache_kib)}")
+        conexao.execute("PRAGMA query_only = 1")
+        conexao.geracao = self._geracao
+        return conexao
+
+    def adquirir(self):
+        """
+        Pega uma conexão livre do pool (ou abre uma nova, se ainda houver vaga).
+        Deve ser devolvida com devolver().
+
+        Retorna: Conexão SQLite somente leitura
+        """
+        # Confere se o arquivo foi trocado (nesse caso, as conexões livres são reabertas)
+        self._assinatura()
+        try:
+            conexao = self._livres.get_nowait()
+        except queue.Empty:
+            with self._trava:
+                abrir = self._abertas < self.tamanho
+                self._abertas += 1 if abrir else 0
+            if abrir:
+                try:
+                    return self._abrir()
+                except Exception:
+                    with self._trava:
+                        self._abertas -= 1
+                    raise
+            try:
+                conexao = self._livres.get(timeout=ESPERA_CONEXAO)
+            except queue.Empty:
+                raise TimeoutError(f"Nenhuma conexão livre para {self.caminho} após {ESPERA_CONEXAO}s")
+
+        if conexao.geracao != self._geracao:
+            # Aberta antes de o arquivo ser trocado: enxergaria o banco antigo
+            conexao.close()
+            try:
+                return self._abrir()
+            except Exception:
+                with self._trava:
+                    self._abertas -= 1
+                raise
+        return conexao
+
+    def devolver(self, conexao):
+        """Devolve ao pool uma conexão obtida com adquirir()."""
+        self._livres.put(conexao)
+
+    @contextmanager
+    def conexao(self):
+        """Uso: with banco_leitura.conexao() as conexao: ..."""
+        conexao = self.adquirir()
+        try:
+            yield conexao
+        finally:
+            self.devolver(conexao)
+
+    def _assinatura(self):
+        """
+        Identifica o conteúdo atual do banco: o arquivo (inode) e o PRAGMA data_version
+        da conexão sentinela, que muda quando outra conexão (de qualquer processo)
+        grava no banco. Custa um stat e um PRAGMA, sem ler nenhuma tabela, e é
+        refeita no máximo uma vez por intervalo_verificacao (nas demais chamadas,
+        devolve a última assinatura).
+        """
+        ultima = self._ultima_verificacao
+        if ultima is not None and time.monotonic() - ultima[0] < self.intervalo_verificacao:
+            return ultima[1]
+        with self._trava_sentinela:
+            # Outra thread pode ter verificado enquanto esta esperava a trava
+            ultima = self._ultima_verificacao
+            if ultima is not None and time.monotonic() - ultima[0] < self.intervalo_verificacao:
+                return ultima[1]
+            estado = os.stat(self.caminho)
+            identidade = (estado.st_dev, estado.st_ino)
+            if identidade != self._identidade_arquivo:
+                if self._identidade_arquivo is not None:
+                    with self._trava:
+                        self._geracao += 1
+                if self._sentinela is not None:
+                    self._sentinela.close()
+                self._identidade_arquivo = identidade
+                self._sentinela = self._abrir()
+            versao = self._sentinela.execute("PRAGMA data_version").fetchone()[0]
+            assinatura = (self._geracao, versao)
+            self._ultima_verificacao = (time.monotonic(), assinatura)
+            return assinatura
+
+    def _em_cache(self, chave, calcular):
+        """Resultado de calcular(conexao) guardado até o banco mudar."""
+        assinatura = self._assinatura()
+        with self._trava:
+            if assinatura != self._assinatura_cache:
+                self._cache = {}
+                self._assinatura_cache = assinatura
+            if chave in self._cache:
+                return self._cache[chave]
+        with self.conexao() as conexao:
+            valor = calcular(conexao)
+        with self._trava:
+            if assinatura == self._assinatura_cache:
+                self._cache[chave] = valor
+        return valor
+
+    def listar_tabelas(self):
+        """Retorna: Nomes das tabelas, na ordem do sqlite_master"""
+        return list(self._em_cache("tabelas", lambda conexao: [
+            linha[0] for linha in conexao.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        ]))
+
+    def validar_tabela(self, nome_tabela):
+        """Retorna o nome se a tabela existir; senão lança ValueError (nunca vai para o SQL)."""
+        if nome_tabela not in self.listar_tabelas():
+            raise ValueError(f"Tabela inexistente: {nome_tabela}")
+        return nome_tabela
+
+    def colunas_tabela(self, nome_tabela):
+        """
+        Colunas da tabela, como no PRAGMA table_info.
+
+        Retorna: Lista de tuplas (cid, nome, tipo, notnull, valor_padrao, pk)
+        """
+        self.validar_tabela(nome_tabela)
+        return list(self._em_cache(("colunas", nome_tabela), lambda conexao: conexao.execute(
+            "SELECT cid, name, type, \"notnull\", dflt_value, pk FROM pragma_table_info(?)", (nome_tabela,)
+        ).fetchall()))
+
+    def contar_registros(self, nome_tabela):
+        """Quantidade de linhas da tabela (o COUNT(*) só roda de novo se o banco mudar)."""
+        nome = citar_identificador(self.validar_tabela(nome_tabela))
+        return self._em_cache(("registros", nome_tabela), lambda conexao: conexao.execute(
+            f"SELECT COUNT(*) FROM {nome}"
+        ).fetchone()[0])
+
+    def estrutura(self):
+        """
+        Estrutura do banco: bancos anexados, tabelas e colunas/tipos de todas as tabelas.
+
+        Retorna: Tupla (database_list, tabelas, colunas_tipos) — listas de tuplas
+        """
+        def calcular(conexao):
+            nome_database = conexao.execute("PRAGMA database_list").fetchall()
+            nome_tabelas = conexao.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+            # pragma_table_info em um JOIN para evitar loops em Python
+            colunas_tipos = conexao.execute("""
+                SELECT m.name AS tabela, p.name AS coluna, p.type AS tipo
+                FROM sqlite_master m
+                JOIN pragma_table_info(m.name) p
+                WHERE m.type = 'table'
+            """).fetchall()
+            return nome_database, nome_tabelas, colunas_tipos
+        return self._em_cache("estrutura", calcular)
+
+    def fechar(self):
+        """Fecha as conexões livres e a sentinela (as em uso fecham ao serem descartadas)."""
+        with self._trava:
+            while True:
+                try:
+                    self._livres.get_nowait().close()
+                    self._abertas -= 1
+                except queue.Empty:
+                    break
+            self._cache = {}
+            self._assinatura_cache = None
+        with self._trava_sentinela:
+            if self._sentinela is not None:
+                self._sentinela.close()
+                self._sentinela = None
+                self._identidade_arquivo = None
+            self._ultima_verificacao = None
+
+
+# Pool compartilhado do banco de origem (as conexões só são abertas no primeiro uso)
+banco_leitura = PoolLeitura()
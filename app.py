@@ -1,19 +1,64 @@
 # 1. Importamos apenas o necessário para criar a API
-from flask import Flask, request, jsonify
-from genai_api import client
+# (chromadb e google-genai só são importados no primeiro uso; veja /saude/inicializacao)
+import json
+import time
+from metricas import (
+    configurar_logs, medir_importacao, marcar_inicializacao_concluida, relatorio_inicializacao, registro,
+    REQUISICOES, ERROS, DURACAO_REQUISICOES,
+)
+with medir_importacao("flask"):
+    from flask import Flask, Response, g, request, jsonify, stream_with_context
+with medir_importacao("tarefas_fase1"):
+    from tarefas_fase1 import iniciar_tarefa, obter_tarefa, ler_inteiro
+with medir_importacao("rag_fase2"):
+    from rag_fase2 import processar_pergunta_rag, processar_pergunta_rag_stream, processar_perguntas_lote
+from genai_api import obter_cliente
 from estrutura_database import estrutura_db
-from vetorizacao_fase1 import vetorizar_banco
-from rag_fase2 import processar_pergunta_rag
+from recursos import (
+    aquecer, aquecer_em_segundo_plano, estado_aquecimento, estado_prontidao, estado_snapshot, trocar_snapshot,
+)
+from cache_respostas import cache_respostas
+from coalescencia import coalescedor
+from filmes_similares import buscar_similares
+from configuracao import (
+    MODELO_LLM, AQUECER_NA_INICIALIZACAO, AQUECER_EM_SEGUNDO_PLANO, TAMANHO_BLOCO_VETORIZACAO,
+    TRABALHADORES_VETORIZACAO, CONCORRENCIA_LOTE_LLM,
+)
+
+configurar_logs()
 
 app = Flask(__name__)
 
+
+@app.before_request
+def iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+
+
+@app.after_request
+def registrar_metricas(resposta):
+    """Conta requisições/erros e registra a duração de cada endpoint (exposto em /metrics)"""
+    endpoint = request.endpoint or "desconhecido"
+    # As sondas de saúde e o próprio /metrics não entram nas métricas (um 503 de prontidão não é erro)
+    if endpoint == "metricas" or endpoint.startswith("saude_"):
+        return resposta
+    REQUISICOES.inc(endpoint=endpoint)
+    # Streams (SSE) são medidos até o envio dos cabeçalhos; os erros vêm no evento "erro"
+    if not resposta.is_streamed:
+        DURACAO_REQUISICOES.observar(time.perf_counter() - g.inicio_requisicao, endpoint=endpoint)
+        corpo = resposta.get_json(silent=True) if resposta.is_json else None
+        if resposta.status_code >= 400 or (isinstance(corpo, dict) and corpo.get("status") == "erro"):
+            ERROS.inc(endpoint=endpoint)
+    return resposta
+
+
 # ENDPOINT vs HTTP Métodos
 @app.route("/perguntar", methods=["POST"])
 def perguntar_post():
     dados = request.get_json() or {}
     pergunta = dados.get('prompt','Pergunta não enviada')
-    response = client.models.generate_content(
-        model="gemini-3-flash-preview", contents=pergunta
+    response = obter_cliente().models.generate_content(
+        model=MODELO_LLM, contents=pergunta
     )
     return jsonify(
         {
@@ -32,8 +77,38 @@ def perguntar_get():
 #ENDPOINT DA FASE 1 
 @app.route("/fase_1", methods=["GET", "POST"])
 def fase_1():    
-    resultado = vetorizar_banco()
-    return jsonify(resultado)
+    """
+    Endpoint da Fase 1: inicia a vetorização em segundo plano e responde na hora
+    com o ID da tarefa. O progresso é consultado em /fase_1/status/<id_tarefa>.
+    """
+    # modo "incremental" (padrão) ou "completo", via query string ou JSON
+    dados = request.get_json(silent=True) or {}
+    modo = request.args.get('modo') or dados.get('modo', 'incremental')
+    try:
+        tamanho_bloco = ler_inteiro(request.args.get('tamanho_bloco') or dados.get('tamanho_bloco', TAMANHO_BLOCO_VETORIZACAO),
+                                    'tamanho_bloco', minimo=1)
+        # 0 = sem processos de vetorização em paralelo
+        trabalhadores = ler_inteiro(request.args.get('trabalhadores') or dados.get('trabalhadores', TRABALHADORES_VETORIZACAO),
+                                    'trabalhadores', minimo=0)
+    except ValueError as erro:
+        return jsonify({"status": "erro", "mensagem": str(erro)}), 400
+
+    tarefa, criada = iniciar_tarefa(modo=modo, tamanho_bloco=tamanho_bloco, trabalhadores=trabalhadores)
+    resposta = {
+        "mensagem": "Vetorização iniciada em segundo plano." if criada
+        else "Já existe uma vetorização em andamento: acompanhe a tarefa existente.",
+        "id_tarefa": tarefa["id_tarefa"],
+        "url_status": f"/fase_1/status/{tarefa['id_tarefa']}",
+        "tarefa": tarefa
+    }
+    return jsonify(resposta), 202
+
+@app.route("/fase_1/status/<id_tarefa>", methods=["GET"])
+def fase_1_status(id_tarefa):
+    tarefa = obter_tarefa(id_tarefa)
+    if tarefa is None:
+        return jsonify({"status": "erro", "mensagem": "Tarefa não encontrada"}), 404
+    return jsonify(tarefa)
 
 # ENPOINT DA FASE 2    
 @app.route("/fase_2", methods=["GET", "POST"])
@@ -47,7 +122,10 @@ def fase_2():
         resultado = processar_pergunta_rag(
             pergunta=dados.get('pergunta', ''),
             contexto_adicional=dados.get('contexto_adicional', ''),
-            top_k=dados.get('top_k', 5)
+            top_k=dados.get('top_k', 5),
+            modo_busca=dados.get('modo_busca'),
+            filtros=dados.get('filtros'),
+            incluir_tempos=bool(dados.get('timings'))
         )
         return jsonify(resultado)
     else:
@@ -56,6 +134,135 @@ def fase_2():
             "instrucoes": "Use POST com: {\"pergunta\": \"sua pergunta aqui\"}"
         })
 
+@app.route("/fase_2/stream", methods=["POST"])
+def fase_2_stream():
+    """
+    Variante da Fase 2 com Server-Sent Events: envia os filmes encontrados logo
+    após a busca e depois o texto da LLM em pedaços, à medida que é gerado.
+    """
+    dados = request.get_json() or {}
+    eventos = processar_pergunta_rag_stream(
+        pergunta=dados.get('pergunta', ''),
+        contexto_adicional=dados.get('contexto_adicional', ''),
+        top_k=dados.get('top_k', 5),
+        modo_busca=dados.get('modo_busca'),
+        filtros=dados.get('filtros'),
+        incluir_tempos=bool(dados.get('timings'))
+    )
+
+    def gerar_sse():
+        for nome_evento, conteudo in eventos:
+            yield f"event: {nome_evento}\ndata: {json.dumps(conteudo, ensure_ascii=False)}\n\n"
+
+    return Response(
+        stream_with_context(gerar_sse()),
+        mimetype="text/event-stream",
+        # Desativa buffers intermediários (proxies) para os eventos chegarem na hora
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/fase_2/lote", methods=["POST"])
+def fase_2_lote():
+    """
+    Variante em lote da Fase 2: várias perguntas numa única requisição.
+    Os resultados voltam na mesma ordem das perguntas, com erro por item.
+    """
+    dados = request.get_json() or {}
+    try:
+        concorrencia = ler_inteiro(dados.get('concorrencia', CONCORRENCIA_LOTE_LLM), 'concorrencia')
+    except ValueError as erro:
+        return jsonify({"status": "erro", "mensagem": str(erro)}), 400
+    # Entre 1 e o limite configurado
+    concorrencia = min(max(1, concorrencia), CONCORRENCIA_LOTE_LLM)
+    resultado = processar_perguntas_lote(
+        perguntas=dados.get('perguntas', []),
+        contexto_adicional=dados.get('contexto_adicional', ''),
+        top_k=dados.get('top_k', 5),
+        concorrencia=concorrencia,
+        modo_busca=dados.get('modo_busca'),
+        filtros=dados.get('filtros'),
+        incluir_tempos=bool(dados.get('timings'))
+    )
+    return jsonify(resultado)
+
+@app.route("/fase_2/cache", methods=["GET"])
+def fase_2_cache():
+    """Acertos/falhas do cache semântico (para ajustar o limiar) e a coalescência de perguntas idênticas"""
+    return jsonify({**cache_respostas.estatisticas(), "coalescencia": coalescedor.estatisticas()})
+
+# ENDPOINT DE FILMES SIMILARES
+@app.route("/filmes/similares", methods=["GET"])
+def filmes_similares():
+    """
+    Filmes parecidos com um filme (?titulo=... ou ?id=..., e opcionalmente &k=5),
+    lidos do grafo pré-calculado pela Fase 1: sem vetorização e sem chamar a LLM.
+    """
+    k = request.args.get('k')
+    try:
+        k = ler_inteiro(k, 'k', minimo=1) if k is not None else None
+    except ValueError as erro:
+        return jsonify({"status": "erro", "mensagem": str(erro)}), 400
+    return jsonify(buscar_similares(
+        id_doc=request.args.get('id'),
+        titulo=request.args.get('titulo'),
+        k=k
+    ))
+
+# ENDPOINTS DE SNAPSHOT DO ÍNDICE (BACKEND_BUSCA = "snapshot")
+@app.route("/snapshot", methods=["GET"])
+def snapshot():
+    """Versão do snapshot em uso, a apontada pelo ATUAL e as disponíveis"""
+    return jsonify(estado_snapshot())
+
+@app.route("/snapshot/trocar", methods=["POST"])
+def snapshot_trocar():
+    """
+    Troca o snapshot sem interromper as consultas em andamento: {"versao": "..."}
+    fixa uma versão neste processo; sem versão, volta a seguir o ATUAL.
+    """
+    dados = request.get_json(silent=True) or {}
+    try:
+        resultado = trocar_snapshot(dados.get('versao'))
+    except ValueError as erro:
+        return jsonify({"status": "erro", "mensagem": str(erro)}), 400
+    return jsonify({"status": "sucesso", "mensagem": "Snapshot em uso atualizado", **resultado})
+
+@app.route("/metrics", methods=["GET"])
+def metricas():
+    """Métricas no formato texto do Prometheus (requisições, erros, duração por etapa, cache)"""
+    return Response(registro.formatar_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/saude/vivo", methods=["GET"])
+def saude_vivo():
+    """Liveness: o processo está respondendo (não depende do modelo nem do índice)"""
+    return jsonify({"status": "sucesso", "mensagem": "API no ar"})
+
+
+@app.route("/saude/pronto", methods=["GET"])
+def saude_pronto():
+    """Readiness: 200 com o modelo carregado e o índice aberto com documentos; 503 enquanto aquece"""
+    pronto, detalhes = estado_prontidao()
+    mensagem = "Pronta para responder" if pronto else "Ainda não está pronta (aquecendo ou sem documentos vetorizados)"
+    return jsonify({"status": "sucesso" if pronto else "erro", "mensagem": mensagem, **detalhes}), (
+        200 if pronto else 503
+    )
+
+
+@app.route("/saude/inicializacao", methods=["GET"])
+def saude_inicializacao():
+    """Tempo de inicialização, de cada importação e de cada etapa do aquecimento"""
+    return jsonify({**relatorio_inicializacao(), "aquecimento": estado_aquecimento()})
+
+# Carrega modelo e coleção uma vez, antes da primeira pergunta
+# (em segundo plano, a API já aceita conexões e /saude/pronto avisa quando terminar)
+if AQUECER_NA_INICIALIZACAO:
+    if AQUECER_EM_SEGUNDO_PLANO:
+        aquecer_em_segundo_plano()
+    else:
+        aquecer()
+
+marcar_inicializacao_concluida()
+
 if __name__ == "__main__":
     print("Iniciando API...") 
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,293 @@
+# API em modo assíncrono (Quart): mesmas rotas e respostas do app.py, mas as
+# esperas pelo Gemini não prendem um worker. Um único processo (com uma única
+# cópia do modelo) atende centenas de perguntas em andamento:
+# - a vetorização e a busca rodam num pool limitado de threads (THREADS_CPU_ASSINCRONO)
+# - as chamadas ao Gemini são aguardadas (até MAXIMO_LLM_SIMULTANEAS ao mesmo tempo)
+#
+# Execução:
+#   python app_async.py
+#   hypercorn app_async:app --bind 0.0.0.0:5000     (produção)
+import json
+import time
+from metricas import (
+    configurar_logs, medir_importacao, marcar_inicializacao_concluida, relatorio_inicializacao, registro,
+    REQUISICOES, ERROS, DURACAO_REQUISICOES,
+)
+with medir_importacao("quart"):
+    from quart import Quart, Response, g, request, jsonify
+with medir_importacao("tarefas_fase1"):
+    from tarefas_fase1 import iniciar_tarefa, obter_tarefa, ler_inteiro
+with medir_importacao("rag_assincrono"):
+    from rag_assincrono import (
+        executar_em_thread, chamada_llm, processar_pergunta_rag_async, processar_pergunta_rag_stream_async,
+        processar_perguntas_lote_async,
+    )
+from genai_api import obter_cliente
+from estrutura_database import estrutura_db
+from recursos import (
+    aquecer, aquecer_em_segundo_plano, estado_aquecimento, estado_prontidao, estado_snapshot, trocar_snapshot,
+)
+from cache_respostas import cache_respostas
+from coalescencia import coalescedor
+from filmes_similares import buscar_similares
+from configuracao import (
+    MODELO_LLM, AQUECER_NA_INICIALIZACAO, AQUECER_EM_SEGUNDO_PLANO, TAMANHO_BLOCO_VETORIZACAO,
+    TRABALHADORES_VETORIZACAO, CONCORRENCIA_LOTE_LLM,
+)
+
+configurar_logs()
+
+app = Quart(__name__)
+
+
+@app.before_serving
+async def iniciar():
+    # Carrega modelo e coleção uma vez, antes da primeira pergunta (sem travar o event loop);
+    # em segundo plano, o servidor já aceita conexões e /saude/pronto avisa quando terminar
+    if AQUECER_NA_INICIALIZACAO:
+        if AQUECER_EM_SEGUNDO_PLANO:
+            aquecer_em_segundo_plano()
+        else:
+            await executar_em_thread(aquecer)
+    marcar_inicializacao_concluida()
+
+
+@app.before_request
+async def iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+
+
+@app.after_request
+async def registrar_metricas(resposta):
+    """Conta requisições/erros e registra a duração de cada endpoint (exposto em /metrics)"""
+    endpoint = request.endpoint or "desconhecido"
+    # As sondas de saúde e o próprio /metrics não entram nas métricas (um 503 de prontidão não é erro)
+    if endpoint == "metricas" or endpoint.startswith("saude_"):
+        return resposta
+    REQUISICOES.inc(endpoint=endpoint)
+    # Streams (SSE) são medidos até o envio dos cabeçalhos; os erros vêm no evento "erro"
+    if resposta.mimetype != "text/event-stream":
+        DURACAO_REQUISICOES.observar(time.perf_counter() - g.inicio_requisicao, endpoint=endpoint)
+        corpo = await resposta.get_json(silent=True) if resposta.is_json else None
+        if resposta.status_code >= 400 or (isinstance(corpo, dict) and corpo.get("status") == "erro"):
+            ERROS.inc(endpoint=endpoint)
+    return resposta
+
+
+# ENDPOINT vs HTTP Métodos
+@app.route("/perguntar", methods=["POST"])
+async def perguntar_post():
+    dados = await request.get_json() or {}
+    pergunta = dados.get('prompt', 'Pergunta não enviada')
+    async with chamada_llm():
+        response = await obter_cliente().aio.models.generate_content(
+            model=MODELO_LLM, contents=pergunta
+        )
+    return jsonify(
+        {
+            "pergunta": f"Você perguntou: {pergunta}",
+            "resposta_gemini": f"{response.text}"
+        }
+    )
+
+
+@app.route("/perguntar", methods=["GET"])
+async def perguntar_get():
+    return jsonify(
+        {"estrutura_db": await executar_em_thread(estrutura_db)}
+    )
+
+
+# ENDPOINT DA FASE 1
+@app.route("/fase_1", methods=["GET", "POST"])
+async def fase_1():
+    """
+    Endpoint da Fase 1: inicia a vetorização em segundo plano e responde na hora
+    com o ID da tarefa. O progresso é consultado em /fase_1/status/<id_tarefa>.
+    """
+    dados = await request.get_json(silent=True) or {}
+    modo = request.args.get('modo') or dados.get('modo', 'incremental')
+    try:
+        tamanho_bloco = ler_inteiro(request.args.get('tamanho_bloco') or dados.get('tamanho_bloco', TAMANHO_BLOCO_VETORIZACAO),
+                                    'tamanho_bloco', minimo=1)
+        # 0 = sem processos de vetorização em paralelo
+        trabalhadores = ler_inteiro(request.args.get('trabalhadores') or dados.get('trabalhadores', TRABALHADORES_VETORIZACAO),
+                                    'trabalhadores', minimo=0)
+    except ValueError as erro:
+        return jsonify({"status": "erro", "mensagem": str(erro)}), 400
+
+    tarefa, criada = iniciar_tarefa(modo=modo, tamanho_bloco=tamanho_bloco, trabalhadores=trabalhadores)
+    resposta = {
+        "mensagem": "Vetorização iniciada em segundo plano." if criada
+        else "Já existe uma vetorização em andamento: acompanhe a tarefa existente.",
+        "id_tarefa": tarefa["id_tarefa"],
+        "url_status": f"/fase_1/status/{tarefa['id_tarefa']}",
+        "tarefa": tarefa
+    }
+    return jsonify(resposta), 202
+
+
+@app.route("/fase_1/status/<id_tarefa>", methods=["GET"])
+async def fase_1_status(id_tarefa):
+    tarefa = obter_tarefa(id_tarefa)
+    if tarefa is None:
+        return jsonify({"status": "erro", "mensagem": "Tarefa não encontrada"}), 404
+    return jsonify(tarefa)
+
+
+# ENDPOINT DA FASE 2
+@app.route("/fase_2", methods=["GET", "POST"])
+async def fase_2():
+    """
+    Endpoint da Fase 2: RAG (Retrieval-Augmented Generation), versão assíncrona
+    """
+    if request.method == "POST":
+        dados = await request.get_json() or {}
+        resultado = await processar_pergunta_rag_async(
+            pergunta=dados.get('pergunta', ''),
+            contexto_adicional=dados.get('contexto_adicional', ''),
+            top_k=dados.get('top_k', 5),
+            modo_busca=dados.get('modo_busca'),
+            filtros=dados.get('filtros'),
+            incluir_tempos=bool(dados.get('timings'))
+        )
+        return jsonify(resultado)
+    else:
+        return jsonify({
+            "mensagem": "Endpoint da Fase 2 - RAG",
+            "instrucoes": "Use POST com: {\"pergunta\": \"sua pergunta aqui\"}"
+        })
+
+
+@app.route("/fase_2/stream", methods=["POST"])
+async def fase_2_stream():
+    """
+    Variante da Fase 2 com Server-Sent Events (mesmos eventos do app.py).
+    """
+    dados = await request.get_json() or {}
+    eventos = processar_pergunta_rag_stream_async(
+        pergunta=dados.get('pergunta', ''),
+        contexto_adicional=dados.get('contexto_adicional', ''),
+        top_k=dados.get('top_k', 5),
+        modo_busca=dados.get('modo_busca'),
+        filtros=dados.get('filtros'),
+        incluir_tempos=bool(dados.get('timings'))
+    )
+
+    async def gerar_sse():
+        async for nome_evento, conteudo in eventos:
+            yield f"event: {nome_evento}\ndata: {json.dumps(conteudo, ensure_ascii=False)}\n\n".encode("utf-8")
+
+    resposta = Response(
+        gerar_sse(),
+        mimetype="text/event-stream",
+        # Desativa buffers intermediários (proxies) para os eventos chegarem na hora
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Sem limite de tempo: a geração pode demorar mais que o timeout padrão
+    resposta.timeout = None
+    return resposta
+
+
+@app.route("/fase_2/lote", methods=["POST"])
+async def fase_2_lote():
+    """
+    Variante em lote da Fase 2: várias perguntas numa única requisição.
+    """
+    dados = await request.get_json() or {}
+    try:
+        concorrencia = ler_inteiro(dados.get('concorrencia', CONCORRENCIA_LOTE_LLM), 'concorrencia')
+    except ValueError as erro:
+        return jsonify({"status": "erro", "mensagem": str(erro)}), 400
+    # Entre 1 e o limite configurado
+    concorrencia = min(max(1, concorrencia), CONCORRENCIA_LOTE_LLM)
+    resultado = await processar_perguntas_lote_async(
+        perguntas=dados.get('perguntas', []),
+        contexto_adicional=dados.get('contexto_adicional', ''),
+        top_k=dados.get('top_k', 5),
+        concorrencia=concorrencia,
+        modo_busca=dados.get('modo_busca'),
+        filtros=dados.get('filtros'),
+        incluir_tempos=bool(dados.get('timings'))
+    )
+    return jsonify(resultado)
+
+
+@app.route("/fase_2/cache", methods=["GET"])
+async def fase_2_cache():
+    """Acertos/falhas do cache semântico (para ajustar o limiar) e a coalescência de perguntas idênticas"""
+    return jsonify({**cache_respostas.estatisticas(), "coalescencia": coalescedor.estatisticas()})
+
+
+# ENDPOINT DE FILMES SIMILARES
+@app.route("/filmes/similares", methods=["GET"])
+async def filmes_similares():
+    """
+    Filmes parecidos com um filme (?titulo=... ou ?id=..., e opcionalmente &k=5),
+    lidos do grafo pré-calculado pela Fase 1: sem vetorização e sem chamar a LLM.
+    """
+    k = request.args.get('k')
+    try:
+        k = ler_inteiro(k, 'k', minimo=1) if k is not None else None
+    except ValueError as erro:
+        return jsonify({"status": "erro", "mensagem": str(erro)}), 400
+    return jsonify(await executar_em_thread(
+        buscar_similares,
+        id_doc=request.args.get('id'),
+        titulo=request.args.get('titulo'),
+        k=k
+    ))
+
+
+# ENDPOINTS DE SNAPSHOT DO ÍNDICE (BACKEND_BUSCA = "snapshot")
+@app.route("/snapshot", methods=["GET"])
+async def snapshot():
+    """Versão do snapshot em uso, a apontada pelo ATUAL e as disponíveis"""
+    return jsonify(await executar_em_thread(estado_snapshot))
+
+
+@app.route("/snapshot/trocar", methods=["POST"])
+async def snapshot_trocar():
+    """
+    Troca o snapshot sem interromper as consultas em andamento: {"versao": "..."}
+    fixa uma versão neste processo; sem versão, volta a seguir o ATUAL.
+    """
+    dados = await request.get_json(silent=True) or {}
+    try:
+        resultado = await executar_em_thread(trocar_snapshot, dados.get('versao'))
+    except ValueError as erro:
+        return jsonify({"status": "erro", "mensagem": str(erro)}), 400
+    return jsonify({"status": "sucesso", "mensagem": "Snapshot em uso atualizado", **resultado})
+
+
+@app.route("/metrics", methods=["GET"])
+async def metricas():
+    """Métricas no formato texto do Prometheus (requisições, erros, duração por etapa, cache)"""
+    return Response(registro.formatar_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/saude/vivo", methods=["GET"])
+async def saude_vivo():
+    """Liveness: o processo está respondendo (não depende do modelo nem do índice)"""
+    return jsonify({"status": "sucesso", "mensagem": "API no ar"})
+
+
+@app.route("/saude/pronto", methods=["GET"])
+async def saude_pronto():
+    """Readiness: 200 com o modelo carregado e o índice aberto com documentos; 503 enquanto aquece"""
+    pronto, detalhes = await executar_em_thread(estado_prontidao)
+    mensagem = "Pronta para responder" if pronto else "Ainda não está pronta (aquecendo ou sem documentos vetorizados)"
+    return jsonify({"status": "sucesso" if pronto else "erro", "mensagem": mensagem, **detalhes}), (
+        200 if pronto else 503
+    )
+
+
+@app.route("/saude/inicializacao", methods=["GET"])
+async def saude_inicializacao():
+    """Tempo de inicialização, de cada importação e de cada etapa do aquecimento"""
+    return jsonify({**relatorio_inicializacao(), "aquecimento": estado_aquecimento()})
+
+
+if __name__ == "__main__":
+    print("Iniciando API assíncrona...")
+    app.run(host='0.0.0.0', port=5000)
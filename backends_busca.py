@@ -0,0 +1,454 @@
+# Arquivo responsável pelos backends de busca vetorial da Fase 2
+# A Fase 2 conversa com o backend por três operações (contar, consultar, obter):
+# - BackendChroma: consulta a coleção do ChromaDB (índice HNSW)
+# - BackendNumpy: busca exata em memória, com uma única multiplicação de matrizes
+#   sobre os vetores normalizados exportados da coleção para um arquivo .npy.
+#   O arquivo é aberto com mmap: vários processos da API compartilham as mesmas
+#   páginas de memória em vez de cada um carregar sua própria cópia.
+import os
+import json
+import shutil
+import tempfile
+import time
+import numpy as np
+from configuracao import CAMINHO_INDICE_NUMPY, PRECISAO_INDICE_NUMPY, FATOR_REPONTUACAO_NUMPY
+
+BACKEND_CHROMA = "chroma"
+BACKEND_NUMPY = "numpy"
+BACKEND_SNAPSHOT = "snapshot"  # BackendNumpy sobre um snapshot imutável (snapshots.py)
+BACKENDS_BUSCA = (BACKEND_CHROMA, BACKEND_NUMPY, BACKEND_SNAPSHOT)
+
+# Precisões aceitas para os vetores do índice NumPy
+PRECISAO_FLOAT32 = "float32"
+PRECISAO_FLOAT16 = "float16"
+PRECISAO_INT8 = "int8"
+PRECISOES = (PRECISAO_FLOAT32, PRECISAO_FLOAT16, PRECISAO_INT8)
+
+# Arquivos do índice NumPy
+ARQUIVOS_VETORES = {
+    PRECISAO_FLOAT32: "vetores.npy",
+    PRECISAO_FLOAT16: "vetores_float16.npy",
+    PRECISAO_INT8: "vetores_int8.npy",
+}
+ARQUIVO_ESCALAS_INT8 = "escalas_int8.npy"
+ARQUIVO_DOCUMENTOS = "documentos.json"
+
+# Versões do índice NumPy da Fase 1 (publicar_indice_numpy): cada exportação vai para
+# um diretório novo e o arquivo ATUAL aponta para ele (como nos snapshots)
+ARQUIVO_VERSAO_NUMPY = "ATUAL"
+PREFIXO_VERSAO_NUMPY = "versao-"
+PREFIXO_GRAVACAO_NUMPY = ".gravando-"
+# Versões mantidas no disco: a atual e a anterior (ainda aberta por processos que não trocaram)
+VERSOES_NUMPY_MANTIDAS = 2
+
+# Linhas convertidas para float32 por vez na busca em float16/int8
+TAMANHO_BLOCO_BUSCA = 65536
+
+# Documentos lidos da coleção por vez durante a exportação
+TAMANHO_PAGINA_EXPORTACAO = 1000
+
+
+class BackendChroma:
+    """Busca aproximada (HNSW) na coleção do ChromaDB."""
+
+    nome = BACKEND_CHROMA
+
+    def __init__(self, colecao):
+        self.colecao = colecao
+
+    def contar(self):
+        return self.colecao.count()
+
+    def consultar(self, vetores, n_resultados, where=None):
+        """
+        Retorna os n_resultados documentos mais próximos de cada vetor
+        (mesmo formato de colecao.query: uma lista por vetor).
+        """
+        return self.colecao.query(
+            query_embeddings=vetores, n_results=n_resultados, where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+
+    def obter(self, ids, where=None):
+        """Retorna os documentos dos IDs informados (só os que atendem ao filtro, se houver)."""
+        return self.colecao.get(ids=ids, where=where, include=["documents", "metadatas"])
+
+
+class BackendNumpy:
+    """
+    Busca exata por similaridade de cosseno sobre a matriz de vetores (mmap).
+
+    Com precisão "float16" ou "int8" (quantização escalar com uma escala por
+    dimensão) a matriz ocupa 2x ou 4x menos memória e disco. Com fator de
+    repontuação > 0, os top_k x fator candidatos da busca quantizada são
+    reordenados com os vetores float32 (só as linhas candidatas são lidas do disco).
+    """
+
+    nome = BACKEND_NUMPY
+
+    def __init__(self, diretorio=CAMINHO_INDICE_NUMPY, precisao=PRECISAO_INDICE_NUMPY,
+                 fator_repontuacao=FATOR_REPONTUACAO_NUMPY):
+        if precisao not in PRECISOES:
+            raise ValueError(f"Precisão inválida: {precisao}. Use {', '.join(PRECISOES)}.")
+        self.precisao = precisao
+        self.fator_repontuacao = fator_repontuacao if precisao != PRECISAO_FLOAT32 else 0
+        self.escalas = None
+        self.vetores_float32 = None
+
+        # Índice publicado em versões: o ATUAL diz qual diretório ler (um só conjunto
+        # de arquivos, nunca vetores novos com documentos antigos)
+        self.versao_indice = versao_indice_numpy(diretorio)
+        if self.versao_indice is not None:
+            diretorio = os.path.join(diretorio, self.versao_indice)
+
+        caminho_vetores = os.path.join(diretorio, ARQUIVOS_VETORES[precisao])
+        caminho_documentos = os.path.join(diretorio, ARQUIVO_DOCUMENTOS)
+        if not os.path.exists(caminho_vetores) or not os.path.exists(caminho_documentos):
+            # Índice ainda não exportado (nesta precisão): comporta-se como um banco vazio
+            self.vetores = np.zeros((0, 0), dtype=np.float32)
+            self.ids, self.documentos, self.metadados = [], [], []
+        else:
+            # mmap_mode="r": as páginas são lidas do disco sob demanda e compartilhadas entre processos
+            self.vetores = np.load(caminho_vetores, mmap_mode="r")
+            if precisao == PRECISAO_INT8:
+                self.escalas = np.load(os.path.join(diretorio, ARQUIVO_ESCALAS_INT8))
+            if self.fator_repontuacao > 0:
+                caminho_float32 = os.path.join(diretorio, ARQUIVOS_VETORES[PRECISAO_FLOAT32])
+                if not os.path.exists(caminho_float32):
+                    raise ValueError(
+                        "Repontuação ativada, mas o índice não tem os vetores float32. "
+                        "Exporte o índice novamente com FATOR_REPONTUACAO_NUMPY > 0."
+                    )
+                self.vetores_float32 = np.load(caminho_float32, mmap_mode="r")
+            with open(caminho_documentos, encoding="utf-8") as arquivo:
+                dados = json.load(arquivo)
+            self.ids, self.documentos, self.metadados = dados["ids"], dados["documentos"], dados["metadados"]
+            if len(self.ids) != self.vetores.shape[0]:
+                raise ValueError(
+                    f"Índice NumPy inconsistente ({len(self.ids)} documentos e "
+                    f"{self.vetores.shape[0]} vetores). Execute a Fase 1 novamente."
+                )
+        self.posicoes = {id_doc: i for i, id_doc in enumerate(self.ids)}
+
+    def contar(self):
+        return len(self.ids)
+
+    def bytes_em_memoria(self):
+        """Tamanho da matriz usada na busca (sem os vetores float32 da repontuação)."""
+        return int(self.vetores.nbytes + (self.escalas.nbytes if self.escalas is not None else 0))
+
+    def _mascara(self, where):
+        """Vetor booleano com as linhas que atendem ao filtro (ou None sem filtro)."""
+        if not where:
+            return None
+        return np.fromiter((atende_filtro(metadata, where) for metadata in self.metadados),
+                           dtype=bool, count=len(self.metadados))
+
+    def _similaridades(self, consultas):
+        """
+        Similaridade de cosseno de todas as perguntas com todos os filmes (perguntas x filmes).
+        Vetores float16/int8 são convertidos para float32 em blocos, sem uma cópia inteira da matriz.
+        """
+        if self.escalas is not None:
+            # int8: v ~= q * escala, então <c, v> ~= <c * escala, q>
+            consultas = consultas * self.escalas
+        if self.vetores.dtype == np.float32:
+            return consultas @ self.vetores.T
+
+        similaridades = np.empty((len(consultas), len(self.ids)), dtype=np.float32)
+        for inicio in range(0, len(self.ids), TAMANHO_BLOCO_BUSCA):
+            bloco = np.asarray(self.vetores[inicio:inicio + TAMANHO_BLOCO_BUSCA], dtype=np.float32)
+            similaridades[:, inicio:inicio + TAMANHO_BLOCO_BUSCA] = consultas @ bloco.T
+        return similaridades
+
+    def consultar(self, vetores, n_resultados, where=None):
+        consultas = np.asarray(vetores, dtype=np.float32)
+        consultas /= np.maximum(np.linalg.norm(consultas, axis=1, keepdims=True), 1e-12)
+
+        similaridades = self._similaridades(consultas)
+        mascara = self._mascara(where)
+        if mascara is not None:
+            similaridades[:, ~mascara] = -np.inf
+        disponiveis = len(self.ids) if mascara is None else int(mascara.sum())
+        k = min(n_resultados, disponiveis)
+        # Com repontuação, a busca quantizada só escolhe os candidatos
+        k_candidatos = min(k * max(1, self.fator_repontuacao), disponiveis)
+
+        saida = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for consulta, linha in zip(consultas, similaridades):
+            if k == 0:
+                melhores, pontuacoes = np.array([], dtype=int), np.array([], dtype=np.float32)
+            else:
+                # argpartition separa os maiores em O(n); só eles são ordenados
+                candidatos = np.argpartition(-linha, k_candidatos - 1)[:k_candidatos]
+                pontuacoes = linha[candidatos]
+                if self.vetores_float32 is not None:
+                    # Repontuação com os vetores float32 (mmap: lê só as linhas candidatas)
+                    ordem_disco = np.sort(candidatos)
+                    pontuacoes = np.asarray(self.vetores_float32[ordem_disco]) @ consulta
+                    candidatos = ordem_disco
+                ordem = np.argsort(-pontuacoes)[:k]
+                melhores, pontuacoes = candidatos[ordem], pontuacoes[ordem]
+            saida["ids"].append([self.ids[i] for i in melhores])
+            saida["documents"].append([self.documentos[i] for i in melhores])
+            saida["metadatas"].append([self.metadados[i] for i in melhores])
+            saida["distances"].append([float(1.0 - pontuacao) for pontuacao in pontuacoes])
+        return saida
+
+    def obter(self, ids, where=None):
+        posicoes = [self.posicoes[id_doc] for id_doc in ids if id_doc in self.posicoes]
+        if where:
+            posicoes = [i for i in posicoes if atende_filtro(self.metadados[i], where)]
+        return {
+            "ids": [self.ids[i] for i in posicoes],
+            "documents": [self.documentos[i] for i in posicoes],
+            "metadatas": [self.metadados[i] for i in posicoes],
+        }
+
+
+def quantizar(vetores, precisao):
+    """
+    Converte a matriz float32 (normalizada) para a precisão pedida.
+    int8: quantização escalar simétrica com uma escala por dimensão (maior |valor| / 127).
+
+    Retorna: Tupla (vetores_convertidos, escalas) — escalas é None fora do int8
+    """
+    if precisao == PRECISAO_FLOAT16:
+        return vetores.astype(np.float16), None
+    if precisao == PRECISAO_INT8:
+        escalas = np.abs(vetores).max(axis=0) / 127.0 if len(vetores) else np.ones(vetores.shape[1])
+        escalas[escalas == 0] = 1.0
+        quantizados = np.clip(np.rint(vetores / escalas), -127, 127).astype(np.int8)
+        return quantizados, escalas.astype(np.float32)
+    return vetores.astype(np.float32), None
+
+
+# Operadores de comparação aceitos nas cláusulas "where" (os mesmos do ChromaDB)
+OPERADORES = {
+    "$eq": lambda valor, alvo: valor == alvo,
+    "$ne": lambda valor, alvo: valor != alvo,
+    "$gt": lambda valor, alvo: valor is not None and valor > alvo,
+    "$gte": lambda valor, alvo: valor is not None and valor >= alvo,
+    "$lt": lambda valor, alvo: valor is not None and valor < alvo,
+    "$lte": lambda valor, alvo: valor is not None and valor <= alvo,
+    "$in": lambda valor, alvo: valor in alvo,
+    "$nin": lambda valor, alvo: valor not in alvo,
+}
+
+
+def atende_filtro(metadata, where):
+    """
+    Avalia uma cláusula "where" no formato do ChromaDB sobre os metadados de um filme
+    (usado pelo BackendNumpy, que não tem um banco por trás).
+    """
+    for campo, condicao in where.items():
+        if campo == "$and":
+            if not all(atende_filtro(metadata, parte) for parte in condicao):
+                return False
+        elif campo == "$or":
+            if not any(atende_filtro(metadata, parte) for parte in condicao):
+                return False
+        elif isinstance(condicao, dict):
+            valor = metadata.get(campo)
+            for operador, alvo in condicao.items():
+                try:
+                    if not OPERADORES[operador](valor, alvo):
+                        return False
+                except TypeError:
+                    # Tipos incompatíveis (ex.: texto comparado com número) não atendem
+                    return False
+        elif metadata.get(campo) != condicao:
+            return False
+    return True
+
+
+def ler_vetores_colecao(colecao, normalizar=True):
+    """
+    Lê (em páginas) todos os vetores, documentos e metadados da coleção do ChromaDB.
+
+    Retorna: Tupla (ids, documentos, metadados, vetores) — vetores float32 (normalizados, por padrão)
+    """
+    total = colecao.count()
+    ids, documentos, metadados = [], [], []
+    vetores = None
+
+    for deslocamento in range(0, total, TAMANHO_PAGINA_EXPORTACAO):
+        pagina = colecao.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=TAMANHO_PAGINA_EXPORTACAO, offset=deslocamento
+        )
+        embeddings = np.asarray(pagina["embeddings"], dtype=np.float32)
+        if vetores is None:
+            vetores = np.empty((total, embeddings.shape[1]), dtype=np.float32)
+        vetores[len(ids):len(ids) + len(embeddings)] = embeddings
+        ids.extend(pagina["ids"])
+        documentos.extend(pagina["documents"])
+        metadados.extend(pagina["metadatas"])
+
+    if vetores is None:
+        vetores = np.zeros((0, 0), dtype=np.float32)
+    vetores = vetores[:len(ids)]
+    if normalizar:
+        vetores /= np.maximum(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12)
+    return ids, documentos, metadados, vetores
+
+
+def _gravar_atomico(caminho, gravar):
+    """Grava em um arquivo temporário e só então substitui o arquivo final."""
+    with open(caminho + ".tmp", "wb") as arquivo:
+        gravar(arquivo)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def gravar_indice_numpy(diretorio, ids, documentos, metadados, vetores,
+                        precisao=PRECISAO_INDICE_NUMPY, fator_repontuacao=FATOR_REPONTUACAO_NUMPY):
+    """
+    Grava o índice do BackendNumpy na precisão pedida. Os vetores float32 só são
+    gravados quando são a própria precisão do índice ou quando há repontuação;
+    arquivos de outras precisões (de exportações anteriores) são removidos.
+
+    Retorna: Dicionário com a quantidade de documentos e o tamanho dos arquivos
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    convertidos, escalas = quantizar(vetores, precisao)
+    arquivos = {ARQUIVOS_VETORES[precisao]: convertidos}
+    if escalas is not None:
+        arquivos[ARQUIVO_ESCALAS_INT8] = escalas
+    if fator_repontuacao > 0:
+        arquivos[ARQUIVOS_VETORES[PRECISAO_FLOAT32]] = vetores
+
+    for nome, matriz in arquivos.items():
+        _gravar_atomico(os.path.join(diretorio, nome), lambda arquivo: np.save(arquivo, matriz))
+    _gravar_atomico(
+        os.path.join(diretorio, ARQUIVO_DOCUMENTOS),
+        lambda arquivo: arquivo.write(json.dumps(
+            {"ids": ids, "documentos": documentos, "metadados": metadados},
+            ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8"))
+    )
+
+    for nome in list(ARQUIVOS_VETORES.values()) + [ARQUIVO_ESCALAS_INT8]:
+        if nome not in arquivos and os.path.exists(os.path.join(diretorio, nome)):
+            os.remove(os.path.join(diretorio, nome))
+
+    return {
+        "documentos": len(ids),
+        "precisao": precisao,
+        "fator_repontuacao": fator_repontuacao,
+        "bytes_vetores": sum(os.path.getsize(os.path.join(diretorio, nome)) for nome in arquivos),
+        "bytes_documentos": os.path.getsize(os.path.join(diretorio, ARQUIVO_DOCUMENTOS)),
+    }
+
+
+def versao_indice_numpy(diretorio=CAMINHO_INDICE_NUMPY):
+    """
+    Versão do índice NumPy apontada pelo ATUAL.
+
+    Retorna: Nome do diretório da versão ou None (índice no formato antigo, sem versões, ou não exportado)
+    """
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_VERSAO_NUMPY), encoding="utf-8") as arquivo:
+            return arquivo.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publicar_indice_numpy(diretorio, ids, documentos, metadados, vetores,
+                          precisao=PRECISAO_INDICE_NUMPY, fator_repontuacao=FATOR_REPONTUACAO_NUMPY):
+    """
+    Grava o índice NumPy numa versão nova e só então a torna a atual: os arquivos
+    vão para um diretório temporário, renomeado quando completo, e o ATUAL é
+    substituído de uma vez (os.replace). Quem abre o índice lê a versão antiga
+    inteira ou a nova inteira. As versões mais antigas que VERSOES_NUMPY_MANTIDAS
+    e os arquivos do formato antigo (direto em `diretorio`) são apagados.
+
+    Retorna: Dicionário de gravar_indice_numpy, mais a "versao" publicada
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    temporario = tempfile.mkdtemp(prefix=PREFIXO_GRAVACAO_NUMPY, dir=diretorio)
+    try:
+        resultado = gravar_indice_numpy(temporario, ids, documentos, metadados, vetores, precisao, fator_repontuacao)
+        versao = f"{PREFIXO_VERSAO_NUMPY}{time.time_ns()}"
+        os.rename(temporario, os.path.join(diretorio, versao))
+    except BaseException:
+        shutil.rmtree(temporario, ignore_errors=True)
+        raise
+    _gravar_atomico(os.path.join(diretorio, ARQUIVO_VERSAO_NUMPY), lambda arquivo: arquivo.write(versao.encode("utf-8")))
+
+    versoes = sorted(nome for nome in os.listdir(diretorio) if nome.startswith(PREFIXO_VERSAO_NUMPY))
+    for antiga in versoes[:-VERSOES_NUMPY_MANTIDAS]:
+        shutil.rmtree(os.path.join(diretorio, antiga), ignore_errors=True)
+    for nome in list(ARQUIVOS_VETORES.values()) + [ARQUIVO_ESCALAS_INT8, ARQUIVO_DOCUMENTOS]:
+        if os.path.exists(os.path.join(diretorio, nome)):
+            os.remove(os.path.join(diretorio, nome))
+    return {**resultado, "versao": versao}
+
+
+def exportar_indice_numpy(colecao, diretorio=CAMINHO_INDICE_NUMPY):
+    """
+    Exporta os vetores e os documentos/metadados da coleção do ChromaDB para o
+    índice do BackendNumpy (na precisão PRECISAO_INDICE_NUMPY), numa versão nova
+    (publicar_indice_numpy): a Fase 2 nunca lê um conjunto de arquivos pela metade.
+
+    Retorna: Dicionário com a quantidade de documentos, o tamanho dos arquivos e a versão
+    """
+    return publicar_indice_numpy(diretorio, *ler_vetores_colecao(colecao))
+
+
+def avaliar_quantizacao(vetores, k=10, amostras=200, fator_repontuacao=4):
+    """
+    Compara as precisões do índice NumPy com a busca exata em float32:
+    recall@k, memória da matriz de busca, tamanho em disco e latência por consulta.
+    As perguntas de teste são vetores sorteados do próprio acervo.
+
+    Retorna: Lista de dicionários, um por configuração avaliada
+    """
+    gerador = np.random.default_rng(0)
+    consultas = vetores[gerador.choice(len(vetores), size=min(amostras, len(vetores)), replace=False)]
+    k = min(k, len(vetores))
+    exatos = [set(np.argsort(-(vetores @ consulta))[:k]) for consulta in consultas]
+    ids = [str(i) for i in range(len(vetores))]
+
+    configuracoes = [(PRECISAO_FLOAT32, 0), (PRECISAO_FLOAT16, 0), (PRECISAO_INT8, 0)]
+    if fator_repontuacao > 0:
+        configuracoes += [(PRECISAO_FLOAT16, fator_repontuacao), (PRECISAO_INT8, fator_repontuacao)]
+
+    relatorio = []
+    for precisao, fator in configuracoes:
+        with tempfile.TemporaryDirectory() as diretorio:
+            gravado = gravar_indice_numpy(diretorio, ids, ids, [{}] * len(ids), vetores, precisao, fator)
+            backend = BackendNumpy(diretorio, precisao, fator)
+            inicio = time.perf_counter()
+            encontrados = [backend.consultar([consulta], k)["ids"][0] for consulta in consultas]
+            segundos = time.perf_counter() - inicio
+            recall = np.mean([
+                len(exato & {int(id_doc) for id_doc in achados}) / k
+                for exato, achados in zip(exatos, encontrados)
+            ])
+            relatorio.append({
+                "precisao": precisao,
+                "fator_repontuacao": fator,
+                f"recall@{k}": round(float(recall), 4),
+                "bytes_memoria_busca": backend.bytes_em_memoria(),
+                "bytes_disco": gravado["bytes_vetores"],
+                "ms_por_consulta": round(segundos / len(consultas) * 1000, 3),
+            })
+            del backend
+    return relatorio
+
+
+# Uso:
+#   python backends_busca.py           -> exporta a coleção para o índice NumPy (sem re-vetorizar)
+#   python backends_busca.py avaliar   -> relatório de recall/memória das precisões float32/float16/int8
+if __name__ == "__main__":
+    import sys
+    from recursos import obter_colecao
+
+    if len(sys.argv) > 1 and sys.argv[1] == "avaliar":
+        print("📏 Avaliando a quantização do índice NumPy...")
+        _, _, _, vetores_colecao = ler_vetores_colecao(obter_colecao())
+        for linha in avaliar_quantizacao(vetores_colecao):
+            print(linha)
+    else:
+        print("📤 Exportando a coleção do ChromaDB para o índice NumPy...")
+        print(exportar_indice_numpy(obter_colecao()))
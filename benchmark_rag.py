@@ -0,0 +1,404 @@
+# Benchmark offline do pipeline RAG (sem rede e sem a API do Gemini)
+# - gera um banco IMDB sintético (mesmas colunas do dataset original) num diretório temporário
+# - Fase 1: mede a vazão da vetorização (linhas/s) para cada tamanho de bloco
+# - Fase 2: mede p50/p95/p99 de cada etapa (busca, prompt, geração...) com uma LLM falsa
+#   de latência configurável no lugar de genai_api.client
+# - grava o resultado em JSON e compara com uma linha de base (regressões => código de saída 1)
+#
+# Uso:
+#   python benchmark_rag.py --saida resultado.json
+#   python benchmark_rag.py --comparar linha_de_base.json --tolerancia 0.2
+#
+# O modelo de embeddings precisa estar no cache local (ou ser um caminho local)
+# para rodar sem rede: use HF_HUB_OFFLINE=1 e, se quiser, MODELO_EMBEDDINGS.
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+
+# Colunas do dataset IMDB Top 1000 (o mesmo formato do imdb.db original)
+COLUNAS_SINTETICAS = (
+    "Poster_Link", "Series_Title", "Released_Year", "Certificate", "Runtime", "Genre",
+    "IMDB_Rating", "Overview", "Meta_score", "Director", "Star1", "Star2", "Star3", "Star4",
+    "No_of_Votes", "Gross",
+)
+
+GENEROS = ("Drama", "Crime", "Action", "Comedy", "Adventure", "Sci-Fi", "Thriller",
+           "Romance", "Animation", "Horror", "Fantasy", "Mystery", "War", "Biography")
+NOMES = ("Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Hugo", "Inês",
+         "João", "Karen", "Lucas", "Marina", "Nuno", "Olívia", "Pedro", "Raquel", "Sérgio")
+SOBRENOMES = ("Almeida", "Barros", "Costa", "Duarte", "Esteves", "Ferraz", "Gomes",
+              "Lima", "Moura", "Nogueira", "Pereira", "Queiroz", "Ramos", "Souza", "Teixeira")
+PALAVRAS = ("amor", "guerra", "vingança", "família", "segredo", "viagem", "cidade", "futuro",
+            "memória", "crime", "espaço", "amizade", "traição", "sonho", "mar", "fuga",
+            "detetive", "robô", "rei", "escola", "música", "deserto", "inverno", "herança")
+
+PERGUNTAS_PADRAO = (
+    "Me recomende filmes de ação com muita aventura",
+    "Quais são os melhores dramas sobre família?",
+    "Filmes de ficção científica sobre o futuro e robôs",
+    "Comédias leves para assistir com amigos",
+    "Um suspense com detetive e crime misterioso",
+    "Filmes de guerra bem avaliados",
+    "Animações sobre amizade e sonhos",
+    "Romances com viagem pelo mar",
+)
+
+
+def gerar_banco_sintetico(caminho, linhas, semente=42):
+    """
+    Cria um banco SQLite com uma tabela "movies" no formato do IMDB Top 1000,
+    com valores aleatórios (mas reproduzíveis pela semente).
+
+    Retorna: Caminho do banco criado
+    """
+    import sqlite3
+
+    aleatorio = random.Random(semente)
+
+    def pessoa():
+        return f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)}"
+
+    def gerar_linha(indice):
+        palavras = aleatorio.sample(PALAVRAS, 4)
+        return (
+            f"https://exemplo.com/poster_{indice}.jpg",
+            f"{palavras[0].capitalize()} e {palavras[1]} {indice}",
+            str(aleatorio.randint(1930, 2023)),
+            aleatorio.choice(("U", "UA", "A", "PG-13", "R")),
+            f"{aleatorio.randint(80, 200)} min",
+            ", ".join(aleatorio.sample(GENEROS, aleatorio.randint(1, 3))),
+            round(aleatorio.uniform(7.6, 9.3), 1),
+            f"Uma história de {palavras[0]} e {palavras[1]}, marcada por {palavras[2]} "
+            f"e {palavras[3]}, que muda a vida de {pessoa()}.",
+            aleatorio.randint(40, 100),
+            pessoa(), pessoa(), pessoa(), pessoa(), pessoa(),
+            aleatorio.randint(25000, 2500000),
+            f"{aleatorio.randint(1000, 900000000):,}",
+        )
+
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    conexao = sqlite3.connect(caminho)
+    conexao.execute(f"CREATE TABLE movies ({', '.join(COLUNAS_SINTETICAS)})")
+    conexao.executemany(
+        f"INSERT INTO movies VALUES ({', '.join('?' * len(COLUNAS_SINTETICAS))})",
+        (gerar_linha(indice) for indice in range(linhas))
+    )
+    conexao.commit()
+    conexao.close()
+    return caminho
+
+
+class _RespostaFalsa:
+    def __init__(self, texto):
+        self.text = texto
+
+
+class _ModelosFalsos:
+    """Imita client.models do google-genai, esperando a latência configurada."""
+
+    def __init__(self, latencia, variacao, trechos, semente):
+        self.latencia = latencia
+        self.variacao = variacao
+        self.trechos = trechos
+        self._aleatorio = random.Random(semente)
+
+    def _esperar(self, segundos):
+        if segundos > 0:
+            time.sleep(segundos)
+
+    def _latencia_sorteada(self):
+        return max(0.0, self.latencia + self._aleatorio.uniform(-self.variacao, self.variacao))
+
+    def generate_content(self, model, contents):
+        self._esperar(self._latencia_sorteada())
+        return _RespostaFalsa(f"Resposta simulada ({model}) para um prompt de {len(contents)} caracteres.")
+
+    def generate_content_stream(self, model, contents):
+        latencia = self._latencia_sorteada()
+        for indice in range(self.trechos):
+            self._esperar(latencia / self.trechos)
+            yield _RespostaFalsa(f"trecho {indice + 1} ")
+
+
+class _ModelosFalsosAssincronos:
+    """Imita client.aio.models (modo assíncrono), esperando com asyncio.sleep."""
+
+    def __init__(self, modelos):
+        self._modelos = modelos
+
+    async def generate_content(self, model, contents):
+        await asyncio.sleep(self._modelos._latencia_sorteada())
+        return _RespostaFalsa(f"Resposta simulada ({model}) para um prompt de {len(contents)} caracteres.")
+
+    async def generate_content_stream(self, model, contents):
+        latencia = self._modelos._latencia_sorteada()
+        for indice in range(self._modelos.trechos):
+            await asyncio.sleep(latencia / self._modelos.trechos)
+            yield _RespostaFalsa(f"trecho {indice + 1} ")
+
+
+class _ClienteAssincronoFalso:
+    def __init__(self, modelos):
+        self.models = _ModelosFalsosAssincronos(modelos)
+
+
+class ClienteLLMFalso:
+    """
+    Substituto local do genai_api.client: não acessa a rede e responde após
+    latencia ± variacao segundos (em streaming, dividida entre os trechos).
+    Também imita client.aio, usado pelo modo assíncrono (app_async.py).
+    """
+
+    def __init__(self, latencia=0.05, variacao=0.0, trechos=5, semente=42):
+        self.models = _ModelosFalsos(latencia, variacao, trechos, semente)
+        self.aio = _ClienteAssincronoFalso(self.models)
+
+
+def medir_fase1(tamanhos_bloco, trabalhadores):
+    """
+    Vetoriza o banco sintético do zero (modo completo) uma vez por tamanho de bloco.
+
+    Retorna: Dicionário {tamanho_bloco: {linhas_por_segundo, segundos_total, timings}}
+    """
+    from vetorizacao_fase1 import vetorizar_banco, MODO_COMPLETO
+    from recursos import obter_modelo
+
+    if trabalhadores == 0:
+        # Carrega o modelo antes: o tempo de carga não entra na vazão do primeiro bloco
+        obter_modelo().encode(["aquecimento"])
+
+    resultados = {}
+    for tamanho_bloco in tamanhos_bloco:
+        print(f"⚙️  Fase 1: blocos de {tamanho_bloco} linhas...")
+        resultado = vetorizar_banco(modo=MODO_COMPLETO, tamanho_bloco=tamanho_bloco, trabalhadores=trabalhadores)
+        if resultado.get("status") != "sucesso":
+            raise RuntimeError(resultado.get("mensagem", resultado))
+        tempos = resultado["timings"]
+        resultados[str(tamanho_bloco)] = {
+            "linhas": resultado["total_documentos"],
+            "segundos_total": tempos["total"],
+            "linhas_por_segundo": round(resultado["total_documentos"] / tempos["total"], 2),
+            "timings": tempos,
+        }
+    return resultados
+
+
+def medir_fase2(perguntas, repeticoes, top_k, modos_busca):
+    """
+    Executa as perguntas (repetidas) por processar_pergunta_rag e agrega a duração
+    de cada etapa em percentis. O cache semântico é desativado por executar_benchmark().
+
+    Retorna: Dicionário {modo_busca: {perguntas_por_segundo, etapas: {etapa: percentis}}}
+    """
+    from rag_fase2 import processar_pergunta_rag
+    from metricas import percentis
+
+    resultados = {}
+    for modo_busca in modos_busca:
+        print(f"🔍 Fase 2: {len(perguntas) * repeticoes} perguntas (modo {modo_busca})...")
+        # Uma pergunta de aquecimento (abre o backend de busca e o índice lexical)
+        processar_pergunta_rag(perguntas[0], top_k=top_k, modo_busca=modo_busca)
+
+        duracoes = {}
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            for pergunta in perguntas:
+                resposta = processar_pergunta_rag(pergunta, top_k=top_k, modo_busca=modo_busca, incluir_tempos=True)
+                if resposta.get("status") != "sucesso":
+                    raise RuntimeError(resposta.get("mensagem", resposta))
+                for etapa, segundos in resposta["timings"].items():
+                    duracoes.setdefault(etapa, []).append(segundos)
+        segundos_total = time.perf_counter() - inicio
+
+        resultados[modo_busca] = {
+            "perguntas": len(perguntas) * repeticoes,
+            "perguntas_por_segundo": round(len(perguntas) * repeticoes / segundos_total, 2),
+            "etapas": {etapa: percentis(valores) for etapa, valores in sorted(duracoes.items())},
+        }
+    return resultados
+
+
+def comparar_com_base(atual, base, tolerancia, diferenca_minima_ms=1.0):
+    """
+    Compara o resultado com a linha de base. É regressão:
+    - vazão (linhas_por_segundo, perguntas_por_segundo) menor que base x (1 - tolerancia)
+    - latência p50/p95/p99 maior que base x (1 + tolerancia) e pelo menos
+      diferenca_minima_ms mais lenta (etapas de microssegundos oscilam muito)
+    Métricas que só existem de um lado são ignoradas.
+
+    Retorna: Lista de comparações (dicionários com metrica, base, atual, variacao, regressao)
+    """
+    comparacoes = []
+
+    def comparar(metrica, valor_base, valor_atual, maior_melhor):
+        if not valor_base:
+            return
+        variacao = (valor_atual - valor_base) / valor_base
+        if maior_melhor:
+            regressao = variacao < -tolerancia
+        else:
+            regressao = variacao > tolerancia and valor_atual - valor_base >= diferenca_minima_ms
+        comparacoes.append({
+            "metrica": metrica,
+            "base": valor_base,
+            "atual": valor_atual,
+            "variacao": round(variacao, 4),
+            "regressao": regressao,
+        })
+
+    for tamanho_bloco, dados in atual.get("fase_1", {}).items():
+        dados_base = base.get("fase_1", {}).get(tamanho_bloco)
+        if dados_base:
+            comparar(f"fase_1.bloco_{tamanho_bloco}.linhas_por_segundo",
+                     dados_base["linhas_por_segundo"], dados["linhas_por_segundo"], True)
+
+    for modo_busca, dados in atual.get("fase_2", {}).items():
+        dados_base = base.get("fase_2", {}).get(modo_busca)
+        if not dados_base:
+            continue
+        comparar(f"fase_2.{modo_busca}.perguntas_por_segundo",
+                 dados_base["perguntas_por_segundo"], dados["perguntas_por_segundo"], True)
+        for etapa, valores in dados["etapas"].items():
+            valores_base = dados_base["etapas"].get(etapa)
+            if not valores_base:
+                continue
+            for percentil in ("p50_ms", "p95_ms", "p99_ms"):
+                comparar(f"fase_2.{modo_busca}.{etapa}.{percentil}",
+                         valores_base[percentil], valores[percentil], False)
+    return comparacoes
+
+
+def executar_benchmark(linhas=1000, tamanhos_bloco=(64, 256, 1024), trabalhadores=0,
+                       perguntas=PERGUNTAS_PADRAO, repeticoes=5, top_k=5, modos_busca=("vetorial",),
+                       latencia_llm=0.05, variacao_llm=0.0, semente=42, diretorio=None):
+    """
+    Executa o benchmark completo num diretório isolado (banco e índices temporários).
+    As variáveis de ambiente são definidas ANTES de importar os módulos do projeto,
+    porque configuracao.py lê os caminhos na importação — por isso o benchmark deve
+    rodar num processo próprio (python benchmark_rag.py).
+
+    Retorna: Dicionário com ambiente, fase_1 e fase_2
+    """
+    diretorio_temporario = diretorio is None
+    diretorio = diretorio or tempfile.mkdtemp(prefix="benchmark_rag_")
+    os.environ["CAMINHO_BANCO"] = os.path.join(diretorio, "imdb_sintetico.db")
+    os.environ["CAMINHO_CHROMA"] = os.path.join(diretorio, "chroma_db")
+    os.environ["TAMANHO_CACHE_SEMANTICO"] = "0"        # Cada pergunta percorre o pipeline inteiro
+    os.environ["AQUECER_NA_INICIALIZACAO"] = "0"
+    os.environ.setdefault("NIVEL_LOG", "WARNING")
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+    try:
+        print(f"🗃️  Gerando banco sintético com {linhas} filmes em {diretorio}...")
+        gerar_banco_sintetico(os.environ["CAMINHO_BANCO"], linhas, semente)
+
+        import genai_api
+        from metricas import configurar_logs
+        from configuracao import MODELO_EMBEDDINGS, BACKEND_BUSCA, BACKEND_CODIFICADOR, PRECISAO_INDICE_NUMPY
+
+        configurar_logs()
+        # A LLM falsa substitui o cliente do Gemini (todos os módulos usam genai_api.obter_cliente())
+        cliente_falso = ClienteLLMFalso(latencia=latencia_llm, variacao=variacao_llm, semente=semente)
+        genai_api.client = cliente_falso
+
+        resultado = {
+            "ambiente": {
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "cpus": os.cpu_count(),
+                "modelo_embeddings": MODELO_EMBEDDINGS,
+                "backend_busca": BACKEND_BUSCA,
+                "precisao_indice_numpy": PRECISAO_INDICE_NUMPY,
+                "backend_codificador": BACKEND_CODIFICADOR,
+                "linhas": linhas,
+                "trabalhadores": trabalhadores,
+                "latencia_llm": latencia_llm,
+                "variacao_llm": variacao_llm,
+                "top_k": top_k,
+                "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "fase_1": medir_fase1(tamanhos_bloco, trabalhadores),
+        }
+        resultado["fase_2"] = medir_fase2(list(perguntas), repeticoes, top_k, modos_busca)
+        return resultado
+    finally:
+        if diretorio_temporario:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def _lista_inteiros(texto):
+    return [int(valor) for valor in texto.split(",") if valor.strip()]
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline RAG (Fases 1 e 2)")
+    parser.add_argument("--linhas", type=int, default=1000, help="Filmes no banco sintético")
+    parser.add_argument("--tamanhos-bloco", type=_lista_inteiros, default=[64, 256, 1024],
+                        help="Tamanhos de bloco da Fase 1, separados por vírgula")
+    parser.add_argument("--trabalhadores", type=int, default=0, help="Processos de vetorização da Fase 1")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Repetições do conjunto de perguntas")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--modos-busca", default="vetorial", help="Ex.: vetorial,lexical,hibrida")
+    parser.add_argument("--latencia-llm", type=float, default=0.05, help="Latência da LLM falsa (segundos)")
+    parser.add_argument("--variacao-llm", type=float, default=0.0, help="Variação (+/-) da latência da LLM falsa")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="Arquivo JSON onde gravar o resultado")
+    parser.add_argument("--comparar", help="Arquivo JSON de linha de base para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="Variação aceita antes de considerar regressão (0.2 = 20%%)")
+    parser.add_argument("--diferenca-minima-ms", type=float, default=1.0,
+                        help="Aumento mínimo de latência (ms) para considerar regressão")
+    opcoes = parser.parse_args(argumentos)
+
+    resultado = executar_benchmark(
+        linhas=opcoes.linhas,
+        tamanhos_bloco=opcoes.tamanhos_bloco,
+        trabalhadores=opcoes.trabalhadores,
+        repeticoes=opcoes.repeticoes,
+        top_k=opcoes.top_k,
+        modos_busca=[modo.strip() for modo in opcoes.modos_busca.split(",") if modo.strip()],
+        latencia_llm=opcoes.latencia_llm,
+        variacao_llm=opcoes.variacao_llm,
+        semente=opcoes.semente,
+    )
+
+    regressoes = []
+    if opcoes.comparar:
+        with open(opcoes.comparar, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)
+        comparacoes = comparar_com_base(resultado, base, opcoes.tolerancia, opcoes.diferenca_minima_ms)
+        regressoes = [comparacao for comparacao in comparacoes if comparacao["regressao"]]
+        resultado["comparacao"] = {
+            "linha_de_base": opcoes.comparar,
+            "tolerancia": opcoes.tolerancia,
+            "regressoes": len(regressoes),
+            "metricas": comparacoes,
+        }
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if opcoes.saida:
+        with open(opcoes.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+        print(f"💾 Resultado gravado em {opcoes.saida}")
+    else:
+        print(texto)
+
+    if opcoes.comparar:
+        for comparacao in regressoes:
+            print(f"❌ Regressão em {comparacao['metrica']}: {comparacao['base']} -> {comparacao['atual']} "
+                  f"({comparacao['variacao']:+.1%})")
+        if not regressoes:
+            print(f"✅ Nenhuma regressão acima de {opcoes.tolerancia:.0%} em relação a {opcoes.comparar}")
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# Arquivo responsável pela busca lexical (por palavras) com SQLite FTS5
+# Complementa a busca semântica: nomes próprios ("Nolan", "Al Pacino") e títulos
+# são encontrados com precisão por um índice de texto completo.
+import os
+import re
+import sqlite3
+from configuracao import CAMINHO_INDICE_LEXICAL
+
+# Colunas com nomes próprios (título, direção, elenco): têm peso maior na busca
+COLUNAS_NOMES = (
+    "Series_Title", "title", "original_title",
+    "Director", "director",
+    "Star1", "Star2", "Star3", "Star4", "cast",
+)
+PESO_NOMES = 10.0
+PESO_CONTEUDO = 1.0
+
+# Palavras muito comuns nas perguntas que não ajudam a encontrar filmes
+PALAVRAS_IGNORADAS = {
+    "a", "o", "as", "os", "um", "uma", "de", "do", "da", "dos", "das", "e", "em",
+    "no", "na", "nos", "nas", "com", "por", "para", "que", "me", "se", "sobre",
+    "qual", "quais", "filme", "filmes", "recomende", "mostre", "melhores",
+}
+
+# Constante da fusão por posição recíproca (Reciprocal Rank Fusion)
+K_RRF = 60
+
+
+def abrir_indice_lexical(somente_leitura=False):
+    """
+    Abre (e cria, se preciso) o índice FTS5.
+
+    Retorna: Conexão SQLite
+    """
+    if somente_leitura:
+        return sqlite3.connect(f"file:{CAMINHO_INDICE_LEXICAL}?mode=ro", uri=True)
+
+    os.makedirs(os.path.dirname(CAMINHO_INDICE_LEXICAL) or ".", exist_ok=True)
+    conexao = sqlite3.connect(CAMINHO_INDICE_LEXICAL)
+    # Liga o ID do ChromaDB ao rowid do FTS5 (atualizar/remover pelo rowid é direto)
+    conexao.execute("CREATE TABLE IF NOT EXISTS documentos (id INTEGER PRIMARY KEY, id_doc TEXT UNIQUE)")
+    conexao.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS filmes_fts USING fts5(
+            nomes, conteudo, tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    return conexao
+
+
+def indice_lexical_vazio(conexao):
+    """Indica se o índice ainda não tem documentos (precisa ser populado por completo)."""
+    return conexao.execute("SELECT COUNT(*) FROM filmes_fts").fetchone()[0] == 0
+
+
+def atualizar_indice_lexical(conexao, ids, textos, metadados):
+    """
+    Insere ou substitui documentos no índice (não faz commit).
+
+    Args:
+        ids (list): IDs dos documentos (os mesmos do ChromaDB)
+        textos (list): Texto completo de cada documento
+        metadados (list): Metadados de cada documento (de onde saem os nomes)
+    """
+    for id_doc, texto, metadata in zip(ids, textos, metadados):
+        conexao.execute("INSERT OR IGNORE INTO documentos (id_doc) VALUES (?)", (id_doc,))
+        rowid = conexao.execute("SELECT id FROM documentos WHERE id_doc = ?", (id_doc,)).fetchone()[0]
+        nomes = " ".join(str(metadata[coluna]) for coluna in COLUNAS_NOMES if metadata.get(coluna))
+        conexao.execute("DELETE FROM filmes_fts WHERE rowid = ?", (rowid,))
+        conexao.execute(
+            "INSERT INTO filmes_fts (rowid, nomes, conteudo) VALUES (?, ?, ?)",
+            (rowid, nomes, texto)
+        )
+
+
+def remover_do_indice_lexical(conexao, ids):
+    """Remove documentos do índice (não faz commit)."""
+    for id_doc in ids:
+        linha = conexao.execute("SELECT id FROM documentos WHERE id_doc = ?", (id_doc,)).fetchone()
+        if linha:
+            conexao.execute("DELETE FROM filmes_fts WHERE rowid = ?", (linha[0],))
+            conexao.execute("DELETE FROM documentos WHERE id = ?", (linha[0],))
+
+
+def limpar_indice_lexical(conexao):
+    """Apaga todos os documentos do índice (usado no modo completo da Fase 1)."""
+    conexao.execute("DELETE FROM filmes_fts")
+    conexao.execute("DELETE FROM documentos")
+    conexao.commit()
+
+
+def montar_consulta_fts(pergunta):
+    """
+    Transforma a pergunta em uma consulta FTS5: cada palavra relevante vira um
+    termo entre aspas, combinados com OR (a ordenação fica por conta do BM25).
+
+    Retorna: Consulta FTS5 (str) ou None se não sobrar nenhuma palavra
+    """
+    palavras = [
+        palavra for palavra in re.findall(r"\w+", pergunta.lower())
+        if palavra not in PALAVRAS_IGNORADAS and len(palavra) > 1
+    ]
+    if not palavras:
+        return None
+    return " OR ".join(f'"{palavra}"' for palavra in dict.fromkeys(palavras))
+
+
+def buscar_lexical(pergunta, top_k):
+    """
+    Busca os documentos que contêm as palavras da pergunta, ordenados por BM25
+    (com peso maior para título, direção e elenco).
+
+    Retorna: Lista de IDs de documentos, do mais relevante para o menos relevante
+    """
+    consulta = montar_consulta_fts(pergunta)
+    if consulta is None or not os.path.exists(CAMINHO_INDICE_LEXICAL):
+        return []
+
+    conexao = abrir_indice_lexical(somente_leitura=True)
+    try:
+        linhas = conexao.execute(
+            f"""
+            SELECT d.id_doc FROM (
+                SELECT rowid, bm25(filmes_fts, {PESO_NOMES}, {PESO_CONTEUDO}) AS pontuacao
+                FROM filmes_fts WHERE filmes_fts MATCH ?
+                ORDER BY pontuacao LIMIT ?
+            ) AS f
+            JOIN documentos d ON d.id = f.rowid
+            ORDER BY f.pontuacao
+            """,
+            (consulta, top_k)
+        ).fetchall()
+    finally:
+        conexao.close()
+    return [linha[0] for linha in linhas]
+
+
+def fundir_rrf(listas_de_ids, k=K_RRF):
+    """
+    Combina várias listas ordenadas de IDs com Reciprocal Rank Fusion:
+    cada documento soma 1 / (k + posição) em cada lista em que aparece.
+
+    Retorna: Lista de IDs ordenada pela pontuação combinada
+    """
+    pontuacoes = {}
+    for lista in listas_de_ids:
+        for posicao, id_doc in enumerate(lista, start=1):
+            pontuacoes[id_doc] = pontuacoes.get(id_doc, 0.0) + 1.0 / (k + posicao)
+    return sorted(pontuacoes, key=pontuacoes.get, reverse=True)
@@ -0,0 +1,123 @@
+# Arquivo responsável pelo cache semântico de respostas da Fase 2
+# Perguntas parecidas ("melhores filmes de drama" vs "quais os melhores dramas")
+# têm vetores muito próximos: se a similaridade passar do limiar, reaproveitamos
+# a resposta já gerada em vez de chamar a LLM de novo.
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from metricas import CACHE_SEMANTICO
+from configuracao import LIMIAR_CACHE_SEMANTICO, TTL_CACHE_SEMANTICO, TAMANHO_CACHE_SEMANTICO
+
+
+class CacheSemantico:
+    """
+    Cache de respostas indexado pelo vetor da pergunta.
+    Só reaproveita respostas com a mesma chave (contexto_adicional, top_k e demais
+    parâmetros da busca) e cuja similaridade de cosseno com a pergunta nova seja >= limiar.
+    """
+
+    def __init__(self, limiar, ttl_segundos, tamanho_maximo):
+        self.limiar = limiar
+        self.ttl_segundos = ttl_segundos
+        self.tamanho_maximo = tamanho_maximo
+        self._trava = threading.Lock()
+        # Ordem de uso (LRU): o item mais antigo é o primeiro a ser descartado
+        self._entradas = OrderedDict()
+        self._proximo_id = 0
+        self.acertos = 0
+        self.falhas = 0
+
+    @staticmethod
+    def _normalizar(vetor):
+        vetor = np.asarray(vetor, dtype=np.float32).ravel()
+        norma = np.linalg.norm(vetor)
+        return vetor / norma if norma > 0 else vetor
+
+    def buscar(self, vetor_pergunta, chave):
+        """
+        Procura uma resposta já gerada para uma pergunta parecida.
+
+        Args:
+            vetor_pergunta (list): Vetor da pergunta
+            chave (tuple): Demais parâmetros que precisam ser iguais (ex.: contexto_adicional, top_k)
+
+        Retorna: Tupla (resultado, similaridade) ou (None, None) se não houver acerto
+        """
+        if self.tamanho_maximo <= 0:
+            return None, None
+
+        vetor = self._normalizar(vetor_pergunta)
+        agora = time.time()
+
+        with self._trava:
+            # Remove as entradas expiradas
+            expiradas = [
+                id_entrada for id_entrada, entrada in self._entradas.items()
+                if agora - entrada["criado_em"] > self.ttl_segundos
+            ]
+            for id_entrada in expiradas:
+                del self._entradas[id_entrada]
+
+            candidatas = [
+                (id_entrada, entrada) for id_entrada, entrada in self._entradas.items()
+                if entrada["chave"] == chave
+            ]
+            if candidatas:
+                # Similaridade de cosseno de todas as candidatas de uma vez
+                matriz = np.stack([entrada["vetor"] for _, entrada in candidatas])
+                similaridades = matriz @ vetor
+                melhor = int(np.argmax(similaridades))
+                if similaridades[melhor] >= self.limiar:
+                    id_entrada, entrada = candidatas[melhor]
+                    self._entradas.move_to_end(id_entrada)
+                    self.acertos += 1
+                    CACHE_SEMANTICO.inc(resultado="acerto")
+                    return entrada["resultado"], float(similaridades[melhor])
+
+            self.falhas += 1
+            CACHE_SEMANTICO.inc(resultado="falha")
+            return None, None
+
+    def guardar(self, vetor_pergunta, chave, resultado):
+        """Guarda uma resposta gerada, descartando as mais antigas se o cache estiver cheio."""
+        if self.tamanho_maximo <= 0:
+            return
+
+        with self._trava:
+            self._proximo_id += 1
+            self._entradas[self._proximo_id] = {
+                "vetor": self._normalizar(vetor_pergunta),
+                "chave": chave,
+                "resultado": resultado,
+                "criado_em": time.time(),
+            }
+            while len(self._entradas) > self.tamanho_maximo:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self):
+        """Apaga todas as respostas (chamado quando a Fase 1 atualiza o índice)."""
+        with self._trava:
+            self._entradas.clear()
+
+    def estatisticas(self):
+        """Retorna os contadores de acertos/falhas para ajustar o limiar."""
+        with self._trava:
+            total = self.acertos + self.falhas
+            return {
+                "entradas": len(self._entradas),
+                "tamanho_maximo": self.tamanho_maximo,
+                "limiar_similaridade": self.limiar,
+                "ttl_segundos": self.ttl_segundos,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": round(self.acertos / total, 4) if total else 0.0,
+            }
+
+
+# Cache compartilhado por todas as requisições do processo
+cache_respostas = CacheSemantico(
+    limiar=LIMIAR_CACHE_SEMANTICO,
+    ttl_segundos=TTL_CACHE_SEMANTICO,
+    tamanho_maximo=TAMANHO_CACHE_SEMANTICO,
+)
@@ -0,0 +1,165 @@
+# Arquivo responsável pela coalescência de perguntas idênticas em andamento (single-flight)
+# Quando a mesma pergunta chega várias vezes ao mesmo tempo (ex.: um widget da página
+# inicial), só a primeira percorre o pipeline (vetorização, busca e Gemini); as demais
+# esperam, por no máximo ESPERA_COALESCENCIA segundos, e recebem o mesmo resultado.
+# Uma rajada de N perguntas iguais custa UMA chamada à LLM em vez de N.
+import asyncio
+import json
+import threading
+from metricas import COALESCENCIA, RAZAO_COALESCENCIA
+from configuracao import ESPERA_COALESCENCIA
+
+
+def normalizar_texto(texto):
+    """Minúsculas e espaços repetidos removidos ("  Filmes de  AÇÃO " == "filmes de ação")."""
+    return " ".join(str(texto or "").casefold().split())
+
+
+def chave_coalescencia(pergunta, contexto_adicional, top_k, modo_busca, where):
+    """Parâmetros que precisam ser iguais para duas requisições dividirem o mesmo resultado."""
+    return (normalizar_texto(pergunta), normalizar_texto(contexto_adicional), top_k, modo_busca,
+            json.dumps(where, sort_keys=True))
+
+
+class _Voo:
+    """Uma computação em andamento e quem está esperando por ela."""
+
+    def __init__(self):
+        self.concluido = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class Coalescedor:
+    """
+    Deduplica computações concorrentes com a mesma chave: a primeira (líder) executa,
+    as seguintes (seguidoras) esperam o resultado dela. Se a espera passar de
+    espera_maxima, a seguidora desiste e executa por conta própria.
+    Com espera_maxima <= 0, a coalescência fica desativada.
+    """
+
+    def __init__(self, espera_maxima):
+        self.espera_maxima = espera_maxima
+        self._trava = threading.Lock()
+        self._em_andamento = {}
+        # Versão assíncrona: futures do event loop (acessados só de dentro dele)
+        self._em_andamento_async = {}
+        self.lideres = 0
+        self.seguidoras = 0
+        self.esperas_esgotadas = 0
+
+    def _registrar(self, resultado):
+        with self._trava:
+            if resultado == "lider":
+                self.lideres += 1
+            elif resultado == "seguidora":
+                self.seguidoras += 1
+            else:
+                self.esperas_esgotadas += 1
+            total = self.lideres + self.seguidoras + self.esperas_esgotadas
+            razao = self.seguidoras / total if total else 0.0
+        COALESCENCIA.inc(resultado=resultado)
+        RAZAO_COALESCENCIA.definir(round(razao, 4))
+
+    def executar(self, chave, funcao):
+        """
+        Executa funcao() ou, se já houver uma execução com a mesma chave em
+        andamento, espera o resultado dela.
+
+        Args:
+            chave (tuple): Identifica computações equivalentes
+            funcao (callable): Computação sem argumentos
+
+        Retorna: Tupla (resultado, coalescida) — coalescida=True se veio de outra requisição
+        """
+        if self.espera_maxima <= 0:
+            return funcao(), False
+
+        with self._trava:
+            voo = self._em_andamento.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._em_andamento[chave] = _Voo()
+
+        if not lider:
+            if voo.concluido.wait(self.espera_maxima) and voo.erro is None:
+                self._registrar("seguidora")
+                return voo.resultado, True
+            # A líder demorou demais (ou falhou): segue sozinha, sem bloquear as outras
+            self._registrar("espera_esgotada")
+            return funcao(), False
+
+        self._registrar("lider")
+        try:
+            voo.resultado = funcao()
+            return voo.resultado, False
+        except BaseException as erro:
+            voo.erro = erro
+            raise
+        finally:
+            with self._trava:
+                del self._em_andamento[chave]
+            voo.concluido.set()
+
+    async def executar_async(self, chave, fabrica):
+        """
+        Versão assíncrona de executar(): fabrica() devolve a corrotina da computação.
+
+        Retorna: Tupla (resultado, coalescida)
+        """
+        if self.espera_maxima <= 0:
+            return await fabrica(), False
+
+        futuro = self._em_andamento_async.get(chave)
+        if futuro is not None:
+            try:
+                # shield: o timeout de uma seguidora não cancela a computação da líder
+                resultado = await asyncio.wait_for(asyncio.shield(futuro), self.espera_maxima)
+                self._registrar("seguidora")
+                return resultado, True
+            except asyncio.CancelledError:
+                # Só a líder foi cancelada (o futuro compartilhado): esta requisição segue
+                # e calcula por conta própria. Se o cancelamento é desta requisição, propaga.
+                if not futuro.cancelled():
+                    raise
+                self._registrar("espera_esgotada")
+                return await fabrica(), False
+            except Exception:
+                self._registrar("espera_esgotada")
+                return await fabrica(), False
+
+        futuro = self._em_andamento_async[chave] = asyncio.get_running_loop().create_future()
+        self._registrar("lider")
+        try:
+            resultado = await fabrica()
+            futuro.set_result(resultado)
+            return resultado, False
+        except asyncio.CancelledError:
+            # O cancelamento da líder não é um erro da computação: as seguidoras veem
+            # o futuro cancelado e calculam o próprio resultado
+            futuro.cancel()
+            raise
+        except BaseException as erro:
+            futuro.set_exception(erro)
+            # Evita o aviso "exception was never retrieved" quando ninguém estava esperando
+            futuro.exception()
+            raise
+        finally:
+            del self._em_andamento_async[chave]
+
+    def estatisticas(self):
+        """Quantas requisições lideraram, aproveitaram o resultado de outra ou desistiram de esperar."""
+        with self._trava:
+            total = self.lideres + self.seguidoras + self.esperas_esgotadas
+            return {
+                "espera_maxima_segundos": self.espera_maxima,
+                "em_andamento": len(self._em_andamento) + len(self._em_andamento_async),
+                "lideres": self.lideres,
+                "seguidoras": self.seguidoras,
+                "esperas_esgotadas": self.esperas_esgotadas,
+                "razao_coalescencia": round(self.seguidoras / total, 4) if total else 0.0,
+            }
+
+
+# Coalescedor compartilhado pelas requisições da Fase 2 do processo
+coalescedor = Coalescedor(espera_maxima=ESPERA_COALESCENCIA)
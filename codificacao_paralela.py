@@ -0,0 +1,149 @@
+# Arquivo responsável pela vetorização paralela (vários processos na CPU)
+# Cada processo trabalhador carrega a sua própria cópia do modelo e codifica
+# uma fatia dos textos; os resultados voltam na mesma ordem de entrada.
+import os
+import logging
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from configuracao import MODELO_EMBEDDINGS, BACKEND_CODIFICADOR
+from codificador_onnx import BACKEND_ONNX, carregar_codificador_onnx, garantir_exportacao_onnx
+
+logger = logging.getLogger(__name__)
+
+# Modelo carregado dentro de cada processo trabalhador
+_modelo_trabalhador = None
+
+
+def _inicializar_trabalhador(nome_modelo, threads_por_trabalhador, backend_codificador):
+    """Executado uma vez em cada processo: limita as threads e carrega o modelo."""
+    global _modelo_trabalhador
+
+    # Evita que N processos disputem todos os núcleos cada um (oversubscription)
+    if backend_codificador == BACKEND_ONNX:
+        _modelo_trabalhador = carregar_codificador_onnx(nome_modelo, threads=threads_por_trabalhador)
+        return
+
+    import torch
+    torch.set_num_threads(threads_por_trabalhador)
+
+    from sentence_transformers import SentenceTransformer
+    _modelo_trabalhador = SentenceTransformer(nome_modelo, device="cpu")
+
+
+def _contar_tokens_fatia(textos):
+    """
+    Conta os tokens de uma fatia de textos com o tokenizador do processo trabalhador.
+
+    Retorna: Tupla (contagens, limite de tokens do modelo)
+    """
+    from lotes_tokens import contar_tokens
+    return contar_tokens(_modelo_trabalhador, textos)
+
+
+def _codificar_fatia(textos):
+    """
+    Codifica uma fatia de textos no processo trabalhador.
+
+    Retorna: Tupla (pid, quantidade, segundos, embeddings)
+    """
+    inicio = time.perf_counter()
+    embeddings = _modelo_trabalhador.encode(textos, show_progress_bar=False)
+    return os.getpid(), len(textos), time.perf_counter() - inicio, embeddings
+
+
+class PoolCodificacao:
+    """
+    Pool de processos para vetorização em paralelo.
+    Expõe um método encode() compatível com o do SentenceTransformer, então pode
+    ser usado no lugar do modelo pela Fase 1.
+    """
+
+    def __init__(self, num_trabalhadores, tamanho_fatia=32, nome_modelo=MODELO_EMBEDDINGS,
+                 backend_codificador=BACKEND_CODIFICADOR):
+        self.num_trabalhadores = num_trabalhadores
+        self.tamanho_fatia = tamanho_fatia
+        threads_por_trabalhador = max(1, (os.cpu_count() or 1) // num_trabalhadores)
+
+        if backend_codificador == BACKEND_ONNX:
+            # Exporta antes de iniciar os processos (senão cada um tentaria exportar)
+            garantir_exportacao_onnx(nome_modelo)
+
+        logger.info(f"🧵 Iniciando {num_trabalhadores} processos de vetorização "
+                    f"({threads_por_trabalhador} thread(s) cada)...")
+        # "spawn" evita herdar o estado de threads do PyTorch do processo principal
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_trabalhadores,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_inicializar_trabalhador,
+            initargs=(nome_modelo, threads_por_trabalhador, backend_codificador),
+        )
+        # Estatísticas por processo: pid -> {"documentos": int, "segundos": float}
+        self._estatisticas = {}
+        # Limite de tokens do modelo (conhecido na primeira contagem feita nos trabalhadores)
+        self.limite_tokens = None
+
+    def _fatiar(self, textos):
+        return [
+            textos[inicio:inicio + self.tamanho_fatia]
+            for inicio in range(0, len(textos), self.tamanho_fatia)
+        ]
+
+    def _codificar(self, lotes):
+        """Codifica os lotes em paralelo, devolvendo os vetores na ordem dos lotes."""
+        resultados = []
+        # executor.map devolve os resultados na mesma ordem dos lotes
+        for pid, quantidade, segundos, embeddings in self._executor.map(_codificar_fatia, lotes):
+            estatistica = self._estatisticas.setdefault(pid, {"documentos": 0, "segundos": 0.0})
+            estatistica["documentos"] += quantidade
+            estatistica["segundos"] += segundos
+            resultados.append(embeddings)
+        return resultados
+
+    def encode(self, textos, **kwargs):
+        """
+        Divide os textos em fatias, codifica em paralelo e junta o resultado
+        na ordem original.
+
+        Retorna: numpy.ndarray com um vetor por texto
+        """
+        fatias = self._fatiar(textos)
+        if not fatias:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(self._codificar(fatias))
+
+    def encode_lotes(self, lotes):
+        """
+        Codifica lotes já montados (ex.: por orçamento de tokens), um por tarefa.
+
+        Retorna: Lista de numpy.ndarray, um por lote, na ordem dos lotes
+        """
+        return self._codificar(lotes)
+
+    def contar_tokens(self, textos):
+        """Tokens de cada texto antes do truncamento, contados em paralelo nos trabalhadores."""
+        contagens = []
+        for contagens_fatia, limite in self._executor.map(_contar_tokens_fatia, self._fatiar(textos)):
+            contagens.extend(contagens_fatia)
+            self.limite_tokens = limite
+        return contagens
+
+    def estatisticas(self):
+        """
+        Retorna a vazão de cada processo trabalhador (documentos por segundo).
+        """
+        return [
+            {
+                "pid": pid,
+                "documentos": estatistica["documentos"],
+                "segundos": round(estatistica["segundos"], 3),
+                "documentos_por_segundo": round(estatistica["documentos"] / estatistica["segundos"], 2)
+                if estatistica["segundos"] > 0 else 0.0,
+            }
+            for pid, estatistica in sorted(self._estatisticas.items())
+        ]
+
+    def fechar(self):
+        """Encerra os processos trabalhadores."""
+        self._executor.shutdown(wait=True)
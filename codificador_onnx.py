@@ -0,0 +1,274 @@
+# Arquivo responsável pelo codificador ONNX (vetorização sem PyTorch)
+# O modelo de embeddings é exportado UMA vez para ONNX (opcionalmente quantizado
+# em int8) e depois executado com o ONNX Runtime na CPU. A tokenização, o pooling
+# e a normalização são os mesmos do SentenceTransformer, então os vetores são
+# equivalentes (verificar_paridade confere isso) e a busca não muda.
+import os
+import json
+import inspect
+import logging
+import numpy as np
+from configuracao import MODELO_EMBEDDINGS, CAMINHO_MODELO_ONNX, ONNX_QUANTIZADO
+
+logger = logging.getLogger(__name__)
+
+BACKEND_PYTORCH = "pytorch"
+BACKEND_ONNX = "onnx"
+BACKENDS_CODIFICADOR = (BACKEND_PYTORCH, BACKEND_ONNX)
+
+# Arquivos gerados pela exportação
+ARQUIVO_ONNX = "modelo.onnx"
+ARQUIVO_ONNX_INT8 = "modelo_int8.onnx"
+ARQUIVO_TOKENIZADOR = "tokenizer.json"
+ARQUIVO_CONFIGURACAO = "configuracao_onnx.json"
+
+# Similaridade de cosseno mínima entre os vetores ONNX e PyTorch (por texto)
+LIMIAR_PARIDADE = 0.99
+LIMIAR_PARIDADE_INT8 = 0.95
+
+# Textos usados na verificação de paridade quando nenhum é informado
+TEXTOS_PARIDADE = [
+    "Me recomende filmes de ação emocionantes",
+    "Quais são os melhores filmes de drama?",
+    "Filmes de comédia para assistir com a família",
+    "Filmes dirigidos por Christopher Nolan",
+    "The Shawshank Redemption 1994 Drama Frank Darabont Tim Robbins",
+    "A thief who steals corporate secrets through the use of dream-sharing technology",
+    "Quero assistir um filme de suspense psicológico",
+    "animação",
+]
+
+
+def exportar_onnx(nome_modelo=MODELO_EMBEDDINGS, diretorio=CAMINHO_MODELO_ONNX, quantizar_int8=ONNX_QUANTIZADO):
+    """
+    Exporta o modelo do SentenceTransformer para ONNX (usa PyTorch só aqui).
+    Grava também o tokenizador e a configuração de pooling/normalização do modelo.
+
+    Args:
+        nome_modelo (str): Nome ou caminho do modelo do SentenceTransformer
+        diretorio (str): Onde gravar os arquivos
+        quantizar_int8 (bool): Gera também a versão com pesos int8 (quantização dinâmica)
+
+    Retorna: Dicionário com os arquivos gerados
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    logger.info(f"📦 Exportando {nome_modelo} para ONNX...")
+    os.makedirs(diretorio, exist_ok=True)
+    modelo = SentenceTransformer(nome_modelo, device="cpu")
+    transformer = modelo[0].auto_model.eval()
+    tokenizador = modelo.tokenizer
+
+    # Configuração do pooling e da normalização (lida dos módulos do próprio modelo)
+    pooling = "mean"
+    normalizar = False
+    for modulo in modelo:
+        nome_classe = type(modulo).__name__
+        if nome_classe == "Pooling":
+            configuracao_pooling = modulo.get_config_dict()
+            if configuracao_pooling.get("pooling_mode_cls_token"):
+                pooling = "cls"
+            elif configuracao_pooling.get("pooling_mode_max_tokens"):
+                pooling = "max"
+        elif nome_classe == "Normalize":
+            normalizar = True
+
+    entradas = [nome for nome in ("input_ids", "attention_mask", "token_type_ids")
+                if nome in tokenizador.model_input_names]
+
+    class _Transformer(torch.nn.Module):
+        """Expõe só o last_hidden_state, com as entradas como argumentos posicionais."""
+
+        def __init__(self, modelo_base):
+            super().__init__()
+            self.modelo_base = modelo_base
+
+        def forward(self, *tensores):
+            return self.modelo_base(**dict(zip(entradas, tensores))).last_hidden_state
+
+    exemplo = tokenizador(["exemplo de texto"], return_tensors="pt")
+    eixos = {nome: {0: "lote", 1: "tokens"} for nome in entradas}
+    eixos["last_hidden_state"] = {0: "lote", 1: "tokens"}
+    caminho_onnx = os.path.join(diretorio, ARQUIVO_ONNX)
+    # Versões novas do PyTorch têm um segundo exportador (dynamo): usamos o clássico,
+    # disponível em todas as versões e compatível com dynamic_axes
+    opcoes = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            _Transformer(transformer), tuple(exemplo[nome] for nome in entradas), caminho_onnx,
+            input_names=entradas, output_names=["last_hidden_state"],
+            dynamic_axes=eixos, opset_version=17, **opcoes,
+        )
+
+    tokenizador.backend_tokenizer.save(os.path.join(diretorio, ARQUIVO_TOKENIZADOR))
+    with open(os.path.join(diretorio, ARQUIVO_CONFIGURACAO), "w", encoding="utf-8") as arquivo:
+        json.dump({
+            "modelo": nome_modelo,
+            "max_seq_length": modelo.max_seq_length,
+            "pooling": pooling,
+            "normalizar": normalizar,
+            "entradas": entradas,
+            "id_padding": tokenizador.pad_token_id or 0,
+            "dimensao": modelo.get_sentence_embedding_dimension(),
+        }, arquivo, indent=2)
+
+    arquivos = [caminho_onnx]
+    if quantizar_int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        logger.info("🗜️  Quantizando os pesos para int8...")
+        caminho_int8 = os.path.join(diretorio, ARQUIVO_ONNX_INT8)
+        quantize_dynamic(caminho_onnx, caminho_int8, weight_type=QuantType.QInt8)
+        arquivos.append(caminho_int8)
+
+    logger.info("✅ Modelo exportado para ONNX!")
+    return {"diretorio": diretorio, "arquivos": arquivos, "pooling": pooling, "normalizar": normalizar}
+
+
+class CodificadorOnnx:
+    """
+    Codificador com ONNX Runtime (CPU). Expõe um método encode() compatível com
+    o do SentenceTransformer, então pode ser usado no lugar do modelo nas Fases 1 e 2.
+    """
+
+    def __init__(self, diretorio=CAMINHO_MODELO_ONNX, quantizado=ONNX_QUANTIZADO, threads=None):
+        from metricas import importar
+        onnxruntime = importar("onnxruntime")
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(diretorio, ARQUIVO_CONFIGURACAO), encoding="utf-8") as arquivo:
+            self.configuracao = json.load(arquivo)
+        self.quantizado = quantizado
+
+        # Mesmo truncamento e padding do tokenizador usado pelo SentenceTransformer
+        self.tokenizador = Tokenizer.from_file(os.path.join(diretorio, ARQUIVO_TOKENIZADOR))
+        self.tokenizador.enable_truncation(max_length=self.configuracao["max_seq_length"])
+        self.tokenizador.enable_padding(pad_id=self.configuracao["id_padding"])
+        # Cópia sem truncamento nem padding, só para contar os tokens de cada texto
+        self._tokenizador_contagem = Tokenizer.from_file(os.path.join(diretorio, ARQUIVO_TOKENIZADOR))
+        self._tokenizador_contagem.no_truncation()
+        self._tokenizador_contagem.no_padding()
+        self.limite_tokens = self.configuracao["max_seq_length"]
+
+        opcoes = onnxruntime.SessionOptions()
+        if threads:
+            opcoes.intra_op_num_threads = threads
+        arquivo_modelo = ARQUIVO_ONNX_INT8 if quantizado else ARQUIVO_ONNX
+        self.sessao = onnxruntime.InferenceSession(
+            os.path.join(diretorio, arquivo_modelo), opcoes, providers=["CPUExecutionProvider"]
+        )
+
+    def encode(self, textos, batch_size=32, **kwargs):
+        """
+        Codifica os textos em lotes (ordenados por tamanho para reduzir o padding).
+        Argumentos extras do SentenceTransformer (ex.: show_progress_bar) são ignorados.
+
+        Retorna: numpy.ndarray (float32) com um vetor por texto, na ordem de entrada
+        """
+        if isinstance(textos, str):
+            textos = [textos]
+        saida = np.empty((len(textos), self.configuracao["dimensao"]), dtype=np.float32)
+        ordem = sorted(range(len(textos)), key=lambda i: len(textos[i]))
+
+        for inicio in range(0, len(ordem), batch_size):
+            indices = ordem[inicio:inicio + batch_size]
+            codificados = self.tokenizador.encode_batch([textos[i] for i in indices])
+            tensores = {
+                "input_ids": np.array([c.ids for c in codificados], dtype=np.int64),
+                "attention_mask": np.array([c.attention_mask for c in codificados], dtype=np.int64),
+                "token_type_ids": np.array([c.type_ids for c in codificados], dtype=np.int64),
+            }
+            estados = self.sessao.run(None, {nome: tensores[nome] for nome in self.configuracao["entradas"]})[0]
+            saida[indices] = self._pooling(estados, tensores["attention_mask"])
+        return saida
+
+    def contar_tokens(self, textos):
+        """Tokens de cada texto antes do truncamento (com os tokens especiais)."""
+        return [len(codificado.ids) for codificado in self._tokenizador_contagem.encode_batch(list(textos))]
+
+    def _pooling(self, estados, mascara):
+        """Pooling (mean/cls/max) e normalização, como nos módulos do SentenceTransformer."""
+        if self.configuracao["pooling"] == "cls":
+            vetores = estados[:, 0]
+        elif self.configuracao["pooling"] == "max":
+            vetores = np.where(mascara[:, :, None] > 0, estados, -1e9).max(axis=1)
+        else:
+            pesos = mascara[:, :, None].astype(np.float32)
+            vetores = (estados * pesos).sum(axis=1) / np.maximum(pesos.sum(axis=1), 1e-9)
+        if self.configuracao["normalizar"]:
+            vetores = vetores / np.maximum(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12)
+        return vetores.astype(np.float32)
+
+
+def garantir_exportacao_onnx(nome_modelo=MODELO_EMBEDDINGS, diretorio=CAMINHO_MODELO_ONNX,
+                             quantizado=ONNX_QUANTIZADO):
+    """Exporta o modelo se ele ainda não foi exportado (ou se foi exportado a partir de outro modelo)."""
+    caminho_configuracao = os.path.join(diretorio, ARQUIVO_CONFIGURACAO)
+    arquivo_modelo = os.path.join(diretorio, ARQUIVO_ONNX_INT8 if quantizado else ARQUIVO_ONNX)
+    exportado = None
+    if os.path.exists(caminho_configuracao) and os.path.exists(arquivo_modelo):
+        with open(caminho_configuracao, encoding="utf-8") as arquivo:
+            exportado = json.load(arquivo).get("modelo")
+    if exportado != nome_modelo:
+        exportar_onnx(nome_modelo, diretorio, quantizar_int8=quantizado)
+
+
+def carregar_codificador_onnx(nome_modelo=MODELO_EMBEDDINGS, diretorio=CAMINHO_MODELO_ONNX,
+                              quantizado=ONNX_QUANTIZADO, threads=None):
+    """Retorna o codificador ONNX, exportando o modelo antes se for preciso."""
+    garantir_exportacao_onnx(nome_modelo, diretorio, quantizado)
+    return CodificadorOnnx(diretorio, quantizado, threads)
+
+
+def verificar_paridade(nome_modelo=MODELO_EMBEDDINGS, diretorio=CAMINHO_MODELO_ONNX,
+                       quantizado=ONNX_QUANTIZADO, textos=None):
+    """
+    Compara os vetores do codificador ONNX com os do SentenceTransformer (PyTorch):
+    similaridade de cosseno texto a texto e se o vizinho mais próximo de cada
+    texto é o mesmo nos dois (ou seja, se a busca daria o mesmo resultado).
+
+    Retorna: Dicionário com as similaridades e "aprovado" (bool)
+    """
+    from sentence_transformers import SentenceTransformer
+
+    textos = textos or TEXTOS_PARIDADE
+    referencia = SentenceTransformer(nome_modelo, device="cpu").encode(textos, show_progress_bar=False)
+    onnx = carregar_codificador_onnx(nome_modelo, diretorio, quantizado).encode(textos)
+
+    referencia = referencia / np.linalg.norm(referencia, axis=1, keepdims=True)
+    onnx = onnx / np.linalg.norm(onnx, axis=1, keepdims=True)
+    similaridades = (referencia * onnx).sum(axis=1)
+
+    def vizinhos(vetores):
+        matriz = vetores @ vetores.T
+        np.fill_diagonal(matriz, -np.inf)
+        return matriz.argmax(axis=1)
+
+    limiar = LIMIAR_PARIDADE_INT8 if quantizado else LIMIAR_PARIDADE
+    mesmos_vizinhos = float((vizinhos(referencia) == vizinhos(onnx)).mean())
+    return {
+        "quantizado": quantizado,
+        "similaridade_minima": round(float(similaridades.min()), 6),
+        "similaridade_media": round(float(similaridades.mean()), 6),
+        "mesmo_vizinho_mais_proximo": round(mesmos_vizinhos, 4),
+        "limiar": limiar,
+        "aprovado": bool(similaridades.min() >= limiar and mesmos_vizinhos == 1.0),
+    }
+
+
+# Uso:
+#   python codificador_onnx.py exportar   -> exporta o modelo (e a versão int8, se ONNX_QUANTIZADO=1)
+#   python codificador_onnx.py paridade   -> compara os vetores ONNX com os do PyTorch
+if __name__ == "__main__":
+    import sys
+    from metricas import configurar_logs
+
+    configurar_logs()
+    comando = sys.argv[1] if len(sys.argv) > 1 else "paridade"
+    if comando == "exportar":
+        print(exportar_onnx())
+    else:
+        resultado = verificar_paridade()
+        print(resultado)
+        print("✅ Paridade OK!" if resultado["aprovado"] else "❌ Os vetores ONNX divergem do PyTorch!")
@@ -0,0 +1,129 @@
+# Arquivo com as configurações compartilhadas do projeto RAG
+# Cada valor pode ser sobrescrito por uma variável de ambiente de mesmo nome
+import os
+
+# Banco de dados SQLite de origem
+CAMINHO_BANCO = os.environ.get("CAMINHO_BANCO", "imdb.db")
+# Leitura do banco de origem (acesso_dados.py): conexões somente leitura no pool,
+# bytes mapeados em memória (mmap) e cache de páginas de cada conexão
+CONEXOES_LEITURA_SQLITE = int(os.environ.get("CONEXOES_LEITURA_SQLITE", "4"))
+MMAP_SQLITE_BYTES = int(os.environ.get("MMAP_SQLITE_BYTES", str(256 * 1024 * 1024)))
+CACHE_SQLITE_KIB = int(os.environ.get("CACHE_SQLITE_KIB", str(16 * 1024)))
+# Intervalo mínimo (ms) entre duas verificações de mudança no banco (stat + PRAGMA data_version);
+# uma gravação no banco de origem pode levar até esse tempo para invalidar o cache (0 = verifica sempre)
+INTERVALO_VERIFICACAO_SQLITE_MS = int(os.environ.get("INTERVALO_VERIFICACAO_SQLITE_MS", "100"))
+
+# Banco vetorial ChromaDB
+CAMINHO_CHROMA = os.environ.get("CAMINHO_CHROMA", "./chroma_db")
+NOME_COLECAO = os.environ.get("NOME_COLECAO", "imdb_vetores")
+
+# Índice lexical (SQLite FTS5) construído pela Fase 1 para a busca híbrida
+CAMINHO_INDICE_LEXICAL = os.environ.get(
+    "CAMINHO_INDICE_LEXICAL", os.path.join(CAMINHO_CHROMA, "indice_lexical.db")
+)
+
+# Parâmetros do índice HNSW da coleção do ChromaDB (os padrões são os do próprio Chroma):
+# espaço ("l2", "cosine" ou "ip"), conexões por nó (M) e tamanho das listas de candidatos
+# na construção e na busca (maiores = recall maior, índice mais lento/maior).
+# Valem na criação da coleção: se mudarem, a Fase 1 recria o índice com os vetores já calculados
+ESPACO_HNSW = os.environ.get("ESPACO_HNSW", "l2")
+M_HNSW = int(os.environ.get("M_HNSW", "16"))
+CONSTRUCTION_EF_HNSW = int(os.environ.get("CONSTRUCTION_EF_HNSW", "100"))
+SEARCH_EF_HNSW = int(os.environ.get("SEARCH_EF_HNSW", "10"))
+
+# Backend da busca vetorial da Fase 2: "chroma" (coleção do ChromaDB),
+# "numpy" (busca exata em memória sobre os vetores exportados pela Fase 1) ou
+# "snapshot" (a mesma busca sobre o snapshot imutável mais recente publicado pela Fase 1)
+BACKEND_BUSCA = os.environ.get("BACKEND_BUSCA", "chroma")
+CAMINHO_INDICE_NUMPY = os.environ.get("CAMINHO_INDICE_NUMPY", os.path.join(CAMINHO_CHROMA, "indice_numpy"))
+
+# Snapshots versionados do índice (para réplicas da API): a Fase 1 publica um quando
+# BACKEND_BUSCA = "snapshot" ou PUBLICAR_SNAPSHOT = "1"; os SNAPSHOTS_MANTIDOS mais
+# recentes ficam no disco (para voltar a uma versão anterior)
+CAMINHO_SNAPSHOTS = os.environ.get("CAMINHO_SNAPSHOTS", os.path.join(CAMINHO_CHROMA, "snapshots"))
+PUBLICAR_SNAPSHOT = os.environ.get("PUBLICAR_SNAPSHOT", "0") == "1"
+SNAPSHOTS_MANTIDOS = int(os.environ.get("SNAPSHOTS_MANTIDOS", "3"))
+# Conferir o SHA-256 dos arquivos ao abrir um snapshot ("0" = só o tamanho)
+VERIFICAR_CHECKSUM_SNAPSHOT = os.environ.get("VERIFICAR_CHECKSUM_SNAPSHOT", "1") == "1"
+# A cada quantos segundos a API confere se o ATUAL aponta para outra versão do snapshot
+# ou do índice NumPy (0 = não confere)
+INTERVALO_VERIFICACAO_SNAPSHOT = float(os.environ.get("INTERVALO_VERIFICACAO_SNAPSHOT", "5"))
+
+# Precisão dos vetores do índice NumPy: "float32", "float16" (2x menor) ou "int8" (4x menor)
+PRECISAO_INDICE_NUMPY = os.environ.get("PRECISAO_INDICE_NUMPY", "float32")
+# Com float16/int8: quantos candidatos por resultado são repontuados com os vetores
+# float32 (ex.: 4 = top_k x 4 candidatos). 0 = sem repontuação (float32 nem é gravado)
+FATOR_REPONTUACAO_NUMPY = int(os.environ.get("FATOR_REPONTUACAO_NUMPY", "0"))
+
+# Grafo de "filmes similares": a Fase 1 calcula os k filmes mais parecidos de cada
+# filme (0 = desativado) e grava em um banco SQLite consultado por /filmes/similares
+VIZINHOS_SIMILARES = int(os.environ.get("VIZINHOS_SIMILARES", "0"))
+CAMINHO_FILMES_SIMILARES = os.environ.get(
+    "CAMINHO_FILMES_SIMILARES", os.path.join(CAMINHO_CHROMA, "filmes_similares.db")
+)
+
+# Modo de busca padrão da Fase 2: "vetorial", "lexical" ou "hibrida"
+MODO_BUSCA_PADRAO = os.environ.get("MODO_BUSCA_PADRAO", "vetorial")
+
+# Quantidade de linhas lidas, vetorizadas e gravadas por vez na Fase 1
+TAMANHO_BLOCO_VETORIZACAO = int(os.environ.get("TAMANHO_BLOCO_VETORIZACAO", "256"))
+
+# Colunas que formam o texto vetorizado de cada filme, nesta ordem (separadas por vírgula;
+# as que não existirem na tabela são ignoradas). "*" = todas as colunas, como antes
+# (inclui URL do pôster, bilheteria, duração... que só gastam tokens do modelo)
+COLUNAS_DOCUMENTO = [
+    coluna.strip() for coluna in os.environ.get(
+        "COLUNAS_DOCUMENTO",
+        "Series_Title,title,Released_Year,year,Genre,genres,Director,director,"
+        "Star1,Star2,Star3,Star4,cast,Overview,overview",
+    ).split(",") if coluna.strip()
+]
+
+# Tokens por lote de vetorização (contando o padding): os textos são agrupados por
+# tamanho e cada lote leva tantos textos quantos couberem neste orçamento
+ORCAMENTO_TOKENS_LOTE = int(os.environ.get("ORCAMENTO_TOKENS_LOTE", "8192"))
+
+# Processos de vetorização em paralelo na Fase 1 (0 = desativado)
+TRABALHADORES_VETORIZACAO = int(os.environ.get("TRABALHADORES_VETORIZACAO", "0"))
+
+# Modelo de embeddings (o mesmo nas Fases 1 e 2)
+MODELO_EMBEDDINGS = os.environ.get("MODELO_EMBEDDINGS", "all-MiniLM-L6-v2")
+
+# Codificador do modelo de embeddings: "pytorch" (SentenceTransformer) ou "onnx"
+# (ONNX Runtime na CPU, sem importar o PyTorch; o modelo é exportado na primeira vez)
+BACKEND_CODIFICADOR = os.environ.get("BACKEND_CODIFICADOR", "pytorch")
+CAMINHO_MODELO_ONNX = os.environ.get("CAMINHO_MODELO_ONNX", "./modelo_onnx")
+ONNX_QUANTIZADO = os.environ.get("ONNX_QUANTIZADO", "0") == "1"  # Pesos int8 (quantização dinâmica)
+
+# Modelo da LLM Gemini
+MODELO_LLM = os.environ.get("MODELO_LLM", "gemini-3-flash-preview")
+
+# Orçamento (aproximado) de tokens para os trechos de filmes no prompt da Fase 2
+ORCAMENTO_TOKENS_CONTEXTO = int(os.environ.get("ORCAMENTO_TOKENS_CONTEXTO", "1500"))
+
+# Máximo de chamadas simultâneas à LLM no endpoint de lote da Fase 2
+CONCORRENCIA_LOTE_LLM = int(os.environ.get("CONCORRENCIA_LOTE_LLM", "8"))
+
+# Modo assíncrono (app_async.py): máximo de chamadas à LLM em andamento ao mesmo tempo
+# (as demais perguntas esperam na fila) e threads para a vetorização/busca (trabalho de CPU)
+MAXIMO_LLM_SIMULTANEAS = int(os.environ.get("MAXIMO_LLM_SIMULTANEAS", "256"))
+THREADS_CPU_ASSINCRONO = int(os.environ.get("THREADS_CPU_ASSINCRONO", str(min(8, os.cpu_count() or 1))))
+
+# Cache semântico de respostas da Fase 2
+LIMIAR_CACHE_SEMANTICO = float(os.environ.get("LIMIAR_CACHE_SEMANTICO", "0.95"))  # Similaridade de cosseno mínima
+TTL_CACHE_SEMANTICO = int(os.environ.get("TTL_CACHE_SEMANTICO", "3600"))          # Segundos
+TAMANHO_CACHE_SEMANTICO = int(os.environ.get("TAMANHO_CACHE_SEMANTICO", "1000"))  # 0 = desativado
+
+# Perguntas idênticas em andamento dividem o mesmo resultado (uma única chamada à LLM);
+# as repetidas esperam no máximo este tempo pela primeira
+ESPERA_COALESCENCIA = float(os.environ.get("ESPERA_COALESCENCIA", "60"))  # Segundos; 0 = desativado
+
+# Nível dos logs: DEBUG, INFO, WARNING, ERROR ou DESATIVADO
+NIVEL_LOG = os.environ.get("NIVEL_LOG", "INFO")
+
+# Carregar modelo e coleção na inicialização da API ("1" = sim, "0" = não)
+AQUECER_NA_INICIALIZACAO = os.environ.get("AQUECER_NA_INICIALIZACAO", "1") == "1"
+
+# Aquecer em segundo plano ("1"): a API aceita conexões na hora e /saude/pronto
+# responde 503 até o modelo e o índice estarem carregados. "0" = aquecer antes de subir
+AQUECER_EM_SEGUNDO_PLANO = os.environ.get("AQUECER_EM_SEGUNDO_PLANO", "1") == "1"
@@ -1,5 +1,32 @@
 # Script para consultar os vetores armazenados no ChromaDB
+# - sem argumentos: quantidade de vetores e um documento de exemplo de cada coleção
+# - "diagnostico": compara parâmetros do índice HNSW (espaço, M, construction_ef,
+#   search_ef) em recall@k contra a busca exata, latência das consultas, tempo de
+#   construção do índice e tamanho em disco
+#
+# Uso:
+#   python consultar_vetores.py
+#   python consultar_vetores.py diagnostico --k 10 --amostras 200
+#   python consultar_vetores.py diagnostico --m 8 16 32 --search-ef 10 50 100 --saida hnsw.json
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import itertools
+import tempfile
+import numpy as np
 import chromadb
+from configuracao import (
+    CAMINHO_CHROMA, NOME_COLECAO, ESPACO_HNSW, M_HNSW, CONSTRUCTION_EF_HNSW, SEARCH_EF_HNSW,
+)
+from recursos import parametros_hnsw, parametros_colecao
+from backends_busca import ler_vetores_colecao
+from metricas import percentis
+
+# Vetores gravados por vez na construção de cada índice de teste
+TAMANHO_LOTE_CONSTRUCAO = 1000
 
 def consultar_vetores():
     """Consulta informações sobre os vetores armazenados"""
@@ -7,7 +34,7 @@ def consultar_vetores():
     try:
         # Conectar ao ChromaDB persistente
         print("Conectando ao ChromaDB...")
-        cliente = chromadb.PersistentClient(path="./chroma_db")
+        cliente = chromadb.PersistentClient(path=CAMINHO_CHROMA)
         
         # Listar todas as coleções
         colecoes = cliente.list_collections()
@@ -24,6 +51,7 @@ def consultar_vetores():
         for colecao in colecoes:
             print(f"\nColecao: {colecao.name}")
             print(f"   Total de vetores: {colecao.count()}")
+            print(f"   Parametros HNSW: {parametros_colecao(colecao)}")
             
             # Pegar um exemplo de vetor
             if colecao.count() > 0:
@@ -41,12 +69,179 @@ def consultar_vetores():
                         print(f"      - {chave}: {metadata[chave][:50] if len(str(metadata[chave])) > 50 else metadata[chave]}")
         
         print("\n" + "=" * 60)
-        print(f"\nLocal de armazenamento: ./chroma_db")
+        print(f"\nLocal de armazenamento: {CAMINHO_CHROMA}")
         print("Os vetores estao salvos em arquivo e podem ser reutilizados!\n")
         
     except Exception as erro:
         print(f"\nErro ao consultar vetores: {erro}")
         print("Certifique-se de que a vetorizacao foi executada.\n")
 
+
+def tamanho_diretorio(diretorio):
+    """Soma o tamanho (bytes) de todos os arquivos do diretório."""
+    return sum(
+        os.path.getsize(os.path.join(raiz, arquivo))
+        for raiz, _, arquivos in os.walk(diretorio) for arquivo in arquivos
+    )
+
+
+def vizinhos_exatos(vetores, consultas, k, espaco):
+    """
+    Top-k exato (força bruta) de cada consulta, na mesma métrica do índice.
+
+    Retorna: Lista de conjuntos de posições
+    """
+    if espaco == "l2":
+        # ||q - v||² = ||v||² - 2<q, v> (o ||q||² não muda a ordem)
+        pontuacoes = -(np.sum(vetores ** 2, axis=1) - 2 * consultas @ vetores.T)
+    elif espaco == "cosine":
+        normalizados = vetores / np.maximum(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12)
+        pontuacoes = consultas @ normalizados.T
+    else:
+        pontuacoes = consultas @ vetores.T
+    return [set(np.argpartition(-linha, k - 1)[:k].tolist()) for linha in pontuacoes]
+
+
+def medir_consultas(colecao, consultas, k, exatos, posicoes):
+    """Consulta a coleção uma pergunta por vez: recall@k e percentis da latência."""
+    latencias = []
+    acertos = []
+    for consulta, exato in zip(consultas, exatos):
+        inicio = time.perf_counter()
+        resultado = colecao.query(query_embeddings=[consulta.tolist()], n_results=k, include=[])
+        latencias.append(time.perf_counter() - inicio)
+        encontrados = {posicoes[id_doc] for id_doc in resultado["ids"][0]}
+        acertos.append(len(encontrados & exato) / k)
+    return {f"recall@{k}": round(float(np.mean(acertos)), 4), "latencia": percentis(latencias)}
+
+
+def diagnosticar_hnsw(configuracoes, k=10, amostras=200, ruido=0.05, semente=0):
+    """
+    Avalia cada conjunto de parâmetros HNSW com os vetores da coleção atual:
+    constrói um índice de teste (em um diretório temporário), mede o tempo de
+    construção e o tamanho em disco e compara o top-k de cada consulta com o
+    top-k exato. As consultas são vetores sorteados do acervo com um pequeno
+    ruído (para não serem idênticas a um documento). A coleção em uso também é
+    medida, como referência.
+
+    Args:
+        configuracoes (list): Dicionários de parametros_hnsw() a avaliar
+        k (int): Tamanho do top-k comparado
+        amostras (int): Quantidade de consultas
+        ruido (float): Desvio do ruído somado às consultas (relativo à norma do vetor)
+
+    Retorna: Lista de dicionários, um por configuração avaliada
+    """
+    cliente = chromadb.PersistentClient(path=CAMINHO_CHROMA)
+    # get_collection, e não abrir_colecao: o diagnóstico não cria uma coleção vazia
+    try:
+        colecao = cliente.get_collection(name=NOME_COLECAO)
+    except ValueError:
+        raise ValueError(f"A coleção {NOME_COLECAO} não existe em {CAMINHO_CHROMA}. "
+                         "Execute a Fase 1 antes do diagnóstico.")
+    ids, documentos, metadados, vetores = ler_vetores_colecao(colecao, normalizar=False)
+    if len(ids) == 0:
+        raise ValueError("A coleção está vazia. Execute a Fase 1 antes do diagnóstico.")
+
+    gerador = np.random.default_rng(semente)
+    k = min(k, len(ids))
+    escolhidos = gerador.choice(len(ids), size=min(amostras, len(ids)), replace=False)
+    normas = np.linalg.norm(vetores[escolhidos], axis=1, keepdims=True)
+    consultas = (vetores[escolhidos] + gerador.normal(scale=ruido, size=(len(escolhidos), vetores.shape[1]))
+                 * normas / np.sqrt(vetores.shape[1])).astype(np.float32)
+    posicoes = {id_doc: i for i, id_doc in enumerate(ids)}
+    exatos_por_espaco = {}
+
+    def exatos(espaco):
+        if espaco not in exatos_por_espaco:
+            exatos_por_espaco[espaco] = vizinhos_exatos(vetores, consultas, k, espaco)
+        return exatos_por_espaco[espaco]
+
+    atuais = parametros_colecao(colecao)
+    relatorio = [{
+        "configuracao": "colecao_atual",
+        **atuais,
+        "segundos_construcao": None,
+        "bytes_disco": tamanho_diretorio(CAMINHO_CHROMA),
+        **medir_consultas(colecao, consultas, k, exatos(atuais["hnsw:space"]), posicoes),
+    }]
+
+    for parametros in configuracoes:
+        diretorio = tempfile.mkdtemp(prefix="diagnostico_hnsw_")
+        try:
+            cliente_teste = chromadb.PersistentClient(path=diretorio)
+            teste = cliente_teste.create_collection(name="diagnostico", metadata=parametros)
+            inicio = time.perf_counter()
+            for deslocamento in range(0, len(ids), TAMANHO_LOTE_CONSTRUCAO):
+                fim = deslocamento + TAMANHO_LOTE_CONSTRUCAO
+                teste.add(ids=ids[deslocamento:fim], embeddings=vetores[deslocamento:fim].tolist(),
+                          documents=documentos[deslocamento:fim], metadatas=metadados[deslocamento:fim])
+            segundos_construcao = time.perf_counter() - inicio
+            relatorio.append({
+                "configuracao": "teste",
+                **parametros,
+                "segundos_construcao": round(segundos_construcao, 3),
+                "bytes_disco": tamanho_diretorio(diretorio),
+                **medir_consultas(teste, consultas, k, exatos(parametros["hnsw:space"]), posicoes),
+            })
+            del teste, cliente_teste
+        finally:
+            shutil.rmtree(diretorio, ignore_errors=True)
+    return relatorio
+
+
+def imprimir_diagnostico(relatorio):
+    """Mostra o relatório do diagnóstico em forma de tabela."""
+    print("\n" + "=" * 100)
+    print("DIAGNOSTICO DO INDICE HNSW (recall@k contra a busca exata)")
+    print("=" * 100)
+    print(f"{'configuracao':<14} {'espaco':<7} {'M':>4} {'constr_ef':>9} {'search_ef':>9} "
+          f"{'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'constr s':>9} {'disco MB':>9}")
+    for linha in relatorio:
+        latencia = linha["latencia"]
+        recall = next(valor for chave, valor in linha.items() if chave.startswith("recall@"))
+        construcao = "-" if linha["segundos_construcao"] is None else f"{linha['segundos_construcao']:.2f}"
+        print(f"{linha['configuracao']:<14} {linha['hnsw:space']:<7} {linha['hnsw:M']:>4} "
+              f"{linha['hnsw:construction_ef']:>9} {linha['hnsw:search_ef']:>9} "
+              f"{recall:>7.3f} {latencia['p50_ms']:>8} {latencia['p95_ms']:>8} "
+              f"{latencia['p99_ms']:>8} {construcao:>9} {linha['bytes_disco'] / 1e6:>9.2f}")
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Consulta e diagnóstico dos vetores do ChromaDB")
+    parser.add_argument("comando", nargs="?", choices=("info", "diagnostico"), default="info")
+    parser.add_argument("--k", type=int, default=10, help="Tamanho do top-k comparado")
+    parser.add_argument("--amostras", type=int, default=200, help="Consultas sorteadas do acervo")
+    parser.add_argument("--espaco", nargs="+", default=[ESPACO_HNSW], choices=("l2", "cosine", "ip"))
+    parser.add_argument("--m", nargs="+", type=int, default=sorted({M_HNSW, 32}))
+    parser.add_argument("--construction-ef", nargs="+", type=int, default=[CONSTRUCTION_EF_HNSW])
+    parser.add_argument("--search-ef", nargs="+", type=int, default=sorted({SEARCH_EF_HNSW, 50, 100}))
+    parser.add_argument("--saida", help="Arquivo JSON onde gravar o relatório")
+    opcoes = parser.parse_args(argumentos)
+
+    if opcoes.comando == "info":
+        consultar_vetores()
+        return 0
+
+    configuracoes = [
+        parametros_hnsw(espaco, m, construction_ef, search_ef)
+        for espaco, m, construction_ef, search_ef in itertools.product(
+            opcoes.espaco, opcoes.m, opcoes.construction_ef, opcoes.search_ef
+        )
+    ]
+    print(f"Avaliando {len(configuracoes)} configuracoes do indice HNSW...")
+    try:
+        relatorio = diagnosticar_hnsw(configuracoes, k=opcoes.k, amostras=opcoes.amostras)
+    except ValueError as erro:
+        print(f"\nErro no diagnostico: {erro}\n")
+        return 1
+    imprimir_diagnostico(relatorio)
+    if opcoes.saida:
+        with open(opcoes.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        print(f"\nRelatorio gravado em {opcoes.saida}")
+    return 0
+
+
 if __name__ == "__main__":
-    consultar_vetores()
+    sys.exit(main())
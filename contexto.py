@@ -0,0 +1,136 @@
+# Arquivo responsável pelo contexto (filmes) enviado à LLM na Fase 2
+# A Fase 1 grava um trecho compacto de cada filme nos metadados; na Fase 2 os
+# trechos são apenas encaixados, em ordem de relevância, dentro de um orçamento
+# de tokens — o prompt não cresce sem limite quando o top_k é grande.
+
+# Campo dos metadados com o trecho pronto de cada filme
+CAMPO_TRECHO = "trecho_contexto"
+
+# Tamanho máximo da sinopse dentro do trecho (em caracteres)
+TAMANHO_MAXIMO_SINOPSE = 400
+
+# Estimativa de caracteres por token (média para textos em português/inglês)
+CARACTERES_POR_TOKEN = 4
+
+# Trechos que sobrariam com menos tokens que isso não são truncados: são descartados
+MINIMO_TOKENS_TRECHO = 40
+
+# Colunas de origem de cada informação (nos dois formatos de tabela IMDB suportados)
+COLUNAS_TITULO = ("Series_Title", "title")
+COLUNAS_ANO = ("Released_Year", "year")
+COLUNAS_GENERO = ("Genre", "genres")
+COLUNAS_NOTA = ("IMDB_Rating", "rating")
+COLUNAS_DIRETOR = ("Director", "director")
+COLUNAS_ELENCO = ("Star1", "Star2", "Star3", "Star4", "cast")
+COLUNAS_SINOPSE = ("Overview", "overview")
+
+
+def estimar_tokens(texto):
+    """
+    Estima a quantidade de tokens de um texto (aproximação por caracteres,
+    sem chamar a API da LLM).
+    """
+    return (len(texto) + CARACTERES_POR_TOKEN - 1) // CARACTERES_POR_TOKEN
+
+
+def _valor(metadata, colunas):
+    """Retorna o primeiro valor preenchido entre as colunas (ou None)."""
+    for coluna in colunas:
+        if metadata.get(coluna) not in (None, ""):
+            return metadata[coluna]
+    return None
+
+
+def montar_trecho_contexto(metadata):
+    """
+    Monta o trecho compacto de um filme (usado como contexto da LLM).
+
+    Ex.: "Título: Inception (2010) | Gênero: Action, Sci-Fi | Nota IMDB: 8.8 |
+          Diretor: Christopher Nolan | Elenco: Leonardo DiCaprio, Joseph Gordon-Levitt
+          Sinopse: ..."
+
+    Retorna: Texto do trecho (str)
+    """
+    titulo = _valor(metadata, COLUNAS_TITULO)
+    ano = _valor(metadata, COLUNAS_ANO)
+    partes = []
+    if titulo:
+        partes.append(f"Título: {titulo}" + (f" ({ano})" if ano else ""))
+    elif ano:
+        partes.append(f"Ano: {ano}")
+    for rotulo, colunas in (("Gênero", COLUNAS_GENERO), ("Nota IMDB", COLUNAS_NOTA), ("Diretor", COLUNAS_DIRETOR)):
+        valor = _valor(metadata, colunas)
+        if valor:
+            partes.append(f"{rotulo}: {valor}")
+
+    # Elenco sem nomes repetidos
+    elenco = list(dict.fromkeys(str(metadata[c]) for c in COLUNAS_ELENCO if metadata.get(c)))
+    if elenco:
+        partes.append(f"Elenco: {', '.join(elenco)}")
+
+    trecho = " | ".join(partes)
+    sinopse = _valor(metadata, COLUNAS_SINOPSE)
+    if sinopse:
+        trecho += f"\nSinopse: {truncar(str(sinopse), TAMANHO_MAXIMO_SINOPSE)}"
+    return trecho
+
+
+def truncar(texto, maximo_caracteres):
+    """Corta o texto no último espaço antes do limite, indicando o corte com "..."."""
+    if len(texto) <= maximo_caracteres:
+        return texto
+    corte = texto[:max(0, maximo_caracteres - 3)]
+    if " " in corte:
+        corte = corte[:corte.rindex(" ")]
+    return corte.rstrip(" ,.;:") + "..."
+
+
+def montar_contexto(metadados, orcamento_tokens):
+    """
+    Encaixa os trechos dos filmes (já ordenados por relevância) no orçamento de tokens:
+    - filmes repetidos (mesmo título e ano) entram uma única vez
+    - o primeiro trecho que não couber é truncado; os seguintes são descartados
+
+    Args:
+        metadados (list): Metadados dos filmes, do mais relevante para o menos relevante
+        orcamento_tokens (int): Máximo de tokens (estimados) para o contexto
+
+    Retorna: Tupla (contexto_formatado, estatisticas) — estatisticas tem
+    tokens_contexto, filmes_no_contexto, filmes_truncados, filmes_descartados e filmes_duplicados
+    """
+    blocos = []
+    vistos = set()
+    tokens_usados = 0
+    estatisticas = {"filmes_truncados": 0, "filmes_descartados": 0, "filmes_duplicados": 0}
+
+    for metadata in metadados:
+        # Índices antigos (sem o campo) têm o trecho montado na hora
+        trecho = metadata.get(CAMPO_TRECHO) or montar_trecho_contexto(metadata)
+
+        identidade = (
+            str(_valor(metadata, COLUNAS_TITULO) or "").strip().lower(),
+            str(_valor(metadata, COLUNAS_ANO) or ""),
+        )
+        if identidade == ("", ""):
+            identidade = trecho
+        if identidade in vistos:
+            estatisticas["filmes_duplicados"] += 1
+            continue
+        vistos.add(identidade)
+
+        cabecalho = f"\n**Filme {len(blocos) + 1}:** "
+        disponivel = orcamento_tokens - tokens_usados - estimar_tokens(cabecalho)
+        if estimar_tokens(trecho) > disponivel:
+            if disponivel < MINIMO_TOKENS_TRECHO:
+                estatisticas["filmes_descartados"] += 1
+                continue
+            trecho = truncar(trecho, disponivel * CARACTERES_POR_TOKEN)
+            estatisticas["filmes_truncados"] += 1
+
+        bloco = cabecalho + trecho
+        blocos.append(bloco)
+        tokens_usados += estimar_tokens(bloco)
+
+    estatisticas["tokens_contexto"] = tokens_usados
+    estatisticas["filmes_no_contexto"] = len(blocos)
+    return "\n".join(blocos), estatisticas
@@ -0,0 +1,293 @@
+# Arquivo responsável pelo grafo de "filmes parecidos" (k vizinhos mais próximos)
+# Com VIZINHOS_SIMILARES > 0, a Fase 1 calcula para cada filme os k filmes de vetor
+# mais parecido (similaridade de cosseno todos-contra-todos, em blocos de linhas,
+# com multiplicação de matrizes) e grava uma tabela SQLite id -> vizinhos.
+# A consulta ("filmes como X") é uma leitura pela chave primária: não vetoriza
+# nada, não consulta o índice vetorial e não chama a LLM.
+# Nas execuções seguintes, só são recalculados os filmes novos/alterados/removidos
+# (comparando o hash do conteúdo) e os que tinham algum deles entre os vizinhos.
+import os
+import json
+import logging
+import sqlite3
+import numpy as np
+from configuracao import CAMINHO_FILMES_SIMILARES, VIZINHOS_SIMILARES
+from contexto import COLUNAS_TITULO
+from metadados import normalizar_termo
+
+logger = logging.getLogger(__name__)
+
+# Limite de similaridades calculadas por bloco (linhas x filmes): ~64 MB em float32
+ELEMENTOS_POR_BLOCO = 16 * 1024 * 1024
+
+ERRO_GRAFO_AUSENTE = {
+    "status": "erro",
+    "mensagem": "O grafo de filmes similares ainda não foi calculado. "
+                "Execute a Fase 1 com VIZINHOS_SIMILARES > 0 (ou python filmes_similares.py)."
+}
+
+
+def abrir_grafo(somente_leitura=False, caminho=CAMINHO_FILMES_SIMILARES):
+    """
+    Abre (e cria, se preciso) o banco do grafo de similares.
+
+    Retorna: Conexão SQLite
+    """
+    if somente_leitura:
+        return sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    conexao = sqlite3.connect(caminho)
+    # vizinhos: JSON compacto [[id, similaridade], ...] do mais para o menos parecido
+    conexao.execute("""
+        CREATE TABLE IF NOT EXISTS filmes (
+            id_doc TEXT PRIMARY KEY, titulo TEXT, titulo_normalizado TEXT, ano INTEGER, nota REAL,
+            hash_conteudo TEXT, vizinhos TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conexao.execute("CREATE INDEX IF NOT EXISTS filmes_titulo ON filmes (titulo_normalizado)")
+    conexao.execute("CREATE TABLE IF NOT EXISTS configuracao (chave TEXT PRIMARY KEY, valor TEXT)")
+    return conexao
+
+
+def _titulo(metadata):
+    """Título do filme (nos dois formatos de tabela IMDB suportados)."""
+    for coluna in COLUNAS_TITULO:
+        if metadata.get(coluna) not in (None, ""):
+            return str(metadata[coluna])
+    return None
+
+
+def calcular_vizinhos(vetores, linhas, k):
+    """
+    k vizinhos mais próximos das linhas pedidas contra todos os filmes, em blocos
+    de linhas (a matriz de similaridades inteira nunca é montada).
+
+    Args:
+        vetores (np.ndarray): Vetores normalizados de todos os filmes (float32)
+        linhas (list): Índices das linhas a calcular
+        k (int): Vizinhos por filme (o próprio filme é excluído)
+
+    Retorna: Dicionário linha -> lista de (linha_vizinha, similaridade), da mais parecida para a menos
+    """
+    k = min(k, len(vetores) - 1)
+    if k <= 0:
+        return {linha: [] for linha in linhas}
+
+    linhas = np.asarray(linhas, dtype=np.int64)
+    tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // len(vetores))
+    vizinhos = {}
+    for inicio in range(0, len(linhas), tamanho_bloco):
+        bloco = linhas[inicio:inicio + tamanho_bloco]
+        similaridades = vetores[bloco] @ vetores.T
+        similaridades[np.arange(len(bloco)), bloco] = -np.inf
+        # argpartition separa os k maiores de cada linha em O(n); só eles são ordenados
+        candidatos = np.argpartition(-similaridades, k - 1, axis=1)[:, :k]
+        pontuacoes = np.take_along_axis(similaridades, candidatos, axis=1)
+        ordem = np.argsort(-pontuacoes, axis=1)
+        candidatos = np.take_along_axis(candidatos, ordem, axis=1)
+        pontuacoes = np.take_along_axis(pontuacoes, ordem, axis=1)
+        for linha, vizinhas, pontos in zip(bloco, candidatos, pontuacoes):
+            vizinhos[int(linha)] = list(zip(vizinhas.tolist(), pontos.tolist()))
+    return vizinhos
+
+
+def atualizar_grafo_similares(ids, metadados, vetores, k=VIZINHOS_SIMILARES, completo=False,
+                              caminho=CAMINHO_FILMES_SIMILARES):
+    """
+    Atualiza o grafo de similares a partir dos vetores da coleção.
+
+    Sem mudança de k e com um grafo existente, recalcula apenas:
+    - os filmes novos ou alterados (hash do conteúdo diferente do gravado)
+    - os filmes que tinham um vizinho alterado ou removido
+    Para os demais, um filme novo/alterado só entra na lista se for mais parecido
+    que o k-ésimo vizinho atual (uma coluna de similaridades, sem recalcular a linha).
+
+    Args:
+        ids (list): IDs dos filmes (os mesmos do ChromaDB)
+        metadados (list): Metadados de cada filme
+        vetores (np.ndarray): Vetores normalizados (mesma ordem dos ids)
+        k (int): Vizinhos por filme
+        completo (bool): Recalcula o grafo inteiro
+
+    Retorna: Dicionário com o resumo da atualização
+    """
+    conexao = abrir_grafo(caminho=caminho)
+    try:
+        configuracao = dict(conexao.execute("SELECT chave, valor FROM configuracao"))
+        existentes = {
+            id_doc: (hash_conteudo, vizinhos)
+            for id_doc, hash_conteudo, vizinhos in conexao.execute(
+                "SELECT id_doc, hash_conteudo, vizinhos FROM filmes"
+            )
+        }
+        posicoes = {id_doc: i for i, id_doc in enumerate(ids)}
+        hashes = [(metadata or {}).get("hash_conteudo") for metadata in metadados]
+        completo = completo or not existentes or configuracao.get("k") != str(k)
+
+        removidos = set(existentes) - set(posicoes)
+        alterados = set() if completo else {
+            id_doc for id_doc, hash_conteudo in zip(ids, hashes)
+            if id_doc not in existentes or existentes[id_doc][0] != hash_conteudo
+        }
+        mudaram = removidos | alterados
+
+        ajustados = {}
+        if completo:
+            recalcular = list(range(len(ids)))
+        else:
+            recalcular = {posicoes[id_doc] for id_doc in alterados}
+            listas = {}
+            for id_doc, (_, vizinhos) in existentes.items():
+                if id_doc in mudaram:
+                    continue
+                lista = json.loads(vizinhos)
+                # Perdeu (ou teve alterado) um vizinho: a lista inteira é refeita
+                if any(vizinho in mudaram for vizinho, _ in lista):
+                    recalcular.add(posicoes[id_doc])
+                else:
+                    listas[id_doc] = lista
+
+            # Os demais só mudam se um filme alterado/novo superar o k-ésimo vizinho
+            colunas = [posicoes[id_doc] for id_doc in alterados]
+            restantes = list(listas)
+            if colunas and restantes:
+                tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // len(colunas))
+                for inicio in range(0, len(restantes), tamanho_bloco):
+                    bloco = restantes[inicio:inicio + tamanho_bloco]
+                    similaridades = vetores[[posicoes[id_doc] for id_doc in bloco]] @ vetores[colunas].T
+                    for id_doc, linha in zip(bloco, similaridades):
+                        lista = listas[id_doc]
+                        limite = lista[-1][1] if len(lista) >= k else -np.inf
+                        entram = [(ids[colunas[j]], round(float(linha[j]), 4)) for j in np.flatnonzero(linha > limite)]
+                        if entram:
+                            ajustados[id_doc] = sorted(lista + entram, key=lambda item: -item[1])[:k]
+            recalcular = sorted(recalcular)
+
+        vizinhos = calcular_vizinhos(vetores, recalcular, k)
+
+        def linha_filme(i, lista):
+            metadata = metadados[i] or {}
+            titulo = _titulo(metadata)
+            return (
+                ids[i], titulo, normalizar_termo(titulo) if titulo else None,
+                metadata.get("ano"), metadata.get("nota"), hashes[i],
+                json.dumps(lista, separators=(",", ":"))
+            )
+
+        # Uma única transação: quem consulta nunca vê o grafo pela metade
+        with conexao:
+            if completo:
+                conexao.execute("DELETE FROM filmes")
+            conexao.executemany("DELETE FROM filmes WHERE id_doc = ?", [(id_doc,) for id_doc in removidos])
+            conexao.executemany(
+                "INSERT OR REPLACE INTO filmes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    linha_filme(i, [[ids[j], round(similaridade, 4)] for j, similaridade in vizinhos[i]])
+                    for i in recalcular
+                ]
+            )
+            conexao.executemany(
+                "UPDATE filmes SET vizinhos = ? WHERE id_doc = ?",
+                [(json.dumps(lista, separators=(",", ":")), id_doc) for id_doc, lista in ajustados.items()]
+            )
+            conexao.execute("INSERT OR REPLACE INTO configuracao VALUES ('k', ?)", (str(k),))
+
+        return {
+            "vizinhos_por_filme": k,
+            "filmes": len(ids),
+            "completo": completo,
+            "recalculados": len(recalcular),
+            "ajustados": len(ajustados),
+            "removidos": len(removidos),
+            "bytes": os.path.getsize(caminho),
+        }
+    finally:
+        conexao.close()
+
+
+def buscar_similares(id_doc=None, titulo=None, k=None, caminho=CAMINHO_FILMES_SIMILARES):
+    """
+    Filmes parecidos com um filme, pelo ID ou pelo título (sem acentos/maiúsculas).
+
+    Args:
+        id_doc (str): ID do filme (o mesmo do ChromaDB)
+        titulo (str): Título do filme (usado se o ID não for informado)
+        k (int): Quantidade de similares (no máximo o k calculado na Fase 1)
+
+    Retorna: Dicionário com o filme e a lista de similares (ou o erro)
+    """
+    if not id_doc and not titulo:
+        return {"status": "erro", "mensagem": "Informe o 'id' ou o 'titulo' do filme"}
+    if k is not None and (isinstance(k, bool) or not isinstance(k, int) or k < 1):
+        # k <= 0 viraria um fatiamento [:-k] (ou "todos", com 0)
+        return {"status": "erro", "mensagem": f"O parâmetro 'k' deve ser um inteiro maior que zero (recebido: {k!r})"}
+    if not os.path.exists(caminho):
+        return ERRO_GRAFO_AUSENTE
+
+    conexao = abrir_grafo(somente_leitura=True, caminho=caminho)
+    try:
+        colunas = "id_doc, titulo, ano, nota, vizinhos"
+        if id_doc:
+            encontrados = conexao.execute(f"SELECT {colunas} FROM filmes WHERE id_doc = ?", (id_doc,)).fetchall()
+        else:
+            encontrados = conexao.execute(
+                f"SELECT {colunas} FROM filmes WHERE titulo_normalizado = ? ORDER BY nota DESC",
+                (normalizar_termo(titulo),)
+            ).fetchall()
+        if not encontrados:
+            return {"status": "erro", "mensagem": f"Filme não encontrado: {id_doc or titulo}"}
+
+        id_filme, titulo_filme, ano, nota, vizinhos = encontrados[0]
+        vizinhos = json.loads(vizinhos)[:k] if k is not None else json.loads(vizinhos)
+        similaridades = dict(vizinhos)
+        marcadores = ",".join("?" * len(vizinhos))
+        detalhes = {
+            linha[0]: linha for linha in conexao.execute(
+                f"SELECT id_doc, titulo, ano, nota FROM filmes WHERE id_doc IN ({marcadores})",
+                [vizinho for vizinho, _ in vizinhos]
+            )
+        } if vizinhos else {}
+    finally:
+        conexao.close()
+
+    resposta = {
+        "status": "sucesso",
+        "filme": {"id": id_filme, "titulo": titulo_filme, "ano": ano, "nota": nota},
+        "similares": [
+            {
+                "id": vizinho,
+                "titulo": detalhes[vizinho][1],
+                "ano": detalhes[vizinho][2],
+                "nota": detalhes[vizinho][3],
+                "similaridade": similaridades[vizinho],
+            }
+            for vizinho, _ in vizinhos if vizinho in detalhes
+        ],
+    }
+    if len(encontrados) > 1:
+        # Títulos repetidos (ex.: refilmagens): responde pelo de maior nota e lista os outros
+        resposta["outros_com_mesmo_titulo"] = [
+            {"id": linha[0], "titulo": linha[1], "ano": linha[2]} for linha in encontrados[1:]
+        ]
+    return resposta
+
+
+# Uso:
+#   python filmes_similares.py                 -> recalcula o grafo inteiro a partir da coleção
+#   python filmes_similares.py "Inception"     -> filmes parecidos com "Inception"
+if __name__ == "__main__":
+    import sys
+    from metricas import configurar_logs
+
+    configurar_logs()
+    if len(sys.argv) > 1:
+        print(json.dumps(buscar_similares(titulo=sys.argv[1]), ensure_ascii=False, indent=2))
+    else:
+        from recursos import obter_colecao
+        from backends_busca import ler_vetores_colecao
+
+        print(f"🕸️  Calculando os {VIZINHOS_SIMILARES or 10} filmes mais parecidos de cada filme...")
+        ids_colecao, _, metadados_colecao, vetores_colecao = ler_vetores_colecao(obter_colecao())
+        print(atualizar_grafo_similares(ids_colecao, metadados_colecao, vetores_colecao,
+                                        k=VIZINHOS_SIMILARES or 10, completo=True))
@@ -1,9 +1,38 @@
-from google import genai
+# Cliente do Gemini, criado na primeira utilização: a importação do google-genai
+# é pesada (~1s) e não precisa atrasar a inicialização da API.
+import threading
+from metricas import importar
+
+_trava = threading.Lock()
+
+
+def obter_cliente():
+    """
+    Retorna o cliente compartilhado do Gemini, criando-o na primeira chamada.
+    Testes e benchmarks podem trocá-lo atribuindo genai_api.client.
+
+    Retorna: Instância de genai.Client
+    """
+    global client
+
+    if "client" not in globals():
+        with _trava:
+            # Confere de novo: outra thread pode ter criado enquanto esperávamos
+            if "client" not in globals():
+                genai = importar("google.genai")
+                client = genai.Client(api_key="sua chave API do Gemini")
+    return globals()["client"]
+
+
+def __getattr__(nome):
+    # Compatibilidade: "from genai_api import client" cria o cliente na hora
+    if nome == "client":
+        return obter_cliente()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
 
-client = genai.Client(api_key="sua chave API do Gemini")
 
 if __name__ == "__main__":
-    response = client.models.generate_content(
+    response = obter_cliente().models.generate_content(
         model="gemini-3-flash-preview", contents="Explain how AI works in a few words"
     )
     print(response.text)
@@ -0,0 +1,139 @@
+# Arquivo responsável pelos lotes de vetorização montados por orçamento de tokens
+# Um lote é preenchido (padding) até o tamanho do seu texto mais longo: misturar
+# textos curtos e longos no mesmo lote desperdiça processamento. Aqui os textos são
+# ordenados pela quantidade de tokens, agrupados em lotes de comprimento parecido e
+# cada lote recebe tantos textos quantos couberem em ORCAMENTO_TOKENS_LOTE
+# (textos curtos -> lotes grandes, textos longos -> lotes pequenos).
+# Os vetores voltam na ordem original e as contagens de tokens viram estatísticas
+# (quantos textos passam do limite do modelo e quantos tokens são descartados).
+import numpy as np
+from configuracao import ORCAMENTO_TOKENS_LOTE
+from contexto import estimar_tokens
+
+
+def contar_tokens(modelo, textos):
+    """
+    Conta os tokens de cada texto (com os tokens especiais e SEM truncar).
+
+    Usa o contar_tokens() do codificador (ONNX ou pool de processos), o tokenizador
+    do SentenceTransformer ou, sem tokenizador, a estimativa por caracteres.
+
+    Retorna: Tupla (lista de contagens, limite de tokens do modelo ou None)
+    """
+    if hasattr(modelo, "contar_tokens"):
+        return modelo.contar_tokens(textos), modelo.limite_tokens
+    tokenizador = getattr(modelo, "tokenizer", None)
+    if tokenizador is not None:
+        ids = tokenizador(list(textos), add_special_tokens=True, truncation=False, verbose=False)["input_ids"]
+        return [len(ids_texto) for ids_texto in ids], getattr(modelo, "max_seq_length", None)
+    return [estimar_tokens(texto) + 2 for texto in textos], getattr(modelo, "max_seq_length", None)
+
+
+def planejar_lotes(comprimentos, orcamento_tokens=ORCAMENTO_TOKENS_LOTE):
+    """
+    Agrupa os textos em lotes de comprimento parecido: em ordem crescente de tokens,
+    cada lote cresce enquanto (maior comprimento do lote x quantidade) couber no orçamento.
+
+    Args:
+        comprimentos (list): Tokens de cada texto (já limitados ao máximo do modelo)
+        orcamento_tokens (int): Tokens por lote, contando o padding
+
+    Retorna: Lista de lotes (cada um, uma lista de posições na ordem original)
+    """
+    ordem = sorted(range(len(comprimentos)), key=lambda i: comprimentos[i])
+    lotes, atual = [], []
+    for posicao in ordem:
+        # Em ordem crescente, o texto novo é sempre o mais longo do lote
+        if atual and comprimentos[posicao] * (len(atual) + 1) > orcamento_tokens:
+            lotes.append(atual)
+            atual = []
+        atual.append(posicao)
+    if atual:
+        lotes.append(atual)
+    return lotes
+
+
+def resumir_tokens(comprimentos, limite, lotes):
+    """
+    Estatísticas de tokens de uma vetorização (para o resultado da Fase 1).
+
+    Retorna: Dicionário com totais, percentis, truncamento e aproveitamento do padding
+    """
+    if not comprimentos:
+        return {"documentos": 0}
+    brutos = np.asarray(comprimentos)
+    efetivos = np.minimum(brutos, limite) if limite else brutos
+    # Tokens processados de fato: cada lote paga o comprimento do seu maior texto
+    processados = sum(int(efetivos[lote].max()) * len(lote) for lote in lotes)
+    truncados = int((brutos > limite).sum()) if limite else 0
+    return {
+        "documentos": int(brutos.size),
+        "limite_tokens": limite,
+        "tokens_total": int(brutos.sum()),
+        "tokens_media": round(float(brutos.mean()), 1),
+        "tokens_p50": int(np.percentile(brutos, 50)),
+        "tokens_p95": int(np.percentile(brutos, 95)),
+        "tokens_max": int(brutos.max()),
+        "documentos_truncados": truncados,
+        "percentual_truncados": round(truncados / brutos.size * 100, 2),
+        "tokens_descartados": int((brutos - efetivos).sum()),
+        "lotes": len(lotes),
+        "aproveitamento_padding": round(float(efetivos.sum()) / processados, 4) if processados else 1.0,
+    }
+
+
+class EstatisticasTokens:
+    """Acumula as contagens de tokens e os lotes de todos os blocos de uma vetorização."""
+
+    def __init__(self):
+        self.comprimentos = []
+        self.lotes = []
+        self.limite = None
+
+    def registrar(self, comprimentos, limite, lotes):
+        deslocamento = len(self.comprimentos)
+        self.comprimentos.extend(comprimentos)
+        self.lotes.extend([posicao + deslocamento for posicao in lote] for lote in lotes)
+        self.limite = limite
+
+    def resumo(self):
+        return resumir_tokens(self.comprimentos, self.limite, self.lotes)
+
+
+def codificar_por_orcamento(modelo, textos, orcamento_tokens=ORCAMENTO_TOKENS_LOTE, estatisticas=None):
+    """
+    Vetoriza os textos em lotes montados por orçamento de tokens, devolvendo os
+    vetores na ordem original.
+
+    Args:
+        modelo: SentenceTransformer, CodificadorOnnx ou PoolCodificacao
+        textos (list): Textos a vetorizar
+        orcamento_tokens (int): Tokens por lote, contando o padding
+        estatisticas (EstatisticasTokens): Acumulador opcional das contagens
+
+    Retorna: Tupla (vetores numpy.ndarray, contagens de tokens por texto)
+    """
+    comprimentos, limite = contar_tokens(modelo, textos)
+    efetivos = [min(comprimento, limite) if limite else comprimento for comprimento in comprimentos]
+    lotes = planejar_lotes(efetivos, orcamento_tokens)
+    if estatisticas is not None:
+        estatisticas.registrar(comprimentos, limite, lotes)
+
+    if hasattr(modelo, "encode_lotes"):
+        # Pool de processos: os lotes são distribuídos entre os trabalhadores
+        vetores_lotes = modelo.encode_lotes([[textos[i] for i in lote] for lote in lotes])
+    else:
+        vetores_lotes = [
+            modelo.encode([textos[i] for i in lote], batch_size=len(lote), show_progress_bar=False)
+            for lote in lotes
+        ]
+
+    saida = None
+    for lote, vetores in zip(lotes, vetores_lotes):
+        vetores = np.asarray(vetores, dtype=np.float32)
+        if saida is None:
+            saida = np.empty((len(textos), vetores.shape[1]), dtype=np.float32)
+        saida[lote] = vetores
+    if saida is None:
+        saida = np.empty((0, 0), dtype=np.float32)
+    return saida, comprimentos
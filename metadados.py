@@ -0,0 +1,159 @@
+# Arquivo responsável pelos metadados tipados dos filmes e pelos filtros estruturados
+# Os metadados são gravados com tipos de verdade (números como números) e com
+# campos padronizados (ano, nota, diretor, genero_*), para que os filtros da
+# Fase 2 sejam aplicados pelo próprio ChromaDB durante a busca.
+import re
+import unicodedata
+
+# Colunas numéricas conhecidas (dos dois formatos de tabela IMDB suportados)
+COLUNAS_INTEIRAS = {
+    "Released_Year", "Meta_score", "No_of_Votes", "Gross", "Runtime",
+    "year", "runtime", "vote_count", "budget", "revenue",
+}
+COLUNAS_DECIMAIS = {"IMDB_Rating", "rating", "popularity"}
+
+# Campos padronizados usados nos filtros -> colunas de origem possíveis
+COLUNAS_ANO = ("Released_Year", "year")
+COLUNAS_NOTA = ("IMDB_Rating", "rating")
+COLUNAS_DIRETOR = ("Director", "director")
+COLUNAS_GENERO = ("Genre", "genres")
+
+# Prefixo dos campos booleanos de gênero (ex.: genero_drama = True)
+PREFIXO_GENERO = "genero_"
+
+# Filtros aceitos pela Fase 2
+FILTROS_ACEITOS = ("ano_min", "ano_max", "nota_min", "nota_max", "genero", "diretor")
+
+
+def normalizar_termo(texto):
+    """
+    Normaliza um termo para comparação: minúsculas, sem acentos e com
+    qualquer caractere que não seja letra/número trocado por "_".
+
+    Ex.: "Sci-Fi" -> "sci_fi", "Ação" -> "acao"
+    """
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", texto.lower()).strip("_")
+
+
+def converter_numero(valor, tipo):
+    """
+    Converte textos como "2008", "8.5", "28,341,469" ou "142 min" para número.
+
+    Retorna: int/float ou None se não for possível converter
+    """
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return tipo(valor)
+    texto = re.sub(r"[,\s]|min$", "", str(valor or "").strip())
+    try:
+        return tipo(float(texto))
+    except ValueError:
+        return None
+
+
+def _primeiro(metadata, colunas):
+    """Retorna o valor da primeira coluna existente da lista (ou None)."""
+    for coluna in colunas:
+        if metadata.get(coluna) not in (None, ""):
+            return metadata[coluna]
+    return None
+
+
+def montar_metadados(linha, colunas):
+    """
+    Monta os metadados tipados de uma linha da tabela:
+    - colunas numéricas conhecidas viram int/float (valores vazios são omitidos)
+    - os demais valores são mantidos (texto continua texto)
+    - campos padronizados para filtros: ano, nota, diretor e genero_<nome> = True
+
+    Retorna: Dicionário aceito pelo ChromaDB (str, int, float ou bool)
+    """
+    metadata = {}
+    for i, coluna in enumerate(colunas):
+        if i >= len(linha) or linha[i] is None:
+            continue
+        valor = linha[i]
+        if coluna in COLUNAS_INTEIRAS:
+            valor = converter_numero(valor, int)
+        elif coluna in COLUNAS_DECIMAIS:
+            valor = converter_numero(valor, float)
+        elif not isinstance(valor, (int, float)):
+            valor = str(valor)
+        if valor is not None:
+            metadata[coluna] = valor
+
+    # Campos padronizados (independentes do formato da tabela)
+    ano = converter_numero(_primeiro(metadata, COLUNAS_ANO), int)
+    if ano is not None:
+        metadata["ano"] = ano
+    nota = converter_numero(_primeiro(metadata, COLUNAS_NOTA), float)
+    if nota is not None:
+        metadata["nota"] = nota
+    diretor = _primeiro(metadata, COLUNAS_DIRETOR)
+    if diretor is not None:
+        metadata["diretor"] = normalizar_termo(diretor)
+    generos = _primeiro(metadata, COLUNAS_GENERO)
+    for genero in re.split(r"[,|/]", str(generos or "")):
+        if normalizar_termo(genero):
+            metadata[PREFIXO_GENERO + normalizar_termo(genero)] = True
+
+    return metadata
+
+
+def montar_filtro_where(filtros):
+    """
+    Converte os filtros estruturados da Fase 2 em uma cláusula "where" do ChromaDB.
+
+    Args:
+        filtros (dict): Pode conter ano_min, ano_max, nota_min, nota_max,
+            genero (texto ou lista: todos precisam estar presentes) e diretor
+
+    Retorna: Tupla (where, erro) — where é None quando não há filtros
+    """
+    if not filtros:
+        return None, None
+    if not isinstance(filtros, dict):
+        return None, "O campo 'filtros' deve ser um objeto JSON"
+
+    desconhecidos = [chave for chave in filtros if chave not in FILTROS_ACEITOS]
+    if desconhecidos:
+        return None, f"Filtros desconhecidos: {', '.join(desconhecidos)}. Use: {', '.join(FILTROS_ACEITOS)}"
+
+    numericos = [chave for chave in ("ano_min", "ano_max", "nota_min", "nota_max")
+                 if isinstance(filtros.get(chave), bool)]
+    if numericos:
+        # bool é subclasse de int em Python: true viraria 1 sem este teste
+        return None, "Os filtros ano_min, ano_max, nota_min e nota_max devem ser numéricos"
+
+    condicoes = []
+    try:
+        if filtros.get("ano_min") is not None:
+            condicoes.append({"ano": {"$gte": int(filtros["ano_min"])}})
+        if filtros.get("ano_max") is not None:
+            condicoes.append({"ano": {"$lte": int(filtros["ano_max"])}})
+        if filtros.get("nota_min") is not None:
+            condicoes.append({"nota": {"$gte": float(filtros["nota_min"])}})
+        if filtros.get("nota_max") is not None:
+            condicoes.append({"nota": {"$lte": float(filtros["nota_max"])}})
+    except (TypeError, ValueError):
+        return None, "Os filtros ano_min, ano_max, nota_min e nota_max devem ser numéricos"
+
+    generos = filtros.get("genero") or []
+    generos = [generos] if isinstance(generos, str) else generos
+    if not isinstance(generos, list) or not all(isinstance(genero, str) for genero in generos):
+        return None, "O filtro genero deve ser um texto ou uma lista de textos"
+    for genero in generos:
+        termo = normalizar_termo(genero)
+        if not termo:
+            # "genero_" não existe em nenhum filme: o filtro nunca encontraria nada
+            return None, f"Gênero inválido: {genero!r}"
+        condicoes.append({PREFIXO_GENERO + termo: True})
+    if filtros.get("diretor"):
+        if not isinstance(filtros["diretor"], str):
+            return None, "O filtro diretor deve ser um texto"
+        condicoes.append({"diretor": normalizar_termo(filtros["diretor"])})
+
+    if not condicoes:
+        return None, None
+    # O ChromaDB exige pelo menos duas condições dentro de "$and"
+    return (condicoes[0] if len(condicoes) == 1 else {"$and": condicoes}), None
@@ -0,0 +1,273 @@
+# Arquivo responsável pelas métricas e pelos logs do projeto
+# - medir(): cronometra uma etapa (RETRIEVAL, AUGMENTED, GENERATION, blocos da Fase 1)
+#   e guarda o tempo tanto no dicionário "timings" da resposta quanto no histograma
+# - contadores/histogramas simples, exportados no formato texto do Prometheus (/metrics)
+# - configurar_logs(): logs com nível (NIVEL_LOG) em vez de print incondicional
+# - importar()/medir_importacao(): tempo de cada importação, na inicialização e sob demanda
+import importlib
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from configuracao import NIVEL_LOG
+
+# Limites (em segundos) dos baldes dos histogramas de duração
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def configurar_logs(nivel=NIVEL_LOG):
+    """
+    Configura os logs do processo. NIVEL_LOG aceita DEBUG, INFO, WARNING, ERROR
+    ou DESATIVADO (nenhuma mensagem).
+    """
+    if str(nivel).upper() == "DESATIVADO":
+        logging.disable(logging.CRITICAL)
+        return
+    logging.basicConfig(level=str(nivel).upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def _formatar_rotulos(nomes, valores):
+    if not nomes:
+        return ""
+    pares = ",".join(f'{nome}="{str(valor).replace(chr(34), chr(39))}"' for nome, valor in zip(nomes, valores))
+    return "{" + pares + "}"
+
+
+class Contador:
+    """Contador que só cresce (ex.: requisições, erros), com rótulos opcionais."""
+
+    tipo = "counter"
+
+    def __init__(self, nome, descricao, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._trava = threading.Lock()
+
+    def inc(self, valor=1, **rotulos):
+        chave = tuple(rotulos.get(nome, "") for nome in self.rotulos)
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def linhas(self):
+        with self._trava:
+            return [
+                f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {valor}"
+                for chave, valor in sorted(self._valores.items())
+            ]
+
+
+class Medidor(Contador):
+    """Valor que sobe e desce (ex.: documentos por segundo da última vetorização)."""
+
+    tipo = "gauge"
+
+    def definir(self, valor, **rotulos):
+        chave = tuple(rotulos.get(nome, "") for nome in self.rotulos)
+        with self._trava:
+            self._valores[chave] = valor
+
+
+class Histograma:
+    """Distribuição de durações em baldes cumulativos (formato do Prometheus)."""
+
+    tipo = "histogram"
+
+    def __init__(self, nome, descricao, rotulos=(), limites=LIMITES_SEGUNDOS):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.limites = limites
+        # rótulos -> [contagem por balde..., soma, total]
+        self._series = {}
+        self._trava = threading.Lock()
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(rotulos.get(nome, "") for nome in self.rotulos)
+        with self._trava:
+            serie = self._series.setdefault(chave, {"baldes": [0] * len(self.limites), "soma": 0.0, "total": 0})
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    serie["baldes"][i] += 1
+            serie["soma"] += valor
+            serie["total"] += 1
+
+    def linhas(self):
+        linhas = []
+        with self._trava:
+            for chave, serie in sorted(self._series.items()):
+                for limite, quantidade in zip(self.limites, serie["baldes"]):
+                    rotulos = _formatar_rotulos(self.rotulos + ("le",), chave + (limite,))
+                    linhas.append(f"{self.nome}_bucket{rotulos} {quantidade}")
+                rotulos = _formatar_rotulos(self.rotulos + ("le",), chave + ("+Inf",))
+                linhas.append(f"{self.nome}_bucket{rotulos} {serie['total']}")
+                linhas.append(f"{self.nome}_sum{_formatar_rotulos(self.rotulos, chave)} {round(serie['soma'], 6)}")
+                linhas.append(f"{self.nome}_count{_formatar_rotulos(self.rotulos, chave)} {serie['total']}")
+        return linhas
+
+
+class Registro:
+    """Conjunto das métricas do processo."""
+
+    def __init__(self):
+        self._metricas = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def formatar_prometheus(self):
+        """Retorna todas as métricas no formato texto do Prometheus."""
+        linhas = []
+        for metrica in self._metricas:
+            linhas.append(f"# HELP {metrica.nome} {metrica.descricao}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.linhas())
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+REQUISICOES = registro.registrar(Contador(
+    "rag_requisicoes_total", "Requisições recebidas pela API", ("endpoint",)))
+ERROS = registro.registrar(Contador(
+    "rag_erros_total", "Requisições que terminaram com status de erro", ("endpoint",)))
+DURACAO_REQUISICOES = registro.registrar(Histograma(
+    "rag_requisicao_segundos", "Duração das requisições da API", ("endpoint",)))
+DURACAO_ETAPAS = registro.registrar(Histograma(
+    "rag_etapa_segundos", "Duração de cada etapa das Fases 1 e 2", ("fase", "etapa")))
+CACHE_SEMANTICO = registro.registrar(Contador(
+    "rag_cache_semantico_total", "Consultas ao cache semântico", ("resultado",)))
+COALESCENCIA = registro.registrar(Contador(
+    "rag_coalescencia_total", "Perguntas da Fase 2 por papel na coalescência (lider, seguidora, espera_esgotada)",
+    ("resultado",)))
+RAZAO_COALESCENCIA = registro.registrar(Medidor(
+    "rag_coalescencia_razao", "Fração das perguntas que aproveitaram o resultado de outra idêntica em andamento"))
+CHAMADAS_LLM_EM_ANDAMENTO = registro.registrar(Medidor(
+    "rag_chamadas_llm_em_andamento", "Chamadas à LLM em andamento no modo assíncrono"))
+TEMPO_IMPORTACAO = registro.registrar(Medidor(
+    "rag_importacao_segundos", "Tempo de importação de cada módulo (inicialização e sob demanda)", ("modulo",)))
+DOCUMENTOS_VETORIZADOS = registro.registrar(Contador(
+    "fase1_documentos_vetorizados_total", "Documentos vetorizados pela Fase 1"))
+DOCUMENTOS_POR_SEGUNDO = registro.registrar(Medidor(
+    "fase1_documentos_por_segundo", "Vazão de vetorização da última execução da Fase 1"))
+
+
+@contextmanager
+def medir(tempos, etapa, fase):
+    """
+    Cronometra o bloco "with": soma a duração em tempos[etapa] (segundos) e
+    registra a observação no histograma rag_etapa_segundos.
+
+    Ex.:
+        with medir(tempos, "geracao", "fase_2"):
+            resposta = gerar_resposta(prompt)
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        tempos[etapa] = tempos.get(etapa, 0.0) + segundos
+        DURACAO_ETAPAS.observar(segundos, fase=fase, etapa=etapa)
+
+
+def arredondar_tempos(tempos):
+    """Tempos (segundos) arredondados para a resposta da API."""
+    return {etapa: round(segundos, 4) for etapa, segundos in tempos.items()}
+
+
+def _percentil(ordenadas, percentual):
+    """Percentil de uma lista já ordenada, com interpolação linear (como o np.percentile)."""
+    posicao = (len(ordenadas) - 1) * percentual / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenadas) - 1)
+    return ordenadas[inferior] + (ordenadas[superior] - ordenadas[inferior]) * (posicao - inferior)
+
+
+def percentis(valores):
+    """
+    p50/p95/p99, média e máximo (em milissegundos) de uma lista de durações em segundos.
+    Usado pelo benchmark_rag.py, pelo teste_carga.py e pelo diagnóstico do consultar_vetores.py.
+    """
+    amostras = sorted(float(valor) * 1000 for valor in valores)
+    return {
+        "p50_ms": round(_percentil(amostras, 50), 3),
+        "p95_ms": round(_percentil(amostras, 95), 3),
+        "p99_ms": round(_percentil(amostras, 99), 3),
+        "media_ms": round(sum(amostras) / len(amostras), 3),
+        "max_ms": round(amostras[-1], 3),
+        "amostras": len(amostras),
+    }
+
+
+# Relatório de inicialização: tempo de cada importação e quando a API terminou de subir
+# (contado a partir da importação deste módulo, a primeira do app.py)
+_inicio_processo = time.perf_counter()
+_importacoes = []
+_trava_importacoes = threading.Lock()
+_inicializacao_concluida = None
+
+
+@contextmanager
+def medir_importacao(nome):
+    """
+    Cronometra as importações feitas dentro do bloco "with" e as registra no
+    relatório de inicialização (e no medidor rag_importacao_segundos).
+
+    Ex.:
+        with medir_importacao("flask"):
+            from flask import Flask
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        with _trava_importacoes:
+            _importacoes.append({
+                "modulo": nome,
+                "segundos": round(segundos, 4),
+                "momento": "inicializacao" if _inicializacao_concluida is None else "sob_demanda",
+            })
+        TEMPO_IMPORTACAO.definir(round(segundos, 4), modulo=nome)
+
+
+def importar(nome_modulo):
+    """
+    Importa um módulo pesado (chromadb, google.genai...) só quando ele é usado pela
+    primeira vez, registrando quanto tempo a importação levou.
+
+    Retorna: O módulo importado
+    """
+    if nome_modulo in sys.modules:
+        return sys.modules[nome_modulo]
+    with medir_importacao(nome_modulo):
+        return importlib.import_module(nome_modulo)
+
+
+def marcar_inicializacao_concluida():
+    """Marca o fim da inicialização da API (as importações seguintes são "sob_demanda")."""
+    global _inicializacao_concluida
+    _inicializacao_concluida = time.perf_counter() - _inicio_processo
+    logging.getLogger(__name__).info(
+        f"⏱️  API inicializada em {_inicializacao_concluida:.2f}s ("
+        + ", ".join(f"{item['modulo']} {item['segundos']:.2f}s" for item in relatorio_inicializacao()["importacoes"][:5])
+        + ")"
+    )
+
+
+def relatorio_inicializacao():
+    """
+    Tempo de inicialização da API e de cada importação, da mais lenta para a mais rápida.
+
+    Retorna: Dicionário com segundos_inicializacao e importacoes
+    """
+    with _trava_importacoes:
+        importacoes = sorted(_importacoes, key=lambda item: -item["segundos"])
+    return {
+        "segundos_inicializacao": round(_inicializacao_concluida, 4) if _inicializacao_concluida is not None else None,
+        "importacoes": importacoes,
+    }
@@ -0,0 +1,230 @@
+# Arquivo responsável pela versão assíncrona da Fase 2 (usada pelo app_async.py)
+# - vetorização, cache, busca e prompt (CPU/ChromaDB) rodam num pool LIMITADO de threads
+# - a chamada ao Gemini é aguardada (client.aio), sem prender uma thread durante a geração;
+#   todas as chamadas usam o mesmo cliente (e o mesmo pool de conexões) do genai_api.py
+# - um semáforo limita as chamadas à LLM em andamento (MAXIMO_LLM_SIMULTANEAS)
+# As respostas têm exatamente o mesmo formato das funções de rag_fase2.py.
+import asyncio
+import inspect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from genai_api import obter_cliente
+from rag_fase2 import (
+    FASE, ERRO_LOTE_VAZIO, ERRO_MODO_BUSCA, validar_parametros, normalizar_modo_busca, preparar_pergunta,
+    concluir_pergunta, erro_processamento, anexar_tempos, eventos_resposta_pronta, evento_filmes, evento_fim,
+    normalizar_itens_lote, preparar_lote, resultado_lote, erro_filtros, resultado_coalescido,
+)
+from coalescencia import coalescedor, chave_coalescencia
+from metadados import montar_filtro_where
+from metricas import medir, CHAMADAS_LLM_EM_ANDAMENTO
+from configuracao import MODELO_LLM, CONCORRENCIA_LOTE_LLM, MAXIMO_LLM_SIMULTANEAS, THREADS_CPU_ASSINCRONO
+
+logger = logging.getLogger(__name__)
+
+# Pool limitado para o trabalho de CPU (modelo de embeddings, ChromaDB, SQLite):
+# mais threads que núcleos só aumentaria a disputa pelo processador
+_executor = ThreadPoolExecutor(max_workers=max(1, THREADS_CPU_ASSINCRONO), thread_name_prefix="rag_cpu")
+
+# Criado na primeira chamada, dentro do event loop do servidor
+_semaforo_llm = None
+
+
+async def executar_em_thread(funcao, *args, **kwargs):
+    """Executa uma função bloqueante no pool de threads de CPU e aguarda o resultado."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(funcao, *args, **kwargs))
+
+
+@asynccontextmanager
+async def chamada_llm():
+    """Reserva uma das MAXIMO_LLM_SIMULTANEAS vagas de chamada à LLM (as demais esperam)."""
+    global _semaforo_llm
+    if _semaforo_llm is None:
+        _semaforo_llm = asyncio.Semaphore(max(1, MAXIMO_LLM_SIMULTANEAS))
+    async with _semaforo_llm:
+        CHAMADAS_LLM_EM_ANDAMENTO.inc()
+        try:
+            yield
+        finally:
+            CHAMADAS_LLM_EM_ANDAMENTO.inc(-1)
+
+
+async def gerar_resposta_async(prompt_augmented):
+    """
+    ETAPA 3 - GENERATION assíncrona: aguarda a resposta do Gemini sem bloquear
+    nenhuma thread.
+
+    Retorna: Texto da resposta
+    """
+    logger.info("🚀 Enviando para a LLM Gemini (assíncrono)...")
+    async with chamada_llm():
+        response = await obter_cliente().aio.models.generate_content(model=MODELO_LLM, contents=prompt_augmented)
+    logger.info("✅ Resposta gerada com sucesso!")
+    return response.text
+
+
+async def fluxo_resposta_async(prompt_augmented):
+    """
+    ETAPA 3 em streaming assíncrono: produz os pedaços de texto do Gemini.
+
+    Retorna (yield): Textos, à medida que chegam
+    """
+    async with chamada_llm():
+        fluxo = obter_cliente().aio.models.generate_content_stream(model=MODELO_LLM, contents=prompt_augmented)
+        # Conforme a versão do google-genai, o fluxo é devolvido direto ou por uma corrotina
+        if inspect.isawaitable(fluxo):
+            fluxo = await fluxo
+        async for pedaco in fluxo:
+            if pedaco.text:
+                yield pedaco.text
+
+
+async def responder_pergunta_async(pergunta, contexto_adicional, top_k, modo_busca, where, tempos):
+    """Versão assíncrona de rag_fase2.responder_pergunta."""
+    try:
+        # ========== ETAPAS 1 e 2: RETRIEVAL e AUGMENTED (no pool de threads) ==========
+        resposta_pronta, preparo = await executar_em_thread(
+            preparar_pergunta, pergunta, contexto_adicional, top_k, modo_busca, where, tempos
+        )
+        if resposta_pronta is not None:
+            return resposta_pronta
+
+        # ========== ETAPA 3: GENERATION (aguardada) ==========
+        with medir(tempos, "geracao", FASE):
+            resposta = await gerar_resposta_async(preparo["prompt"])
+
+        return concluir_pergunta(pergunta, contexto_adicional, preparo, resposta)
+
+    except Exception as erro:
+        logger.exception(f"❌ Erro durante o processamento RAG: {erro}")
+        return erro_processamento(erro)
+
+
+async def processar_pergunta_rag_async(pergunta, contexto_adicional="", top_k=5, modo_busca=None, filtros=None,
+                                       incluir_tempos=False):
+    """
+    Versão assíncrona de rag_fase2.processar_pergunta_rag (mesmos argumentos,
+    mesmo formato de resposta e mesma coalescência de perguntas idênticas).
+    """
+    try:
+        top_k, modo_busca, where, erro = validar_parametros(pergunta, top_k, modo_busca, filtros)
+    except Exception as erro_validacao:
+        logger.exception(f"❌ Erro ao validar a requisição: {erro_validacao}")
+        return erro_processamento(erro_validacao)
+    if erro:
+        return erro
+
+    inicio = time.perf_counter()
+    tempos = {}
+    resultado, coalescida = await coalescedor.executar_async(
+        chave_coalescencia(pergunta, contexto_adicional, top_k, modo_busca, where),
+        lambda: responder_pergunta_async(pergunta, contexto_adicional, top_k, modo_busca, where, tempos)
+    )
+    resultado = resultado_coalescido(resultado, coalescida, tempos, inicio)
+    return anexar_tempos(resultado, tempos, inicio, incluir_tempos)
+
+
+async def processar_pergunta_rag_stream_async(pergunta, contexto_adicional="", top_k=5, modo_busca=None,
+                                              filtros=None, incluir_tempos=False):
+    """
+    Versão assíncrona de rag_fase2.processar_pergunta_rag_stream (mesmos eventos).
+
+    Retorna (yield): Tuplas (nome_do_evento, dados)
+    """
+    try:
+        top_k, modo_busca, where, erro = validar_parametros(pergunta, top_k, modo_busca, filtros)
+        if erro:
+            yield "erro", erro
+            return
+
+        inicio = time.perf_counter()
+        tempos = {}
+
+        # ========== ETAPAS 1 e 2: RETRIEVAL e AUGMENTED (no pool de threads) ==========
+        resposta_pronta, preparo = await executar_em_thread(
+            preparar_pergunta, pergunta, contexto_adicional, top_k, modo_busca, where, tempos
+        )
+        if resposta_pronta is not None:
+            for evento in eventos_resposta_pronta(resposta_pronta, tempos, inicio, incluir_tempos):
+                yield evento
+            return
+
+        preparo["fim_recuperacao"] = time.perf_counter()
+        yield evento_filmes(preparo, inicio)
+
+        # ========== ETAPA 3: GENERATION (streaming aguardado) ==========
+        inicio_geracao = time.perf_counter()
+        primeiro_trecho = None
+        partes = []
+        with medir(tempos, "geracao", FASE):
+            async for texto in fluxo_resposta_async(preparo["prompt"]):
+                if primeiro_trecho is None:
+                    primeiro_trecho = time.perf_counter()
+                    tempos["ate_primeiro_trecho"] = primeiro_trecho - inicio_geracao
+                partes.append(texto)
+                yield "trecho", {"texto": texto}
+
+        concluir_pergunta(pergunta, contexto_adicional, preparo, "".join(partes))
+        yield evento_fim(preparo, tempos, inicio, inicio_geracao, primeiro_trecho, incluir_tempos)
+
+    except Exception as erro:
+        logger.exception(f"❌ Erro durante o processamento RAG: {erro}")
+        yield "erro", erro_processamento(erro)
+
+
+async def processar_perguntas_lote_async(perguntas, contexto_adicional="", top_k=5,
+                                         concorrencia=CONCORRENCIA_LOTE_LLM, modo_busca=None, filtros=None,
+                                         incluir_tempos=False):
+    """
+    Versão assíncrona de rag_fase2.processar_perguntas_lote: a recuperação em lote
+    roda no pool de threads e as respostas são aguardadas em paralelo (no máximo
+    `concorrencia` por lote, dentro do limite global MAXIMO_LLM_SIMULTANEAS).
+    """
+    if not isinstance(perguntas, list) or not perguntas:
+        return ERRO_LOTE_VAZIO
+
+    inicio = time.perf_counter()
+    tempos = {}
+    try:
+        modo_busca = normalizar_modo_busca(modo_busca)
+        if modo_busca is None:
+            return ERRO_MODO_BUSCA
+
+        where, erro_filtro = montar_filtro_where(filtros)
+        if erro_filtro:
+            return erro_filtros(erro_filtro)
+
+        itens, respostas, validos = normalizar_itens_lote(perguntas, contexto_adicional, top_k)
+
+        # ========== ETAPAS 1 e 2: RETRIEVAL e AUGMENTED (em lote, no pool de threads) ==========
+        preparos = await executar_em_thread(preparar_lote, itens, validos, respostas, modo_busca, where, tempos)
+
+        # ========== ETAPA 3: GENERATION (aguardada, com limite por lote) ==========
+        limite_lote = asyncio.Semaphore(max(1, concorrencia))
+
+        async def gerar(preparo):
+            item = itens[preparo["indice"]]
+            try:
+                async with limite_lote:
+                    with medir({}, "geracao", FASE):
+                        resposta = await gerar_resposta_async(preparo["prompt"])
+                respostas[preparo["indice"]] = concluir_pergunta(
+                    item["pergunta"], item["contexto_adicional"], preparo, resposta
+                )
+            except Exception as erro:
+                logger.error(f"❌ Erro ao gerar a resposta da pergunta {preparo['indice']}: {erro}")
+                respostas[preparo["indice"]] = erro_processamento(erro)
+
+        if preparos:
+            logger.info(f"🚀 Gerando {len(preparos)} respostas (até {concorrencia} simultâneas)...")
+            with medir(tempos, "geracao_lote", FASE):
+                await asyncio.gather(*(gerar(preparo) for preparo in preparos))
+
+    except Exception as erro:
+        logger.exception(f"❌ Erro durante o processamento RAG em lote: {erro}")
+        return anexar_tempos(erro_processamento(erro), tempos, inicio, incluir_tempos)
+
+    return resultado_lote(itens, respostas, tempos, inicio, incluir_tempos)
@@ -1,110 +1,241 @@
 # Arquivo responsável pela Fase 2: RAG (Retrieval-Augmented Generation)
-import chromadb
-from sentence_transformers import SentenceTransformer
-from genai_api import client
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from genai_api import obter_cliente
+from configuracao import MODELO_LLM, CONCORRENCIA_LOTE_LLM, MODO_BUSCA_PADRAO, ORCAMENTO_TOKENS_CONTEXTO
+from recursos import obter_modelo, obter_backend
+from cache_respostas import cache_respostas
+from coalescencia import coalescedor, chave_coalescencia
+from busca_lexical import buscar_lexical, fundir_rrf
+from metadados import montar_filtro_where
+from contexto import montar_contexto, estimar_tokens
+from metricas import medir, arredondar_tempos
 
-def processar_pergunta_rag(pergunta, contexto_adicional="", top_k=5):
+logger = logging.getLogger(__name__)
+
+# Nome da fase nas métricas de duração das etapas
+FASE = "fase_2"
+
+# Modos de busca da ETAPA 1 (RETRIEVAL)
+MODO_VETORIAL = "vetorial"  # Similaridade semântica (ChromaDB)
+MODO_LEXICAL = "lexical"    # Palavras exatas: títulos, diretores, atores (SQLite FTS5)
+MODO_HIBRIDO = "hibrida"    # As duas, combinadas por Reciprocal Rank Fusion
+MODOS_BUSCA = (MODO_VETORIAL, MODO_LEXICAL, MODO_HIBRIDO)
+ALIASES_MODO_BUSCA = {"vector": MODO_VETORIAL, "lexical": MODO_LEXICAL, "hybrid": MODO_HIBRIDO}
+
+# Com filtros, a busca lexical pede mais candidatos ao FTS5 (parte deles será descartada pelo filtro)
+FATOR_CANDIDATOS_FILTRO = 10
+
+# Mensagens de erro reaproveitadas pelas variantes da Fase 2
+ERRO_PERGUNTA_VAZIA = {
+    "status": "erro",
+    "mensagem": "Por favor, envie uma pergunta no campo 'pergunta'",
+    "detalhes": "A pergunta não pode estar vazia"
+}
+ERRO_BANCO_VAZIO = {
+    "status": "erro",
+    "mensagem": "Nada encontrado no banco de dados. Tente outra pesquisa.",
+    "detalhes": "O banco vetorial está vazio. Execute a Fase 1 primeiro."
+}
+ERRO_SEM_RESULTADOS = {
+    "status": "erro",
+    "mensagem": "Nada encontrado no banco de dados. Tente outra pesquisa.",
+    "detalhes": "Nenhum resultado relevante foi encontrado para sua pergunta."
+}
+ERRO_MODO_BUSCA = {
+    "status": "erro",
+    "mensagem": "Modo de busca inválido",
+    "detalhes": "Use 'vetorial', 'lexical' ou 'hibrida' no campo 'modo_busca'"
+}
+ERRO_LOTE_VAZIO = {
+    "status": "erro",
+    "mensagem": "Envie uma lista de perguntas no campo 'perguntas'"
+}
+
+
+def erro_top_k(valor):
+    """Monta a mensagem de erro para um top_k inválido."""
+    return {
+        "status": "erro",
+        "mensagem": "O campo 'top_k' deve ser um número inteiro maior que zero",
+        "detalhes": f"top_k recebido: {valor!r}"
+    }
+
+
+def erro_filtros(detalhes):
+    """Monta a mensagem de erro para filtros inválidos."""
+    return {
+        "status": "erro",
+        "mensagem": "Filtros inválidos",
+        "detalhes": detalhes
+    }
+
+
+def vetorizar_pergunta(pergunta, tempos=None):
     """
-    Função que implementa o fluxo completo de RAG:
-    1. RETRIEVAL: Busca semântica no banco vetorial
-    2. AUGMENTED: Incrementa a pergunta com contexto recuperado
-    3. GENERATION: Envia para a LLM e gera resposta
-    
+    Transforma a pergunta do usuário em vetor (mesmo modelo usado na Fase 1).
+
+    Retorna: Lista com um vetor (formato aceito por colecao.query)
+    """
+    tempos = {} if tempos is None else tempos
+    with medir(tempos, "carregar_modelo", FASE):
+        modelo = obter_modelo()
+    logger.info("🤖 Vetorizando pergunta do usuário...")
+    with medir(tempos, "vetorizacao_pergunta", FASE):
+        return modelo.encode([pergunta]).tolist()
+
+
+def normalizar_modo_busca(modo_busca):
+    """
+    Valida o modo de busca (aceita também os nomes em inglês).
+
+    Retorna: "vetorial", "lexical" ou "hibrida" (ou None se o modo for inválido)
+    """
+    modo_busca = modo_busca or MODO_BUSCA_PADRAO
+    if not isinstance(modo_busca, str):
+        return None
+    modo_busca = modo_busca.lower()
+    modo_busca = ALIASES_MODO_BUSCA.get(modo_busca, modo_busca)
+    return modo_busca if modo_busca in MODOS_BUSCA else None
+
+
+def chave_do_cache(contexto_adicional, top_k, modo_busca, where):
+    """Parâmetros que precisam ser iguais para reaproveitar uma resposta do cache."""
+    return (contexto_adicional, top_k, modo_busca, json.dumps(where, sort_keys=True))
+
+
+def buscar_filmes_lote(perguntas, vetores, tops, modo_busca=MODO_VETORIAL, where=None, tempos=None):
+    """
+    ETAPA 1 - RETRIEVAL para uma ou mais perguntas de uma vez.
+
+    - "vetorial": busca semântica no ChromaDB (UMA consulta com todos os vetores)
+    - "lexical": busca por palavras no índice FTS5 (não usa os vetores)
+    - "hibrida": as duas buscas, combinadas por Reciprocal Rank Fusion
+
+    A busca vetorial é feita pelo backend configurado em BACKEND_BUSCA ("chroma"
+    ou "numpy"). Os filtros estruturados (where) são aplicados pelo próprio backend
+    durante a busca, e não depois dela: o top_k sempre contém apenas filmes que os atendem.
+
     Args:
-        pergunta (str): Pergunta do usuário
-        contexto_adicional (str): Contexto adicional opcional do usuário
-        top_k (int): Número de resultados a recuperar do banco vetorial
-        
-    Retorna: Dicionário com a resposta e metadados
+        perguntas (list): Textos das perguntas
+        vetores (list): Vetores das perguntas (None no modo lexical)
+        tops (list): top_k de cada pergunta
+        modo_busca (str): "vetorial", "lexical" ou "hibrida"
+        where (dict): Cláusula "where" do ChromaDB (ver metadados.montar_filtro_where)
+        tempos (dict): Onde somar a duração de cada etapa da busca (opcional)
+
+    Retorna: Lista de tuplas (resultados, erro), uma por pergunta, na mesma ordem
     """
-    
-    # Validar se a pergunta foi enviada
-    if not pergunta or pergunta.strip() == "":
-        return {
-            "status": "erro",
-            "mensagem": "Por favor, envie uma pergunta no campo 'pergunta'",
-            "detalhes": "A pergunta não pode estar vazia"
-        }
-    
-    try:
-        # ========== ETAPA 1: RETRIEVAL (Recuperação) ==========
-        print("🔍 Iniciando busca semântica no banco vetorial...")
-        
-        # Carregar o modelo de vetorização (mesmo usado na Fase 1)
-        modelo = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Conectar ao ChromaDB
-        cliente_chroma = chromadb.PersistentClient(path="./chroma_db")
-        colecao = cliente_chroma.get_or_create_collection(name="imdb_vetores")
-        
-        # Verificar se há dados no banco vetorial
-        total_documentos = colecao.count()
-        if total_documentos == 0:
-            return {
-                "status": "erro",
-                "mensagem": "Nada encontrado no banco de dados. Tente outra pesquisa.",
-                "detalhes": "O banco vetorial está vazio. Execute a Fase 1 primeiro."
-            }
-        
-        print(f"📊 Total de documentos no banco: {total_documentos}")
-        
-        # Vetorizar a pergunta do usuário
-        print("🤖 Vetorizando pergunta do usuário...")
-        vetor_pergunta = modelo.encode([pergunta]).tolist()
-        
-        # Realizar busca semântica
-        print(f"🔎 Buscando os {top_k} resultados mais relevantes...")
-        resultados = colecao.query(
-            query_embeddings=vetor_pergunta,
-            n_results=top_k
-        )
-        
-        # Verificar se encontrou resultados
-        if not resultados['documents'] or len(resultados['documents'][0]) == 0:
-            return {
-                "status": "erro",
-                "mensagem": "Nada encontrado no banco de dados. Tente outra pesquisa.",
-                "detalhes": "Nenhum resultado relevante foi encontrado para sua pergunta."
-            }
-        
-        print(f"✅ Encontrados {len(resultados['documents'][0])} resultados relevantes!")
-        
-        # ========== ETAPA 2: AUGMENTED (Aumento de Contexto) ==========
-        print("📝 Formatando contexto para a LLM...")
-        
-        # Formatar os filmes encontrados
-        filmes_encontrados = []
-        for i, (doc, metadata) in enumerate(zip(resultados['documents'][0], resultados['metadatas'][0])):
-            filme_info = f"\n**Filme {i+1}:**\n"
-            
-            # Extrair informações dos metadados
-            if 'Series_Title' in metadata:
-                filme_info += f"- Título: {metadata['Series_Title']}\n"
-            if 'Released_Year' in metadata:
-                filme_info += f"- Ano: {metadata['Released_Year']}\n"
-            if 'Genre' in metadata:
-                filme_info += f"- Gênero: {metadata['Genre']}\n"
-            if 'IMDB_Rating' in metadata:
-                filme_info += f"- Nota IMDB: {metadata['IMDB_Rating']}\n"
-            if 'Director' in metadata:
-                filme_info += f"- Diretor: {metadata['Director']}\n"
-            if 'Star1' in metadata or 'Star2' in metadata:
-                estrelas = []
-                if 'Star1' in metadata:
-                    estrelas.append(metadata['Star1'])
-                if 'Star2' in metadata:
-                    estrelas.append(metadata['Star2'])
-                if estrelas:
-                    filme_info += f"- Elenco: {', '.join(estrelas)}\n"
-            if 'Overview' in metadata:
-                filme_info += f"- Sinopse: {metadata['Overview']}\n"
-            
-            filmes_encontrados.append(filme_info)
-        
-        contexto_formatado = "\n".join(filmes_encontrados)
-        
-        # Criar o prompt aumentado (AUGMENTED)
-        prompt_augmented = f"""Você é um especialista em cinema com vasto conhecimento sobre filmes e séries.
+    tempos = {} if tempos is None else tempos
+
+    # Backend de busca compartilhado entre requisições (aberto uma única vez)
+    with medir(tempos, "abrir_backend", FASE):
+        backend = obter_backend()
+
+    # Verificar se há dados no banco vetorial
+    total_documentos = backend.contar()
+    if total_documentos == 0:
+        return [(None, ERRO_BANCO_VAZIO)] * len(perguntas)
+
+    logger.info(f"📊 Total de documentos no banco: {total_documentos}")
+
+    # Documentos já carregados (id -> (documento, metadata))
+    conhecidos = {}
+    listas_vetoriais = [[] for _ in perguntas]
+    listas_lexicais = [[] for _ in perguntas]
+
+    if modo_busca != MODO_LEXICAL:
+        # Busca semântica: uma única consulta com todos os vetores
+        logger.info(f"🔎 Buscando os {max(tops)} resultados mais relevantes ({modo_busca})...")
+        with medir(tempos, "busca_vetorial", FASE):
+            resultados = backend.consultar(vetores, max(tops), where)
+        for i, k in enumerate(tops):
+            ids = resultados['ids'][i][:k]
+            listas_vetoriais[i] = ids
+            for id_doc, doc, metadata in zip(ids, resultados['documents'][i], resultados['metadatas'][i]):
+                conhecidos[id_doc] = (doc, metadata)
+
+    if modo_busca != MODO_VETORIAL:
+        # Busca lexical (FTS5): uma consulta indexada por pergunta
+        fator = FATOR_CANDIDATOS_FILTRO if where else 1
+        with medir(tempos, "busca_lexical", FASE):
+            listas_lexicais = [buscar_lexical(pergunta, k * fator) for pergunta, k in zip(perguntas, tops)]
+
+        if where:
+            # O FTS5 não conhece os filtros: o backend valida os candidatos (numa única chamada)
+            candidatos = list({id_doc for lista in listas_lexicais for id_doc in lista})
+            with medir(tempos, "filtro_lexical", FASE):
+                aprovados = backend.obter(candidatos, where) \
+                    if candidatos else {"ids": [], "documents": [], "metadatas": []}
+            for id_doc, doc, metadata in zip(aprovados['ids'], aprovados['documents'], aprovados['metadatas']):
+                conhecidos[id_doc] = (doc, metadata)
+            listas_lexicais = [
+                [id_doc for id_doc in lista if id_doc in conhecidos][:k]
+                for lista, k in zip(listas_lexicais, tops)
+            ]
+
+    if modo_busca == MODO_VETORIAL:
+        listas_finais = listas_vetoriais
+    elif modo_busca == MODO_LEXICAL:
+        listas_finais = listas_lexicais
+    else:
+        listas_finais = [
+            fundir_rrf([vetorial, lexical])[:k]
+            for vetorial, lexical, k in zip(listas_vetoriais, listas_lexicais, tops)
+        ]
+
+    # Carrega (numa única chamada) os documentos que só a busca lexical encontrou
+    faltando = list({id_doc for lista in listas_finais for id_doc in lista if id_doc not in conhecidos})
+    if faltando:
+        with medir(tempos, "carregar_documentos", FASE):
+            extras = backend.obter(faltando)
+        for id_doc, doc, metadata in zip(extras['ids'], extras['documents'], extras['metadatas']):
+            conhecidos[id_doc] = (doc, metadata)
+
+    saida = []
+    for lista in listas_finais:
+        ids = [id_doc for id_doc in lista if id_doc in conhecidos]
+        if not ids:
+            saida.append((None, ERRO_SEM_RESULTADOS))
+            continue
+        # Mesmo formato de colecao.query com uma pergunta
+        saida.append(({
+            "ids": [ids],
+            "documents": [[conhecidos[id_doc][0] for id_doc in ids]],
+            "metadatas": [[conhecidos[id_doc][1] for id_doc in ids]],
+        }, None))
+    return saida
+
+
+def buscar_filmes(pergunta, vetor_pergunta, top_k, modo_busca=MODO_VETORIAL, where=None, tempos=None):
+    """
+    ETAPA 1 - RETRIEVAL: busca os filmes de uma única pergunta.
+
+    Retorna: Tupla (resultados, erro) — erro é None quando a busca encontrou filmes
+    """
+    resultados, erro = buscar_filmes_lote([pergunta], vetor_pergunta, [top_k], modo_busca, where, tempos)[0]
+    if resultados:
+        logger.info(f"✅ Encontrados {len(resultados['documents'][0])} resultados relevantes!")
+    return resultados, erro
+
+
+def montar_prompt(pergunta, contexto_adicional, resultados):
+    """
+    ETAPA 2 - AUGMENTED: encaixa os trechos dos filmes encontrados no orçamento
+    de tokens (ORCAMENTO_TOKENS_CONTEXTO) e monta o prompt para a LLM.
+
+    Retorna: Tupla (prompt_aumentado, uso_contexto) — uso_contexto traz os tokens
+    estimados do prompt e quantos filmes entraram, foram truncados ou descartados
+    """
+    logger.info("📝 Formatando contexto para a LLM...")
+
+    # Trechos pré-calculados na Fase 1, do filme mais relevante para o menos relevante
+    contexto_formatado, uso_contexto = montar_contexto(resultados['metadatas'][0], ORCAMENTO_TOKENS_CONTEXTO)
+
+    # Criar o prompt aumentado (AUGMENTED)
+    prompt_augmented = f"""Você é um especialista em cinema com vasto conhecimento sobre filmes e séries.
 
 **INSTRUÇÕES IMPORTANTES:**
 - Use APENAS as informações dos filmes fornecidas abaixo
@@ -126,32 +257,507 @@ def processar_pergunta_rag(pergunta, contexto_adicional="", top_k=5):
 
 **SUA RESPOSTA (seja detalhada, entusiasmada e útil):**"""
 
+    uso_contexto["tokens_prompt"] = estimar_tokens(prompt_augmented)
+    return prompt_augmented, uso_contexto
+
+
+def gerar_resposta(prompt_augmented):
+    """
+    ETAPA 3 - GENERATION: envia o prompt para a LLM Gemini.
+
+    Retorna: Texto da resposta
+    """
+    logger.info("🚀 Enviando para a LLM Gemini...")
+
+    response = obter_cliente().models.generate_content(
+        model=MODELO_LLM,
+        contents=prompt_augmented
+    )
+
+    logger.info("✅ Resposta gerada com sucesso!")
+    return response.text
+
+
+def montar_resultado(pergunta, contexto_adicional, resultados, resposta, uso_contexto):
+    """Monta o dicionário de resposta da Fase 2."""
+    return {
+        "status": "sucesso",
+        "pergunta_original": pergunta,
+        "contexto_adicional": contexto_adicional,
+        "total_filmes_encontrados": len(resultados['documents'][0]),
+        "resposta": resposta,
+        "metadados_filmes": resultados['metadatas'][0],
+        "tokens_prompt": uso_contexto["tokens_prompt"],
+        "uso_contexto": uso_contexto
+    }
+
+
+def anexar_tempos(resposta, tempos, inicio, incluir_tempos):
+    """Registra o tempo total e, se pedido, devolve a resposta com o campo "timings" (segundos por etapa)."""
+    tempos["total"] = time.perf_counter() - inicio
+    if not incluir_tempos:
+        return resposta
+    return {**resposta, "timings": arredondar_tempos(tempos)}
+
+
+def validar_parametros(pergunta, top_k, modo_busca, filtros):
+    """
+    Valida a pergunta, o top_k, o modo de busca e os filtros de uma requisição da Fase 2.
+
+    Retorna: Tupla (top_k, modo_busca, where, erro) — erro é None quando tudo é válido
+    """
+    if not isinstance(pergunta, str) or pergunta.strip() == "":
+        return None, None, None, ERRO_PERGUNTA_VAZIA
+
+    top_k_valido = converter_top_k(top_k)
+    if top_k_valido is None:
+        return None, None, None, erro_top_k(top_k)
+
+    modo_busca = normalizar_modo_busca(modo_busca)
+    if modo_busca is None:
+        return None, None, None, ERRO_MODO_BUSCA
+
+    where, erro_filtro = montar_filtro_where(filtros)
+    if erro_filtro:
+        return None, None, None, erro_filtros(erro_filtro)
+    return top_k_valido, modo_busca, where, None
+
+
+def preparar_pergunta(pergunta, contexto_adicional, top_k, modo_busca, where, tempos):
+    """
+    ETAPAS 1 e 2 de uma pergunta — tudo o que vem antes da LLM: vetorização,
+    cache semântico, busca e montagem do prompt. Ficam separadas da geração para
+    que a versão assíncrona (rag_assincrono.py) as execute num pool de threads
+    e aguarde apenas a LLM.
+
+    Retorna: Tupla (resposta_pronta, preparo) — resposta_pronta é o acerto do cache
+    ou o erro da busca (preparo None); senão, preparo traz o prompt e o que
+    concluir_pergunta() precisa depois da ETAPA 3
+    """
+    # ========== ETAPA 1: RETRIEVAL (Recuperação) ==========
+    logger.info(f"🔍 Iniciando busca ({modo_busca})...")
+    # A busca lexical não precisa do vetor (nem do modelo)
+    vetor_pergunta = vetorizar_pergunta(pergunta, tempos) if modo_busca != MODO_LEXICAL else None
+    chave_cache = chave_do_cache(contexto_adicional, top_k, modo_busca, where)
+
+    # Cache semântico: pergunta parecida já respondida? Evita a chamada à LLM
+    resultado_cache, similaridade = (None, None)
+    if vetor_pergunta is not None:
+        with medir(tempos, "cache_semantico", FASE):
+            resultado_cache, similaridade = cache_respostas.buscar(vetor_pergunta[0], chave_cache)
+    if resultado_cache is not None:
+        logger.info(f"⚡ Resposta encontrada no cache semântico (similaridade {similaridade:.3f})")
+        return {
+            **resultado_cache,
+            "pergunta_original": pergunta,
+            "cache_semantico": {"acerto": True, "similaridade": round(similaridade, 4)}
+        }, None
+
+    resultados, erro = buscar_filmes(pergunta, vetor_pergunta, top_k, modo_busca, where, tempos)
+    if erro:
+        return erro, None
+
+    # ========== ETAPA 2: AUGMENTED (Aumento de Contexto) ==========
+    with medir(tempos, "montar_prompt", FASE):
+        prompt_augmented, uso_contexto = montar_prompt(pergunta, contexto_adicional, resultados)
+
+    return None, {
+        "vetor": vetor_pergunta[0] if vetor_pergunta is not None else None,
+        "chave_cache": chave_cache,
+        "resultados": resultados,
+        "prompt": prompt_augmented,
+        "uso_contexto": uso_contexto,
+    }
+
+
+def concluir_pergunta(pergunta, contexto_adicional, preparo, resposta):
+    """Monta o resultado com a resposta da LLM e o guarda no cache semântico."""
+    resultado = montar_resultado(pergunta, contexto_adicional, preparo["resultados"], resposta,
+                                 preparo["uso_contexto"])
+    if preparo["vetor"] is not None:
+        cache_respostas.guardar(preparo["vetor"], preparo["chave_cache"], resultado)
+    return resultado
+
+
+def erro_processamento(erro):
+    """Mensagem de erro inesperado durante o processamento."""
+    return {
+        "status": "erro",
+        "mensagem": f"Erro durante o processamento: {str(erro)}"
+    }
+
+
+def responder_pergunta(pergunta, contexto_adicional, top_k, modo_busca, where, tempos):
+    """
+    Etapas 1, 2 e 3 de uma pergunta já validada (a parte dividida entre requisições coalescidas).
+
+    Retorna: Dicionário com a resposta (ou com o erro)
+    """
+    try:
+        # ========== ETAPAS 1 e 2: RETRIEVAL e AUGMENTED ==========
+        resposta_pronta, preparo = preparar_pergunta(pergunta, contexto_adicional, top_k, modo_busca, where, tempos)
+        if resposta_pronta is not None:
+            return resposta_pronta
+
         # ========== ETAPA 3: GENERATION (Geração) ==========
-        print("🚀 Enviando para a LLM Gemini...")
+        with medir(tempos, "geracao", FASE):
+            resposta = gerar_resposta(preparo["prompt"])
         
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview",
-            contents=prompt_augmented
-        )
+        # Retornar resultado completo
+        return concluir_pergunta(pergunta, contexto_adicional, preparo, resposta)
         
-        print("✅ Resposta gerada com sucesso!")
+    except Exception as erro:
+        logger.exception(f"❌ Erro durante o processamento RAG: {erro}")
+        return erro_processamento(erro)
+
+
+def resultado_coalescido(resultado, coalescida, tempos, inicio):
+    """Marca a resposta que veio de outra requisição idêntica (e quanto tempo esperou por ela)."""
+    if not coalescida:
+        return resultado
+    tempos["espera_coalescencia"] = time.perf_counter() - inicio
+    logger.info("🔗 Pergunta idêntica já estava em andamento: resultado compartilhado")
+    return {**resultado, "coalescida": True}
+
+
+def processar_pergunta_rag(pergunta, contexto_adicional="", top_k=5, modo_busca=None, filtros=None,
+                           incluir_tempos=False):
+    """
+    Função que implementa o fluxo completo de RAG:
+    1. RETRIEVAL: Busca semântica no banco vetorial
+    2. AUGMENTED: Incrementa a pergunta com contexto recuperado
+    3. GENERATION: Envia para a LLM e gera resposta
+    
+    Args:
+        pergunta (str): Pergunta do usuário
+        contexto_adicional (str): Contexto adicional opcional do usuário
+        top_k (int): Número de resultados a recuperar do banco vetorial
+        modo_busca (str): "vetorial", "lexical" ou "hibrida" (padrão: MODO_BUSCA_PADRAO)
+        filtros (dict): Filtros estruturados opcionais (ano_min, ano_max, nota_min,
+            nota_max, genero, diretor), aplicados durante a busca
+        incluir_tempos (bool): Inclui o campo "timings" com a duração de cada etapa
         
-        # Retornar resultado completo
-        return {
+    Retorna: Dicionário com a resposta e metadados ("coalescida": True quando o
+        resultado veio de uma pergunta idêntica que já estava em andamento)
+    """
+    try:
+        top_k, modo_busca, where, erro = validar_parametros(pergunta, top_k, modo_busca, filtros)
+    except Exception as erro_validacao:
+        logger.exception(f"❌ Erro ao validar a requisição: {erro_validacao}")
+        return erro_processamento(erro_validacao)
+    if erro:
+        return erro
+
+    inicio = time.perf_counter()
+    tempos = {}
+    # Perguntas idênticas simultâneas: só a primeira percorre o pipeline, as demais esperam por ela
+    resultado, coalescida = coalescedor.executar(
+        chave_coalescencia(pergunta, contexto_adicional, top_k, modo_busca, where),
+        lambda: responder_pergunta(pergunta, contexto_adicional, top_k, modo_busca, where, tempos)
+    )
+    resultado = resultado_coalescido(resultado, coalescida, tempos, inicio)
+    return anexar_tempos(resultado, tempos, inicio, incluir_tempos)
+
+
+def eventos_resposta_pronta(resposta_pronta, tempos, inicio, incluir_tempos):
+    """
+    Eventos do streaming quando a resposta não passa pela LLM: acerto do cache
+    semântico (filmes, texto completo e fim) ou erro da busca.
+
+    Retorna: Lista de tuplas (nome_do_evento, dados)
+    """
+    if resposta_pronta.get("status") != "sucesso":
+        return [("erro", resposta_pronta)]
+    return [
+        ("filmes", {
+            "total_filmes_encontrados": resposta_pronta["total_filmes_encontrados"],
+            "metadados_filmes": resposta_pronta["metadados_filmes"]
+        }),
+        ("trecho", {"texto": resposta_pronta["resposta"]}),
+        ("fim", anexar_tempos({
             "status": "sucesso",
-            "pergunta_original": pergunta,
-            "contexto_adicional": contexto_adicional,
-            "total_filmes_encontrados": len(resultados['documents'][0]),
-            "resposta": response.text,
-            "metadados_filmes": resultados['metadatas'][0]
-        }
-        
+            "cache_semantico": resposta_pronta["cache_semantico"],
+            "segundos_total": round(time.perf_counter() - inicio, 3)
+        }, tempos, inicio, incluir_tempos)),
+    ]
+
+
+def evento_filmes(preparo, inicio):
+    """Evento "filmes" do streaming, enviado logo após a busca."""
+    resultados = preparo["resultados"]
+    return "filmes", {
+        "total_filmes_encontrados": len(resultados['documents'][0]),
+        "metadados_filmes": resultados['metadatas'][0],
+        "segundos_recuperacao": round(preparo["fim_recuperacao"] - inicio, 3)
+    }
+
+
+def evento_fim(preparo, tempos, inicio, inicio_geracao, primeiro_trecho, incluir_tempos):
+    """Evento "fim" do streaming, com os tempos de cada etapa."""
+    fim = time.perf_counter()
+    return "fim", anexar_tempos({
+        "status": "sucesso",
+        "segundos_recuperacao": round(preparo["fim_recuperacao"] - inicio, 3),
+        "segundos_ate_primeiro_trecho": round((primeiro_trecho or fim) - inicio_geracao, 3),
+        "segundos_geracao": round(fim - inicio_geracao, 3),
+        "segundos_total": round(fim - inicio, 3),
+        "tokens_prompt": preparo["uso_contexto"]["tokens_prompt"],
+        "uso_contexto": preparo["uso_contexto"]
+    }, tempos, inicio, incluir_tempos)
+
+
+def processar_pergunta_rag_stream(pergunta, contexto_adicional="", top_k=5, modo_busca=None, filtros=None,
+                                  incluir_tempos=False):
+    """
+    Variante em streaming do fluxo RAG. Em vez de esperar a resposta completa,
+    produz eventos assim que cada parte fica pronta:
+
+    - "filmes": metadados dos filmes, logo após a busca (RETRIEVAL)
+    - "trecho": cada pedaço do texto gerado pela LLM, à medida que chega
+    - "fim": tempos de cada etapa
+    - "erro": se algo der errado (encerra o fluxo)
+
+    Args:
+        pergunta (str): Pergunta do usuário
+        contexto_adicional (str): Contexto adicional opcional do usuário
+        top_k (int): Número de resultados a recuperar do banco vetorial
+        modo_busca (str): "vetorial", "lexical" ou "hibrida" (padrão: MODO_BUSCA_PADRAO)
+        filtros (dict): Filtros estruturados opcionais (ver processar_pergunta_rag)
+        incluir_tempos (bool): Inclui o campo "timings" no evento "fim"
+
+    Retorna (yield): Tuplas (nome_do_evento, dados)
+    """
+    try:
+        top_k, modo_busca, where, erro = validar_parametros(pergunta, top_k, modo_busca, filtros)
+        if erro:
+            yield "erro", erro
+            return
+
+        inicio = time.perf_counter()
+        tempos = {}
+
+        # ========== ETAPAS 1 e 2: RETRIEVAL e AUGMENTED ==========
+        resposta_pronta, preparo = preparar_pergunta(pergunta, contexto_adicional, top_k, modo_busca, where, tempos)
+        if resposta_pronta is not None:
+            yield from eventos_resposta_pronta(resposta_pronta, tempos, inicio, incluir_tempos)
+            return
+
+        preparo["fim_recuperacao"] = time.perf_counter()
+        yield evento_filmes(preparo, inicio)
+
+        # ========== ETAPA 3: GENERATION (Geração em streaming) ==========
+        logger.info("🚀 Enviando para a LLM Gemini (streaming)...")
+        inicio_geracao = time.perf_counter()
+        primeiro_trecho = None
+        partes = []
+        # (o tempo de "geracao" inclui o envio de cada trecho ao cliente)
+        with medir(tempos, "geracao", FASE):
+            for pedaco in obter_cliente().models.generate_content_stream(model=MODELO_LLM, contents=preparo["prompt"]):
+                if not pedaco.text:
+                    continue
+                if primeiro_trecho is None:
+                    primeiro_trecho = time.perf_counter()
+                    tempos["ate_primeiro_trecho"] = primeiro_trecho - inicio_geracao
+                partes.append(pedaco.text)
+                yield "trecho", {"texto": pedaco.text}
+
+        logger.info("✅ Resposta gerada com sucesso!")
+
+        # Guarda a resposta completa no cache, como na versão sem streaming
+        concluir_pergunta(pergunta, contexto_adicional, preparo, "".join(partes))
+        yield evento_fim(preparo, tempos, inicio, inicio_geracao, primeiro_trecho, incluir_tempos)
+
     except Exception as erro:
-        print(f"❌ Erro durante o processamento RAG: {erro}")
-        return {
-            "status": "erro",
-            "mensagem": f"Erro durante o processamento: {str(erro)}"
-        }
+        logger.exception(f"❌ Erro durante o processamento RAG: {erro}")
+        yield "erro", erro_processamento(erro)
+
+
+def normalizar_itens_lote(perguntas, contexto_adicional, top_k):
+    """
+    Normaliza as perguntas de um lote para dicionários com pergunta,
+    contexto_adicional e top_k (os itens sem valor usam os padrões do lote).
+
+    Retorna: Tupla (itens, respostas, validos) — respostas já traz o erro das
+    perguntas vazias ou com top_k inválido e validos os índices das demais
+    """
+    itens = []
+    respostas = []
+    validos = []
+    for indice, item in enumerate(perguntas):
+        if not isinstance(item, dict):
+            item = {"pergunta": item}
+        bruto = item.get("top_k", top_k)
+        itens.append({
+            "pergunta": str(item.get("pergunta") or ""),
+            "contexto_adicional": item.get("contexto_adicional", contexto_adicional),
+            "top_k": converter_top_k(bruto),
+        })
+        if itens[-1]["pergunta"].strip() == "":
+            respostas.append(dict(ERRO_PERGUNTA_VAZIA))
+        elif itens[-1]["top_k"] is None:
+            # Um top_k inválido invalida só o próprio item, não o lote inteiro
+            respostas.append(erro_top_k(bruto))
+        else:
+            respostas.append(None)
+            validos.append(indice)
+    return itens, respostas, validos
+
+
+def converter_top_k(valor):
+    """Retorna: top_k como inteiro >= 1, ou None se o valor for inválido"""
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        return None
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        return None
+    return numero if numero >= 1 else None
+
+
+def preparar_lote(itens, validos, respostas, modo_busca, where, tempos):
+    """
+    ETAPAS 1 e 2 de um lote: vetoriza TODAS as perguntas numa única chamada ao
+    modelo, consulta o cache semântico e faz UMA única busca com todos os vetores.
+    Acertos do cache e erros de busca são gravados direto em respostas.
+
+    Retorna: Lista de preparos (como em preparar_pergunta, mais o "indice" do item)
+    das perguntas que ainda precisam da LLM
+    """
+    # Pendentes: (indice, vetor) das perguntas que não estavam no cache
+    pendentes = []
+    if validos and modo_busca == MODO_LEXICAL:
+        # A busca lexical não precisa de vetores (nem do cache semântico)
+        pendentes = [(indice, None) for indice in validos]
+    elif validos:
+        logger.info(f"🤖 Vetorizando {len(validos)} perguntas em lote...")
+        with medir(tempos, "carregar_modelo", FASE):
+            modelo = obter_modelo()
+        with medir(tempos, "vetorizacao_pergunta", FASE):
+            vetores = modelo.encode([itens[i]["pergunta"] for i in validos]).tolist()
+
+        for indice, vetor in zip(validos, vetores):
+            item = itens[indice]
+            chave_cache = chave_do_cache(item["contexto_adicional"], item["top_k"], modo_busca, where)
+            with medir(tempos, "cache_semantico", FASE):
+                resultado_cache, similaridade = cache_respostas.buscar(vetor, chave_cache)
+            if resultado_cache is not None:
+                respostas[indice] = {
+                    **resultado_cache,
+                    "pergunta_original": item["pergunta"],
+                    "cache_semantico": {"acerto": True, "similaridade": round(similaridade, 4)}
+                }
+            else:
+                pendentes.append((indice, vetor))
+
+    preparos = []
+    if pendentes:
+        # Uma única consulta ao ChromaDB com todos os vetores
+        logger.info(f"🔎 Buscando filmes para {len(pendentes)} perguntas em uma única consulta...")
+        buscas = buscar_filmes_lote(
+            [itens[indice]["pergunta"] for indice, _ in pendentes],
+            [vetor for _, vetor in pendentes] if modo_busca != MODO_LEXICAL else None,
+            [itens[indice]["top_k"] for indice, _ in pendentes],
+            modo_busca,
+            where,
+            tempos
+        )
+
+        for (indice, vetor), (resultados, erro) in zip(pendentes, buscas):
+            if erro:
+                respostas[indice] = dict(erro)
+                continue
+
+            # ========== ETAPA 2: AUGMENTED ==========
+            item = itens[indice]
+            with medir(tempos, "montar_prompt", FASE):
+                prompt, uso_contexto = montar_prompt(item["pergunta"], item["contexto_adicional"], resultados)
+            preparos.append({
+                "indice": indice,
+                "vetor": vetor,
+                "chave_cache": chave_do_cache(item["contexto_adicional"], item["top_k"], modo_busca, where),
+                "resultados": resultados,
+                "prompt": prompt,
+                "uso_contexto": uso_contexto,
+            })
+    return preparos
+
+
+def resultado_lote(itens, respostas, tempos, inicio, incluir_tempos):
+    """Resposta final do lote (um resultado por pergunta, na mesma ordem)."""
+    return anexar_tempos({
+        "status": "sucesso",
+        "total_perguntas": len(itens),
+        "total_sucesso": sum(1 for resposta in respostas if resposta["status"] == "sucesso"),
+        "resultados": respostas
+    }, tempos, inicio, incluir_tempos)
+
+
+def processar_perguntas_lote(perguntas, contexto_adicional="", top_k=5, concorrencia=CONCORRENCIA_LOTE_LLM,
+                             modo_busca=None, filtros=None, incluir_tempos=False):
+    """
+    Variante em lote do fluxo RAG, para processar muitas perguntas de uma vez:
+    1. RETRIEVAL: vetoriza TODAS as perguntas numa única chamada ao modelo e faz
+       UMA única consulta ao ChromaDB com todos os vetores (mais as buscas
+       lexicais, nos modos "lexical" e "hibrida")
+    2. AUGMENTED: monta o prompt de cada pergunta
+    3. GENERATION: chama a LLM em paralelo, com no máximo `concorrencia` chamadas simultâneas
+
+    Args:
+        perguntas (list): Lista de perguntas (str) ou de dicionários com
+            "pergunta" e, opcionalmente, "contexto_adicional" e "top_k"
+        contexto_adicional (str): Contexto padrão para os itens que não informarem
+        top_k (int): top_k padrão para os itens que não informarem
+        concorrencia (int): Máximo de chamadas simultâneas à LLM
+        modo_busca (str): "vetorial", "lexical" ou "hibrida" (padrão: MODO_BUSCA_PADRAO)
+        filtros (dict): Filtros estruturados aplicados a todas as perguntas do lote
+        incluir_tempos (bool): Inclui o campo "timings" com a duração de cada etapa do lote
+
+    Retorna: Dicionário com um resultado por pergunta, na mesma ordem (cada item
+    tem o mesmo formato da resposta de processar_pergunta_rag, com erro por item)
+    """
+    if not isinstance(perguntas, list) or not perguntas:
+        return ERRO_LOTE_VAZIO
+
+    inicio = time.perf_counter()
+    tempos = {}
+    try:
+        modo_busca = normalizar_modo_busca(modo_busca)
+        if modo_busca is None:
+            return ERRO_MODO_BUSCA
+
+        where, erro_filtro = montar_filtro_where(filtros)
+        if erro_filtro:
+            return erro_filtros(erro_filtro)
+
+        itens, respostas, validos = normalizar_itens_lote(perguntas, contexto_adicional, top_k)
+
+        # ========== ETAPAS 1 e 2: RETRIEVAL e AUGMENTED (em lote) ==========
+        preparos = preparar_lote(itens, validos, respostas, modo_busca, where, tempos)
+
+        # ========== ETAPA 3: GENERATION (em paralelo, com limite) ==========
+        def gerar(preparo):
+            item = itens[preparo["indice"]]
+            try:
+                # Cada chamada entra no histograma; o tempo do lote todo fica em "geracao_lote"
+                with medir({}, "geracao", FASE):
+                    resposta = gerar_resposta(preparo["prompt"])
+                return preparo["indice"], concluir_pergunta(item["pergunta"], item["contexto_adicional"],
+                                                            preparo, resposta)
+            except Exception as erro:
+                logger.error(f"❌ Erro ao gerar a resposta da pergunta {preparo['indice']}: {erro}")
+                return preparo["indice"], erro_processamento(erro)
+
+        if preparos:
+            logger.info(f"🚀 Gerando {len(preparos)} respostas (até {concorrencia} simultâneas)...")
+            with medir(tempos, "geracao_lote", FASE), ThreadPoolExecutor(max_workers=max(1, concorrencia)) as executor:
+                for indice, resultado in executor.map(gerar, preparos):
+                    respostas[indice] = resultado
+
+    except Exception as erro:
+        logger.exception(f"❌ Erro durante o processamento RAG em lote: {erro}")
+        return anexar_tempos(erro_processamento(erro), tempos, inicio, incluir_tempos)
+
+    return resultado_lote(itens, respostas, tempos, inicio, incluir_tempos)
 
 
 # Teste local (apenas para desenvolvimento)
@@ -0,0 +1,387 @@
+# Arquivo responsável pelos recursos compartilhados (modelo e coleção)
+# Carrega o modelo de embeddings e abre a coleção do ChromaDB UMA vez por processo,
+# em vez de recriar tudo a cada requisição da Fase 2.
+# O chromadb só é importado quando a coleção é aberta pela primeira vez, e o
+# aquecimento pode rodar em segundo plano (andamento em estado_prontidao()).
+import threading
+import logging
+import time
+from configuracao import (
+    CAMINHO_CHROMA, NOME_COLECAO, MODELO_EMBEDDINGS, BACKEND_BUSCA, BACKEND_CODIFICADOR,
+    ESPACO_HNSW, M_HNSW, CONSTRUCTION_EF_HNSW, SEARCH_EF_HNSW, INTERVALO_VERIFICACAO_SNAPSHOT,
+)
+from cache_respostas import cache_respostas
+from backends_busca import BackendChroma, BackendNumpy, BACKEND_NUMPY, BACKEND_SNAPSHOT, versao_indice_numpy
+from snapshots import abrir_snapshot, versao_atual, listar_snapshots
+from codificador_onnx import BACKEND_ONNX, carregar_codificador_onnx
+from metricas import importar
+
+logger = logging.getLogger(__name__)
+
+# Trava que protege a criação/recarga dos recursos entre requisições concorrentes
+_trava = threading.Lock()
+
+_modelo = None
+_cliente_chroma = None
+_colecao = None
+_backend = None
+
+# Troca de snapshot: uma por vez, fora da _trava (as consultas continuam com o backend antigo)
+_trava_troca = threading.Lock()
+_snapshot = {"fixado": None, "ultima_verificacao": 0.0, "invalido": None, "trocas": 0, "erro": None}
+# O mesmo acompanhamento para o índice NumPy publicado pela Fase 1 (em qualquer processo)
+_indice_numpy = {"ultima_verificacao": 0.0, "invalido": None}
+
+# Estado do aquecimento: pendente, em_andamento, concluido ou erro (com a duração de cada etapa)
+_aquecimento = {"estado": "pendente", "erro": None, "etapas": {}}
+
+
+def obter_modelo():
+    """
+    Retorna o modelo de vetorização compartilhado, carregando-o na primeira chamada.
+    Com BACKEND_CODIFICADOR = "onnx", usa o ONNX Runtime (o PyTorch nem é importado).
+
+    Retorna: Instância de SentenceTransformer ou CodificadorOnnx (ambos com encode())
+    """
+    global _modelo
+
+    if _modelo is None:
+        with _trava:
+            # Confere de novo: outra thread pode ter carregado enquanto esperávamos
+            if _modelo is None:
+                logger.info(f"🤖 Carregando modelo de vetorização ({MODELO_EMBEDDINGS}, {BACKEND_CODIFICADOR})...")
+                if BACKEND_CODIFICADOR == BACKEND_ONNX:
+                    _modelo = carregar_codificador_onnx()
+                else:
+                    SentenceTransformer = importar("sentence_transformers").SentenceTransformer
+                    _modelo = SentenceTransformer(MODELO_EMBEDDINGS)
+    return _modelo
+
+
+# Valores usados pelo ChromaDB quando a coleção não informa o parâmetro
+PADROES_HNSW = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+
+
+def parametros_hnsw(espaco=ESPACO_HNSW, m=M_HNSW, construction_ef=CONSTRUCTION_EF_HNSW, search_ef=SEARCH_EF_HNSW):
+    """
+    Metadados de criação da coleção com os parâmetros do índice HNSW.
+
+    Retorna: Dicionário no formato do ChromaDB (ex.: {"hnsw:space": "cosine", "hnsw:M": 16, ...})
+    """
+    return {"hnsw:space": espaco, "hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef}
+
+
+def parametros_colecao(colecao):
+    """Parâmetros HNSW com que a coleção foi criada (os ausentes são os padrões do ChromaDB)."""
+    metadata = colecao.metadata or {}
+    return {chave: metadata.get(chave, padrao) for chave, padrao in PADROES_HNSW.items()}
+
+
+# Sufixos das coleções usadas ao reconstruir o índice HNSW (vetorizacao_fase1):
+# a cópia é montada em "<nome>_reconstrucao" e a original fica em "<nome>_antiga" até a troca terminar
+SUFIXO_RECONSTRUCAO = "_reconstrucao"
+SUFIXO_ANTIGA = "_antiga"
+
+
+def abrir_colecao(cliente_chroma, nome=NOME_COLECAO):
+    """
+    Abre a coleção ou, se ela não existir, cria com os parâmetros HNSW configurados.
+    (get_or_create_collection com metadados sobrescreveria os de uma coleção existente,
+    sem mudar o índice já construído; por isso os metadados só vão na criação)
+
+    Se uma reconstrução do índice foi interrompida no meio da troca de nomes, a
+    coleção é recuperada da que sobrou: a original ("_antiga") ou a cópia ("_reconstrucao").
+
+    Retorna: Coleção do ChromaDB
+    """
+    try:
+        return cliente_chroma.get_collection(name=nome)
+    except ValueError:
+        pass
+    for sufixo in (SUFIXO_ANTIGA, SUFIXO_RECONSTRUCAO):
+        try:
+            sobra = cliente_chroma.get_collection(name=f"{nome}{sufixo}")
+        except ValueError:
+            continue
+        logger.warning(f"⚠️  Coleção {nome} ausente: recuperando de {nome}{sufixo} (reconstrução interrompida)")
+        sobra.modify(name=nome)
+        return sobra
+    return cliente_chroma.get_or_create_collection(name=nome, metadata=parametros_hnsw())
+
+
+def obter_colecao():
+    """
+    Retorna a coleção do ChromaDB compartilhada, abrindo-a na primeira chamada.
+
+    Retorna: Coleção do ChromaDB
+    """
+    global _cliente_chroma, _colecao
+
+    if _colecao is None:
+        with _trava:
+            if _colecao is None:
+                logger.info("💾 Conectando ao ChromaDB (modo persistente)...")
+                if _cliente_chroma is None:
+                    chromadb = importar("chromadb")
+                    _cliente_chroma = chromadb.PersistentClient(path=CAMINHO_CHROMA)
+                _colecao = abrir_colecao(_cliente_chroma)
+    return _colecao
+
+
+def obter_backend():
+    """
+    Retorna o backend de busca da Fase 2 configurado em BACKEND_BUSCA,
+    criando-o na primeira chamada. Com snapshots ou o índice NumPy, confere de
+    tempos em tempos se há uma versão nova para trocar (ver _acompanhar_snapshot
+    e _acompanhar_indice_numpy).
+
+    Retorna: BackendChroma, BackendNumpy ou BackendSnapshot
+    """
+    global _backend
+
+    backend = _backend
+    if backend is None:
+        if BACKEND_BUSCA == BACKEND_NUMPY:
+            with _trava:
+                if _backend is None:
+                    logger.info("🧮 Abrindo índice NumPy (memória mapeada)...")
+                    _backend = BackendNumpy()
+        elif BACKEND_BUSCA == BACKEND_SNAPSHOT:
+            with _trava:
+                if _backend is None:
+                    logger.info("📦 Abrindo snapshot do índice (memória mapeada)...")
+                    _backend = abrir_snapshot(_snapshot["fixado"])
+        else:
+            colecao = obter_colecao()
+            with _trava:
+                if _backend is None:
+                    _backend = BackendChroma(colecao)
+        backend = _backend
+    elif BACKEND_BUSCA == BACKEND_SNAPSHOT:
+        _acompanhar_snapshot(backend)
+    elif BACKEND_BUSCA == BACKEND_NUMPY:
+        _acompanhar_indice_numpy(backend)
+    return backend
+
+
+def trocar_snapshot(versao=None):
+    """
+    Abre e verifica um snapshot e só então o coloca no lugar do backend de busca,
+    numa única troca de referência: as consultas em andamento terminam com o
+    snapshot antigo (que continua aberto até a última delas) e as novas já usam o novo.
+
+    Args:
+        versao (str): Versão a usar, fixada neste processo; None = segue o ATUAL
+
+    Retorna: Dicionário com a versão anterior, a nova e o tempo de abertura
+    """
+    global _backend
+
+    with _trava_troca:
+        inicio = time.perf_counter()
+        novo = abrir_snapshot(versao)
+        segundos = time.perf_counter() - inicio
+        with _trava:
+            anterior, _backend = _backend, novo
+        _snapshot.update(fixado=versao, invalido=None, erro=None)
+        _snapshot["trocas"] += 1
+
+    versao_anterior = getattr(anterior, "versao", None)
+    if versao_anterior != novo.versao:
+        # As respostas em cache vieram do snapshot anterior
+        cache_respostas.invalidar()
+        logger.info(f"🔀 Snapshot trocado: {versao_anterior} -> {novo.versao} ({segundos:.3f}s)")
+    return {
+        "versao_anterior": versao_anterior,
+        "versao": novo.versao,
+        "fixada": versao is not None,
+        "documentos": novo.contar(),
+        "segundos_abertura": round(segundos, 4),
+    }
+
+
+def _acompanhar_snapshot(backend):
+    """
+    A cada INTERVALO_VERIFICACAO_SNAPSHOT segundos, confere se o ATUAL aponta para
+    outra versão; se sim, a troca é feita numa thread (a consulta atual não espera).
+    Uma versão que falhou na verificação não é tentada de novo até o ATUAL mudar.
+    """
+    agora = time.monotonic()
+    if (INTERVALO_VERIFICACAO_SNAPSHOT <= 0 or _snapshot["fixado"] is not None
+            or agora - _snapshot["ultima_verificacao"] < INTERVALO_VERIFICACAO_SNAPSHOT):
+        return
+    _snapshot["ultima_verificacao"] = agora
+    versao = versao_atual()
+    if versao in (None, backend.versao, _snapshot["invalido"]) or _trava_troca.locked():
+        return
+
+    def trocar():
+        try:
+            trocar_snapshot()
+        except Exception as erro:
+            _snapshot.update(invalido=versao, erro=str(erro))
+            logger.warning(f"⚠️  Snapshot {versao} não pôde ser aberto; mantendo {backend.versao}: {erro}")
+
+    threading.Thread(target=trocar, name="troca_snapshot", daemon=True).start()
+
+
+def _acompanhar_indice_numpy(backend):
+    """
+    A cada INTERVALO_VERIFICACAO_SNAPSHOT segundos, confere se a Fase 1 (talvez em
+    outro processo da API) publicou uma versão nova do índice NumPy; se sim, ela é
+    aberta numa thread e entra no lugar da atual numa única troca de referência.
+    """
+    global _backend
+
+    agora = time.monotonic()
+    if (INTERVALO_VERIFICACAO_SNAPSHOT <= 0
+            or agora - _indice_numpy["ultima_verificacao"] < INTERVALO_VERIFICACAO_SNAPSHOT):
+        return
+    _indice_numpy["ultima_verificacao"] = agora
+    versao = versao_indice_numpy()
+    if versao in (None, backend.versao_indice, _indice_numpy["invalido"]) or _trava_troca.locked():
+        return
+
+    def trocar():
+        global _backend
+        with _trava_troca:
+            try:
+                novo = BackendNumpy()
+            except Exception as erro:
+                _indice_numpy["invalido"] = versao
+                logger.warning(f"⚠️  Índice NumPy {versao} não pôde ser aberto; mantendo {backend.versao_indice}: {erro}")
+                return
+            with _trava:
+                _backend = novo
+        cache_respostas.invalidar()
+        logger.info(f"🔀 Índice NumPy trocado: {backend.versao_indice} -> {novo.versao_indice}")
+
+    threading.Thread(target=trocar, name="troca_indice_numpy", daemon=True).start()
+
+
+def estado_snapshot():
+    """
+    Retorna: Versão em uso, versão apontada pelo ATUAL, versões disponíveis e trocas feitas
+    """
+    backend = _backend
+    return {
+        "backend_busca": BACKEND_BUSCA,
+        "versao_em_uso": getattr(backend, "versao", None),
+        "versao_atual": versao_atual(),
+        "fixada": _snapshot["fixado"],
+        "trocas": _snapshot["trocas"],
+        "erro": _snapshot["erro"],
+        "disponiveis": listar_snapshots(),
+    }
+
+
+def aquecer():
+    """
+    Carrega o modelo e abre a coleção antecipadamente (usado na inicialização da API),
+    para que a primeira pergunta não pague o custo de carregamento.
+    """
+    _aquecimento.update(estado="em_andamento", erro=None, etapas={})
+    try:
+        inicio = time.perf_counter()
+        modelo = obter_modelo()
+        _aquecimento["etapas"]["modelo"] = round(time.perf_counter() - inicio, 4)
+
+        inicio = time.perf_counter()
+        obter_backend()
+        _aquecimento["etapas"]["indice"] = round(time.perf_counter() - inicio, 4)
+
+        # Uma codificação inicial aquece os caches internos do modelo
+        inicio = time.perf_counter()
+        modelo.encode(["aquecimento"])
+        _aquecimento["etapas"]["primeira_codificacao"] = round(time.perf_counter() - inicio, 4)
+
+        _aquecimento["estado"] = "concluido"
+        logger.info(f"✅ Recursos da Fase 2 prontos! ({sum(_aquecimento['etapas'].values()):.2f}s)")
+    except Exception as erro:
+        _aquecimento.update(estado="erro", erro=str(erro))
+        logger.warning(f"⚠️  Não foi possível aquecer os recursos: {erro}")
+
+
+def aquecer_em_segundo_plano():
+    """
+    Inicia o aquecimento numa thread, sem atrasar a inicialização da API.
+    O andamento é consultado por estado_prontidao() (endpoint /saude/pronto).
+
+    Retorna: A thread iniciada
+    """
+    _aquecimento["estado"] = "em_andamento"
+    thread = threading.Thread(target=aquecer, name="aquecimento", daemon=True)
+    thread.start()
+    return thread
+
+
+def estado_aquecimento():
+    """
+    Retorna: Cópia do estado do aquecimento (estado, erro e segundos de cada etapa)
+    """
+    return {**_aquecimento, "etapas": dict(_aquecimento["etapas"])}
+
+
+def estado_prontidao():
+    """
+    Confere se a Fase 2 responde sem carregar nada pesado: modelo carregado e
+    índice de busca aberto com documentos. Nunca carrega o modelo.
+
+    Retorna: Tupla (pronto, detalhes)
+    """
+    aquecimento = estado_aquecimento()
+    detalhes = {
+        "aquecimento": aquecimento["estado"],
+        "modelo_carregado": _modelo is not None,
+        "documentos": 0,
+    }
+    if BACKEND_BUSCA == BACKEND_SNAPSHOT:
+        detalhes["snapshot"] = getattr(_backend, "versao", None)
+    if aquecimento["erro"]:
+        detalhes["erro"] = aquecimento["erro"]
+
+    # Sem o modelo (ou com o aquecimento em andamento), nem abre o índice
+    if _modelo is None or aquecimento["estado"] == "em_andamento":
+        return False, detalhes
+
+    try:
+        # Reabre o índice se a Fase 1 acabou de descartá-lo (rápido: o modelo já está na memória)
+        detalhes["documentos"] = obter_backend().contar()
+    except Exception as erro:
+        detalhes["erro"] = str(erro)
+        return False, detalhes
+
+    return detalhes["documentos"] > 0, detalhes
+
+
+def recarregar():
+    """
+    Descarta a referência à coleção (e ao backend de busca) para que a próxima consulta a reabra.
+    Deve ser chamada depois que a Fase 1 re-vetoriza o banco (a coleção pode ter
+    sido apagada e recriada). O modelo é mantido, pois não muda. As respostas do
+    cache semântico também são descartadas, pois os filmes podem ter mudado.
+
+    Com snapshots, o backend não é descartado: o snapshot novo é aberto e verificado
+    (checksums) aqui, fora da _trava, e só então trocado (trocar_snapshot), sem
+    bloquear as consultas em andamento.
+    """
+    global _colecao, _backend
+
+    if BACKEND_BUSCA == BACKEND_SNAPSHOT:
+        with _trava:
+            _colecao = None
+            backend = _backend
+        if backend is not None and _snapshot["fixado"] is None and versao_atual() != backend.versao:
+            try:
+                trocar_snapshot()
+            except Exception as erro:
+                _snapshot.update(invalido=versao_atual(), erro=str(erro))
+                logger.warning(f"⚠️  Snapshot novo não pôde ser aberto; mantendo {backend.versao}: {erro}")
+        cache_respostas.invalidar()
+        return
+
+    with _trava:
+        _colecao = None
+        _backend = None
+    cache_respostas.invalidar()
+    logger.info("🔄 Coleção do ChromaDB (e índice de busca) será reaberta na próxima consulta.")
@@ -0,0 +1,303 @@
+# Arquivo responsável pelos snapshots do índice de busca (distribuição para réplicas)
+# Ao final da Fase 1, os vetores, documentos e metadados viram um snapshot IMUTÁVEL
+# e versionado: um diretório com os arquivos do índice NumPy (vetores .npy e
+# documentos.json) e um manifesto.json com o modelo, o esquema e o SHA-256 de cada
+# arquivo. O arquivo ATUAL aponta para a versão em uso e é trocado atomicamente.
+# As réplicas da API (BACKEND_BUSCA = "snapshot") só leem esses arquivos: abrem o
+# snapshot com memória mapeada em uma fração de segundo, sem ChromaDB nem imdb.db,
+# e trocam para uma versão nova sem interromper as consultas em andamento.
+# Para distribuir, basta copiar os diretórios de versão e, por último, o ATUAL.
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+from configuracao import (
+    CAMINHO_SNAPSHOTS, SNAPSHOTS_MANTIDOS, VERIFICAR_CHECKSUM_SNAPSHOT, MODELO_EMBEDDINGS,
+    BACKEND_CODIFICADOR, PRECISAO_INDICE_NUMPY, FATOR_REPONTUACAO_NUMPY,
+)
+from backends_busca import BackendNumpy, BACKEND_SNAPSHOT, gravar_indice_numpy
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato do snapshot (muda se os arquivos ou o manifesto mudarem de formato)
+ESQUEMA_SNAPSHOT = 1
+
+ARQUIVO_MANIFESTO = "manifesto.json"
+ARQUIVO_ATUAL = "ATUAL"
+
+# Diretórios em construção (ignorados na listagem e removidos se sobrarem de uma falha)
+PREFIXO_TEMPORARIO = ".publicando-"
+
+# Bytes lidos por vez no cálculo do SHA-256
+TAMANHO_LEITURA_HASH = 1024 * 1024
+
+
+def calcular_sha256(caminho):
+    """SHA-256 do arquivo, lido em pedaços (a memória não cresce com o tamanho)."""
+    hash_arquivo = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for pedaco in iter(lambda: arquivo.read(TAMANHO_LEITURA_HASH), b""):
+            hash_arquivo.update(pedaco)
+    return hash_arquivo.hexdigest()
+
+
+def versao_atual(diretorio=CAMINHO_SNAPSHOTS):
+    """
+    Versão apontada pelo arquivo ATUAL.
+
+    Retorna: Nome da versão ou None se nenhum snapshot foi publicado
+    """
+    try:
+        with open(os.path.join(diretorio, ARQUIVO_ATUAL), encoding="utf-8") as arquivo:
+            return arquivo.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def validar_versao(versao):
+    """
+    Confere se a versão é só o nome de um diretório de snapshot (ela vem da API e
+    entra no caminho dos arquivos): sem separadores, "..", nem diretórios ocultos
+    ou temporários (".publicando-...").
+
+    Retorna: A versão; lança ValueError se o nome for inválido
+    """
+    if (not isinstance(versao, str) or not versao or versao.startswith(".") or "\0" in versao
+            or any(separador in versao for separador in ("/", "\\", os.sep, os.altsep) if separador)):
+        raise ValueError(f"Versão de snapshot inválida: {versao!r}")
+    return versao
+
+
+def apontar_versao(versao, diretorio=CAMINHO_SNAPSHOTS):
+    """
+    Torna a versão a atual (também serve para voltar a uma versão anterior).
+    O ATUAL é gravado em um arquivo temporário e substituído de uma vez (os.replace):
+    quem lê vê a versão antiga ou a nova, nunca um arquivo pela metade.
+    """
+    validar_versao(versao)
+    if not os.path.exists(os.path.join(diretorio, versao, ARQUIVO_MANIFESTO)):
+        raise ValueError(f"Snapshot não encontrado: {versao}")
+    caminho = os.path.join(diretorio, ARQUIVO_ATUAL)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+        arquivo.write(versao)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def ler_manifesto(versao, diretorio=CAMINHO_SNAPSHOTS):
+    """Retorna: Dicionário do manifesto.json da versão"""
+    caminho = os.path.join(diretorio, validar_versao(versao), ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        raise ValueError(f"Snapshot não encontrado: {versao}")
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+def listar_snapshots(diretorio=CAMINHO_SNAPSHOTS):
+    """
+    Lista os snapshots publicados, do mais antigo para o mais recente.
+
+    Retorna: Lista de dicionários (versao, criado_em, documentos, modelo, bytes, atual)
+    """
+    if not os.path.isdir(diretorio):
+        return []
+    atual = versao_atual(diretorio)
+    snapshots = []
+    for versao in sorted(os.listdir(diretorio)):
+        if versao.startswith(".") or not os.path.exists(os.path.join(diretorio, versao, ARQUIVO_MANIFESTO)):
+            continue
+        manifesto = ler_manifesto(versao, diretorio)
+        snapshots.append({
+            "versao": versao,
+            "criado_em": manifesto["criado_em"],
+            "documentos": manifesto["documentos"],
+            "modelo": manifesto["modelo"],
+            "bytes": sum(arquivo["bytes"] for arquivo in manifesto["arquivos"].values()),
+            "atual": versao == atual,
+        })
+    return snapshots
+
+
+def publicar_snapshot(ids, documentos, metadados, vetores, diretorio=CAMINHO_SNAPSHOTS,
+                      precisao=PRECISAO_INDICE_NUMPY, fator_repontuacao=FATOR_REPONTUACAO_NUMPY,
+                      manter=SNAPSHOTS_MANTIDOS):
+    """
+    Publica um snapshot novo e o torna o atual. O diretório é montado com um nome
+    temporário e renomeado só depois de completo (com manifesto e checksums); os
+    arquivos ficam somente leitura. Se o conteúdo for igual ao do snapshot atual,
+    nada é publicado.
+
+    Args:
+        ids, documentos, metadados (list): Documentos da coleção, na ordem dos vetores
+        vetores (numpy.ndarray): Vetores float32 normalizados
+        diretorio (str): Onde ficam os snapshots
+        precisao (str): Precisão dos vetores ("float32", "float16" ou "int8")
+        fator_repontuacao (int): Repontuação com float32 (ver backends_busca)
+        manter (int): Quantos snapshots manter (os mais antigos são apagados; o atual nunca)
+
+    Retorna: Dicionário com a versão, se foi publicada, documentos e tamanho
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    temporario = tempfile.mkdtemp(prefix=PREFIXO_TEMPORARIO, dir=diretorio)
+    try:
+        gravar_indice_numpy(temporario, ids, documentos, metadados, vetores, precisao, fator_repontuacao)
+        arquivos = {
+            nome: {"bytes": os.path.getsize(os.path.join(temporario, nome)),
+                   "sha256": calcular_sha256(os.path.join(temporario, nome))}
+            for nome in sorted(os.listdir(temporario))
+        }
+        # Identidade do conteúdo: os checksums dos arquivos e o modelo que gerou os vetores
+        conteudo = json.dumps({"modelo": MODELO_EMBEDDINGS, "arquivos": arquivos}, sort_keys=True)
+        hash_conteudo = hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+        atual = versao_atual(diretorio)
+        if atual and ler_manifesto(atual, diretorio).get("hash_conteudo") == hash_conteudo:
+            logger.info(f"📦 Snapshot inalterado (versão {atual})")
+            return {"versao": atual, "publicado": False, "documentos": len(ids)}
+
+        criado_em = time.gmtime()
+        versao = f"{time.strftime('%Y%m%dT%H%M%SZ', criado_em)}-{hash_conteudo[:12]}"
+        manifesto = {
+            "esquema": ESQUEMA_SNAPSHOT,
+            "versao": versao,
+            "criado_em": time.strftime("%Y-%m-%dT%H:%M:%SZ", criado_em),
+            "modelo": MODELO_EMBEDDINGS,
+            "codificador": BACKEND_CODIFICADOR,
+            "dimensao": int(vetores.shape[1]) if vetores.size else 0,
+            "documentos": len(ids),
+            "precisao": precisao,
+            "fator_repontuacao": fator_repontuacao,
+            "hash_conteudo": hash_conteudo,
+            "arquivos": arquivos,
+        }
+        with open(os.path.join(temporario, ARQUIVO_MANIFESTO), "w", encoding="utf-8") as arquivo:
+            json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+
+        for nome in os.listdir(temporario):
+            os.chmod(os.path.join(temporario, nome), 0o444)
+        os.chmod(temporario, 0o755)
+        # O diretório só aparece com o nome da versão quando está completo
+        os.rename(temporario, os.path.join(diretorio, versao))
+        temporario = None
+        apontar_versao(versao, diretorio)
+    finally:
+        if temporario is not None:
+            shutil.rmtree(temporario, ignore_errors=True)
+
+    removidos = podar_snapshots(diretorio, manter)
+    logger.info(f"📦 Snapshot {versao} publicado ({len(ids)} documentos)")
+    return {
+        "versao": versao,
+        "publicado": True,
+        "documentos": len(ids),
+        "bytes": sum(arquivo["bytes"] for arquivo in arquivos.values()),
+        "removidos": removidos,
+    }
+
+
+def podar_snapshots(diretorio=CAMINHO_SNAPSHOTS, manter=SNAPSHOTS_MANTIDOS):
+    """
+    Apaga os snapshots mais antigos além dos `manter` mais recentes (o atual nunca)
+    e restos de publicações interrompidas.
+
+    Retorna: Lista das versões apagadas
+    """
+    for nome in os.listdir(diretorio):
+        if nome.startswith(PREFIXO_TEMPORARIO):
+            # Só os abandonados: uma publicação em andamento em outro processo é recente
+            caminho = os.path.join(diretorio, nome)
+            if time.time() - os.path.getmtime(caminho) > 3600:
+                shutil.rmtree(caminho, ignore_errors=True)
+
+    atual = versao_atual(diretorio)
+    versoes = [snapshot["versao"] for snapshot in listar_snapshots(diretorio)]
+    removidos = [versao for versao in versoes[:max(0, len(versoes) - max(manter, 1))] if versao != atual]
+    for versao in removidos:
+        shutil.rmtree(os.path.join(diretorio, versao), ignore_errors=True)
+    return removidos
+
+
+def verificar_snapshot(versao, diretorio=CAMINHO_SNAPSHOTS, checksums=True):
+    """
+    Confere se o snapshot pode ser usado: esquema conhecido, mesmo modelo de
+    embeddings da Fase 2 (senão os vetores das perguntas não são comparáveis)
+    e arquivos íntegros (tamanho e, com checksums=True, SHA-256).
+
+    Retorna: O manifesto. Lança ValueError se o snapshot for inválido.
+    """
+    manifesto = ler_manifesto(versao, diretorio)
+    if manifesto.get("esquema") != ESQUEMA_SNAPSHOT:
+        raise ValueError(f"Snapshot {versao} tem esquema {manifesto.get('esquema')} "
+                         f"(esperado: {ESQUEMA_SNAPSHOT})")
+    if manifesto["modelo"] != MODELO_EMBEDDINGS:
+        raise ValueError(f"Snapshot {versao} foi gerado com o modelo {manifesto['modelo']}, "
+                         f"mas a Fase 2 usa {MODELO_EMBEDDINGS}")
+    for nome, arquivo in manifesto["arquivos"].items():
+        caminho = os.path.join(diretorio, versao, nome)
+        if not os.path.exists(caminho) or os.path.getsize(caminho) != arquivo["bytes"]:
+            raise ValueError(f"Snapshot {versao} incompleto: {nome} ausente ou com tamanho diferente")
+        if checksums and calcular_sha256(caminho) != arquivo["sha256"]:
+            raise ValueError(f"Snapshot {versao} corrompido: checksum de {nome} não confere")
+    return manifesto
+
+
+class BackendSnapshot(BackendNumpy):
+    """
+    Busca exata (BackendNumpy) sobre um snapshot. O snapshot nunca muda depois de
+    publicado, então o backend pode ser compartilhado sem travas; uma versão nova
+    é um backend novo (ver recursos.trocar_snapshot).
+    """
+
+    nome = BACKEND_SNAPSHOT
+
+    def __init__(self, versao=None, diretorio=CAMINHO_SNAPSHOTS, manifesto=None):
+        self.versao = versao
+        self.manifesto = manifesto
+        if versao is None:
+            # Nenhum snapshot publicado ainda: comporta-se como um banco vazio
+            super().__init__(os.path.join(diretorio, ARQUIVO_ATUAL + ".inexistente"))
+            return
+        super().__init__(os.path.join(diretorio, versao), manifesto["precisao"], manifesto["fator_repontuacao"])
+        if self.contar() and self.vetores.shape[1] != manifesto["dimensao"]:
+            raise ValueError(f"Snapshot {versao}: dimensão {self.vetores.shape[1]} "
+                             f"diferente da do manifesto ({manifesto['dimensao']})")
+
+
+def abrir_snapshot(versao=None, diretorio=CAMINHO_SNAPSHOTS, checksums=VERIFICAR_CHECKSUM_SNAPSHOT):
+    """
+    Abre um snapshot (por padrão, o atual) já verificado.
+
+    Retorna: BackendSnapshot (vazio se nenhum snapshot foi publicado)
+    """
+    versao = versao or versao_atual(diretorio)
+    if versao is None:
+        return BackendSnapshot(None, diretorio)
+    manifesto = verificar_snapshot(versao, diretorio, checksums)
+    return BackendSnapshot(versao, diretorio, manifesto)
+
+
+# Uso:
+#   python snapshots.py                   -> lista os snapshots publicados
+#   python snapshots.py publicar          -> publica um snapshot da coleção do ChromaDB (sem re-vetorizar)
+#   python snapshots.py verificar [versao]-> confere manifesto e checksums (padrão: a atual)
+#   python snapshots.py ativar <versao>   -> aponta o ATUAL para a versão (ex.: voltar à anterior)
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else "listar"
+    if comando == "publicar":
+        from recursos import obter_colecao
+        from backends_busca import ler_vetores_colecao
+        print(publicar_snapshot(*ler_vetores_colecao(obter_colecao())))
+    elif comando == "verificar":
+        versao_verificada = sys.argv[2] if len(sys.argv) > 2 else versao_atual()
+        inicio = time.perf_counter()
+        abrir_snapshot(versao_verificada)
+        print(f"✅ Snapshot {versao_verificada} íntegro (verificado e aberto em {time.perf_counter() - inicio:.3f}s)")
+    elif comando == "ativar" and len(sys.argv) > 2:
+        apontar_versao(sys.argv[2])
+        print(f"✅ Snapshot atual: {sys.argv[2]}")
+    else:
+        for snapshot in listar_snapshots():
+            print(snapshot)
@@ -0,0 +1,141 @@
+# Arquivo responsável por executar a Fase 1 em segundo plano
+# O endpoint /fase_1 apenas cria a tarefa e devolve um ID; o progresso é
+# consultado depois em /fase_1/status/<id_tarefa>.
+import logging
+import threading
+import time
+import uuid
+from vetorizacao_fase1 import vetorizar_banco
+from recursos import recarregar
+
+logger = logging.getLogger(__name__)
+
+# Quantidade de tarefas concluídas mantidas para consulta
+MAXIMO_TAREFAS_GUARDADAS = 20
+
+_trava = threading.Lock()
+_tarefas = {}
+_id_tarefa_ativa = None
+
+
+def _executar_tarefa(id_tarefa, parametros):
+    """Executa a vetorização na thread da tarefa e registra o resultado."""
+    global _id_tarefa_ativa
+
+    tarefa = _tarefas[id_tarefa]
+
+    def ao_progresso(progresso):
+        with _trava:
+            tarefa["progresso"].update(progresso)
+
+    try:
+        resultado = vetorizar_banco(ao_progresso=ao_progresso, **parametros)
+        # A coleção pode ter sido recriada: a Fase 2 deve reabri-la
+        recarregar()
+    except Exception as erro:
+        logger.exception(f"❌ Erro na tarefa de vetorização {id_tarefa}: {erro}")
+        resultado = {"status": "erro", "mensagem": f"Erro durante a vetorização: {str(erro)}"}
+
+    with _trava:
+        tarefa["status"] = "concluida" if resultado.get("status") == "sucesso" else "erro"
+        tarefa["resultado"] = resultado
+        tarefa["fim"] = time.time()
+        _id_tarefa_ativa = None
+
+
+def iniciar_tarefa(**parametros):
+    """
+    Cria uma tarefa de vetorização em segundo plano.
+    Se já houver uma vetorização em andamento, nenhuma nova é criada: a tarefa
+    existente é devolvida (duas vetorizações simultâneas disputariam a coleção).
+
+    Args:
+        **parametros: Repassados para vetorizar_banco (modo, tamanho_bloco, trabalhadores)
+
+    Retorna: Tupla (estado_da_tarefa, criada) — criada é False quando reaproveitada
+    """
+    global _id_tarefa_ativa
+
+    with _trava:
+        if _id_tarefa_ativa is not None:
+            return _descrever(_tarefas[_id_tarefa_ativa]), False
+
+        id_tarefa = uuid.uuid4().hex
+        _tarefas[id_tarefa] = {
+            "id_tarefa": id_tarefa,
+            "status": "em_andamento",
+            "parametros": parametros,
+            "inicio": time.time(),
+            "fim": None,
+            "progresso": {},
+            "resultado": None,
+        }
+        _id_tarefa_ativa = id_tarefa
+
+        # Descarta as tarefas concluídas mais antigas
+        concluidas = [t for t in _tarefas.values() if t["fim"] is not None]
+        for antiga in sorted(concluidas, key=lambda t: t["fim"])[:-MAXIMO_TAREFAS_GUARDADAS]:
+            del _tarefas[antiga["id_tarefa"]]
+
+    threading.Thread(target=_executar_tarefa, args=(id_tarefa, parametros), daemon=True).start()
+    return obter_tarefa(id_tarefa), True
+
+
+def ler_inteiro(valor, nome, minimo=None):
+    """
+    Converte um parâmetro da requisição para inteiro (aceita "8" ou 8, mas não 2.5 nem true).
+
+    Args:
+        valor: Valor recebido (query string ou JSON)
+        nome (str): Nome do parâmetro, usado na mensagem de erro
+        minimo (int): Menor valor aceito (None = sem limite)
+
+    Retorna: O inteiro; lança ValueError se o valor for inválido
+    """
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ValueError(f"Parâmetro '{nome}' deve ser um número inteiro (recebido: {valor!r})")
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"Parâmetro '{nome}' deve ser um número inteiro (recebido: {valor!r})")
+    if minimo is not None and numero < minimo:
+        raise ValueError(f"Parâmetro '{nome}' deve ser maior ou igual a {minimo} (recebido: {numero})")
+    return numero
+
+
+def obter_tarefa(id_tarefa):
+    """
+    Retorna o estado de uma tarefa, com taxa (linhas/s) e tempo restante estimado.
+
+    Retorna: Dicionário com o estado ou None se a tarefa não existir
+    """
+    with _trava:
+        tarefa = _tarefas.get(id_tarefa)
+        return _descrever(tarefa) if tarefa else None
+
+
+def _descrever(tarefa):
+    """Monta a descrição pública de uma tarefa (chamada com a trava adquirida)."""
+    progresso = dict(tarefa["progresso"])
+    fim = tarefa["fim"] or time.time()
+    decorrido = fim - tarefa["inicio"]
+
+    # Taxa calculada só sobre as linhas lidas nesta execução (não as do checkpoint)
+    linhas_nesta_execucao = progresso.get("linhas_lidas", 0) - progresso.get("linhas_iniciais", 0)
+    taxa = linhas_nesta_execucao / decorrido if decorrido > 0 else 0.0
+    restantes = progresso.get("total_registros", 0) - progresso.get("linhas_lidas", 0)
+
+    return {
+        "id_tarefa": tarefa["id_tarefa"],
+        "status": tarefa["status"],
+        "parametros": tarefa["parametros"],
+        "segundos_decorridos": round(decorrido, 1),
+        "linhas_lidas": progresso.get("linhas_lidas", 0),
+        "documentos_vetorizados": progresso.get("documentos_vetorizados", 0),
+        "documentos_gravados": progresso.get("documentos_gravados", 0),
+        "total_registros": progresso.get("total_registros"),
+        "linhas_por_segundo": round(taxa, 2),
+        "segundos_restantes_estimados": round(restantes / taxa, 1)
+        if taxa > 0 and tarefa["status"] == "em_andamento" else None,
+        "resultado": tarefa["resultado"],
+    }
@@ -0,0 +1,133 @@
+"""
+Testes do codificador ONNX.
+- Pooling, normalização e a ordem dos lotes do encode(), com saídas fixas no lugar
+  do modelo e do tokenizador: rodam sempre, sem rede e sem o onnxruntime.
+- Paridade com o SentenceTransformer (PyTorch): exporta o modelo para um diretório
+  temporário e compara os vetores das frases fixas de TEXTOS_PARIDADE. É pulado
+  quando o onnxruntime, o PyTorch ou o modelo não estão disponíveis (ex.: sem
+  rede e sem o modelo no cache).
+
+Uso: python -m pytest -q test_codificador_onnx.py
+"""
+import numpy as np
+import pytest
+
+from configuracao import MODELO_EMBEDDINGS
+from codificador_onnx import (
+    LIMIAR_PARIDADE, LIMIAR_PARIDADE_INT8, TEXTOS_PARIDADE, CodificadorOnnx, exportar_onnx, verificar_paridade,
+)
+
+# Dois textos com 3 e 2 tokens (o segundo com padding) e dimensão 2
+ESTADOS = np.array([
+    [[1.0, 2.0], [3.0, 4.0], [5.0, 0.0]],
+    [[4.0, 0.0], [0.0, 3.0], [100.0, 100.0]],
+], dtype=np.float32)
+MASCARA = np.array([[1, 1, 1], [1, 1, 0]], dtype=np.int64)
+
+
+def codificador_falso(pooling="mean", normalizar=True, sessao=None, tokenizador=None):
+    """CodificadorOnnx sem arquivos: só a configuração (e, para o encode, sessão e tokenizador falsos)."""
+    codificador = CodificadorOnnx.__new__(CodificadorOnnx)
+    codificador.configuracao = {
+        "pooling": pooling, "normalizar": normalizar, "dimensao": 2, "entradas": ["input_ids", "attention_mask"],
+    }
+    codificador.sessao = sessao
+    codificador.tokenizador = tokenizador
+    return codificador
+
+
+@pytest.mark.parametrize("pooling, esperado", [
+    # mean ignora o token de padding (o [100, 100] do segundo texto)
+    ("mean", [[3.0, 2.0], [2.0, 1.5]]),
+    ("cls", [[1.0, 2.0], [4.0, 0.0]]),
+    ("max", [[5.0, 4.0], [4.0, 3.0]]),
+])
+def test_pooling_sem_normalizar(pooling, esperado):
+    vetores = codificador_falso(pooling, normalizar=False)._pooling(ESTADOS, MASCARA)
+
+    assert vetores.dtype == np.float32
+    np.testing.assert_allclose(vetores, esperado, rtol=1e-6)
+
+
+def test_pooling_normalizado():
+    vetores = codificador_falso("cls")._pooling(ESTADOS, MASCARA)
+
+    np.testing.assert_allclose(vetores, [[1 / np.sqrt(5), 2 / np.sqrt(5)], [1.0, 0.0]], rtol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(vetores, axis=1), 1.0, rtol=1e-6)
+
+
+def test_pooling_vetor_nulo_nao_gera_nan():
+    estados = np.zeros((1, 2, 2), dtype=np.float32)
+
+    vetores = codificador_falso("mean")._pooling(estados, np.array([[1, 1]]))
+
+    assert not np.isnan(vetores).any()
+
+
+class _Codificado:
+    def __init__(self, ids):
+        self.ids = ids
+        self.attention_mask = [1 if i else 0 for i in ids]
+        self.type_ids = [0] * len(ids)
+
+
+class _TokenizadorFalso:
+    """Um token por caractere (id = código do caractere), com padding até o maior texto do lote."""
+
+    def encode_batch(self, textos):
+        tamanho = max(len(texto) for texto in textos)
+        return [_Codificado([ord(c) for c in texto] + [0] * (tamanho - len(texto))) for texto in textos]
+
+
+class _SessaoFalsa:
+    """Estado oculto de cada token = [id, 1]; registra os lotes recebidos."""
+
+    def __init__(self):
+        self.lotes = []
+
+    def run(self, saidas, entradas):
+        assert set(entradas) == {"input_ids", "attention_mask"}
+        ids = entradas["input_ids"].astype(np.float32)
+        self.lotes.append(ids.shape)
+        return [np.stack([ids, np.ones_like(ids)], axis=2)]
+
+
+def test_encode_mantem_a_ordem_de_entrada():
+    sessao = _SessaoFalsa()
+    codificador = codificador_falso("mean", normalizar=False, sessao=sessao, tokenizador=_TokenizadorFalso())
+    textos = ["ccc", "a", "bb"]
+
+    vetores = codificador.encode(textos, batch_size=2)
+
+    # Média dos ids de cada texto, sem o padding
+    esperado = [[np.mean([ord(c) for c in texto]), 1.0] for texto in textos]
+    np.testing.assert_allclose(vetores, esperado, rtol=1e-6)
+    # Lotes montados do texto mais curto para o mais longo
+    assert sessao.lotes == [(2, 2), (1, 3)]
+    assert codificador.encode("a").shape == (1, 2)
+
+
+@pytest.fixture(scope="module")
+def diretorio_onnx(tmp_path_factory):
+    """Modelo exportado (fp32 e int8) uma vez para os testes do módulo."""
+    for modulo in ("onnxruntime", "tokenizers", "torch"):
+        pytest.importorskip(modulo)
+    SentenceTransformer = pytest.importorskip("sentence_transformers").SentenceTransformer
+
+    try:
+        SentenceTransformer(MODELO_EMBEDDINGS, device="cpu")
+    except Exception as erro:
+        pytest.skip(f"Modelo {MODELO_EMBEDDINGS} indisponível: {erro}")
+    diretorio = str(tmp_path_factory.mktemp("modelo_onnx"))
+    exportar_onnx(MODELO_EMBEDDINGS, diretorio, quantizar_int8=True)
+    return diretorio
+
+
+@pytest.mark.parametrize("quantizado, limiar", [(False, LIMIAR_PARIDADE), (True, LIMIAR_PARIDADE_INT8)])
+def test_paridade_onnx(diretorio_onnx, quantizado, limiar):
+    resultado = verificar_paridade(MODELO_EMBEDDINGS, diretorio_onnx, quantizado, textos=TEXTOS_PARIDADE)
+
+    assert resultado["limiar"] == limiar
+    assert resultado["similaridade_minima"] >= limiar
+    assert resultado["mesmo_vizinho_mais_proximo"] == 1.0
+    assert resultado["aprovado"]
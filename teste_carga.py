@@ -0,0 +1,400 @@
+"""
+Teste de carga da API: N clientes simultâneos enviando requisições a uma taxa alvo
+para /fase_2, /fase_2/stream, /fase_2/lote e /perguntar, com mistura configurável.
+
+Relata vazão, percentis de latência, tempo até o primeiro byte (TTFB), tempo até o
+primeiro trecho da LLM (streaming) e taxa de erros, por endpoint e no total.
+
+Uso:
+    python teste_carga.py --url http://localhost:5000 --clientes 16 --taxa 20 --duracao 30
+    python teste_carga.py --mix fase_2=6,stream=2,lote=1,perguntar=1 --saida carga.json
+    python teste_carga.py --servidor-local --latencia-llm 0.5   # API local com a LLM falsa
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import requests
+from benchmark_rag import ClienteLLMFalso
+from metricas import percentis
+
+# URL base da API
+BASE_URL = "http://localhost:5000"
+
+# Mesmos formatos de pergunta do teste_fase2.py
+CASOS_TESTE = (
+    {"pergunta": "Me recomende filmes de ação emocionantes",
+     "contexto_adicional": "Gosto de filmes com muita adrenalina e efeitos especiais", "top_k": 3},
+    {"pergunta": "Quais são os melhores filmes de drama?",
+     "contexto_adicional": "Prefiro filmes que me façam refletir sobre a vida", "top_k": 3},
+    {"pergunta": "Filmes de comédia para assistir com a família", "contexto_adicional": "", "top_k": 3},
+    {"pergunta": "Me mostre os filmes com as melhores avaliações no IMDB",
+     "contexto_adicional": "Quero assistir apenas os melhores filmes de todos os tempos", "top_k": 5},
+)
+
+# Peso padrão de cada tipo de requisição na mistura
+MIX_PADRAO = {"fase_2": 6, "stream": 2, "lote": 1, "perguntar": 1}
+
+# Endpoint e corpo de cada tipo de requisição
+ROTAS = {
+    "fase_2": "/fase_2",
+    "stream": "/fase_2/stream",
+    "lote": "/fase_2/lote",
+    "perguntar": "/perguntar",
+}
+
+
+def montar_corpo(tipo, aleatorio, perguntas_por_lote):
+    """Monta o JSON da requisição a partir dos casos de teste."""
+    caso = aleatorio.choice(CASOS_TESTE)
+    if tipo == "lote":
+        return {"perguntas": [dict(aleatorio.choice(CASOS_TESTE)) for _ in range(perguntas_por_lote)], "top_k": 3}
+    if tipo == "perguntar":
+        return {"prompt": caso["pergunta"]}
+    return dict(caso)
+
+
+def enviar(sessao, url_base, tipo, corpo, timeout):
+    """
+    Envia uma requisição e mede latência total, TTFB e (no streaming) o tempo
+    até o primeiro trecho da LLM.
+
+    Retorna: Dicionário com tipo, latencia, ttfb, primeiro_trecho, status_http e erro
+    """
+    medicao = {"tipo": tipo, "latencia": None, "ttfb": None, "primeiro_trecho": None,
+               "status_http": None, "erro": None}
+    inicio = time.perf_counter()
+    try:
+        with sessao.post(url_base + ROTAS[tipo], json=corpo, timeout=timeout, stream=True) as resposta:
+            medicao["status_http"] = resposta.status_code
+            partes = []
+            for pedaco in resposta.iter_content(chunk_size=None):
+                if medicao["ttfb"] is None:
+                    medicao["ttfb"] = time.perf_counter() - inicio
+                partes.append(pedaco)
+                if tipo == "stream" and medicao["primeiro_trecho"] is None and b"event: trecho" in pedaco:
+                    medicao["primeiro_trecho"] = time.perf_counter() - inicio
+            medicao["latencia"] = time.perf_counter() - inicio
+            corpo_resposta = b"".join(partes)
+
+        if resposta.status_code >= 400:
+            medicao["erro"] = f"HTTP {resposta.status_code}"
+        elif tipo == "stream":
+            if b"event: erro" in corpo_resposta:
+                medicao["erro"] = "evento de erro no streaming"
+        elif tipo in ("fase_2", "lote"):
+            dados = json.loads(corpo_resposta)
+            if dados.get("status") == "erro":
+                medicao["erro"] = dados.get("mensagem", "status erro")
+    except requests.exceptions.RequestException as erro:
+        medicao["latencia"] = time.perf_counter() - inicio
+        medicao["erro"] = type(erro).__name__
+    except ValueError as erro:
+        medicao["erro"] = f"JSON inválido: {erro}"
+    return medicao
+
+
+def executar_carga(url_base=BASE_URL, clientes=8, taxa=10.0, duracao=30.0, requisicoes=None,
+                   mix=None, perguntas_por_lote=4, timeout=120, semente=42):
+    """
+    Dispara a carga: cada requisição i é agendada para inicio + i/taxa (carga em
+    "malha aberta": a taxa não cai quando o servidor fica lento, as requisições
+    atrasadas saem assim que houver um cliente livre). Com taxa=0, cada cliente
+    envia a próxima requisição assim que a anterior termina.
+
+    Args:
+        url_base (str): URL da API
+        clientes (int): Clientes (threads) simultâneos
+        taxa (float): Requisições por segundo (0 = o mais rápido possível)
+        duracao (float): Segundos de carga (ignorado se requisicoes for informado)
+        requisicoes (int): Total de requisições (opcional)
+        mix (dict): Peso de cada tipo de requisição (fase_2, stream, lote, perguntar)
+        perguntas_por_lote (int): Perguntas em cada requisição de /fase_2/lote
+
+    Retorna: Dicionário com o relatório (ver relatorio())
+    """
+    mix = {tipo: peso for tipo, peso in (mix or MIX_PADRAO).items() if peso > 0}
+    tipos, pesos = list(mix), list(mix.values())
+    trava = threading.Lock()
+    medicoes = []
+    proxima = [0]
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+
+    def proximo_agendamento():
+        """Reserva o índice da próxima requisição; None quando a carga acabou."""
+        with trava:
+            indice = proxima[0]
+            if requisicoes is not None and indice >= requisicoes:
+                return None
+            agendado = inicio + indice / taxa if taxa > 0 else time.perf_counter()
+            if requisicoes is None and agendado >= fim:
+                return None
+            proxima[0] += 1
+            return indice, agendado
+
+    def cliente(numero):
+        aleatorio = random.Random(semente + numero)
+        with requests.Session() as sessao:
+            while True:
+                agendamento = proximo_agendamento()
+                if agendamento is None:
+                    return
+                _, agendado = agendamento
+                espera = agendado - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                tipo = aleatorio.choices(tipos, weights=pesos)[0]
+                medicao = enviar(sessao, url_base, tipo, montar_corpo(tipo, aleatorio, perguntas_por_lote), timeout)
+                medicao["atraso_agendamento"] = max(0.0, -espera)
+                with trava:
+                    medicoes.append(medicao)
+
+    threads = [threading.Thread(target=cliente, args=(numero,), daemon=True) for numero in range(clientes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return relatorio(medicoes, time.perf_counter() - inicio, {
+        "url": url_base, "clientes": clientes, "taxa_alvo": taxa, "duracao": duracao,
+        "requisicoes": requisicoes, "mix": mix, "perguntas_por_lote": perguntas_por_lote,
+    })
+
+
+def _resumo(medicoes, segundos):
+    """Vazão, erros e percentis (latência, TTFB, primeiro trecho) de um grupo de medições."""
+    erros = [medicao for medicao in medicoes if medicao["erro"]]
+    resumo = {
+        "requisicoes": len(medicoes),
+        "erros": len(erros),
+        "taxa_erros": round(len(erros) / len(medicoes), 4) if medicoes else 0.0,
+        "vazao_rps": round(len(medicoes) / segundos, 2) if segundos > 0 else 0.0,
+    }
+    for campo in ("latencia", "ttfb", "primeiro_trecho"):
+        valores = [medicao[campo] for medicao in medicoes if medicao[campo] is not None and not medicao["erro"]]
+        if valores:
+            resumo[campo] = percentis(valores)
+    # Erros mais frequentes (para diagnóstico)
+    contagem = {}
+    for medicao in erros:
+        contagem[medicao["erro"]] = contagem.get(medicao["erro"], 0) + 1
+    if contagem:
+        resumo["tipos_erro"] = dict(sorted(contagem.items(), key=lambda item: -item[1])[:5])
+    return resumo
+
+
+def relatorio(medicoes, segundos, parametros):
+    """
+    Monta o relatório da carga.
+
+    Retorna: Dicionário com parametros, segundos, total, por_endpoint e atraso_agendamento
+    (quanto as requisições saíram depois do horário agendado: > 0 indica clientes insuficientes)
+    """
+    por_tipo = {}
+    for medicao in medicoes:
+        por_tipo.setdefault(medicao["tipo"], []).append(medicao)
+    atrasos = [medicao["atraso_agendamento"] for medicao in medicoes]
+    return {
+        "parametros": parametros,
+        "segundos": round(segundos, 3),
+        "total": _resumo(medicoes, segundos),
+        "por_endpoint": {ROTAS[tipo]: _resumo(grupo, segundos) for tipo, grupo in sorted(por_tipo.items())},
+        "atraso_agendamento": percentis(atrasos) if atrasos else None,
+    }
+
+
+class _ServidorAssincrono:
+    """Serve o app_async.py com o Hypercorn num event loop em thread própria."""
+
+    def __init__(self, aplicacao, porta):
+        import asyncio
+        from hypercorn.config import Config
+        from hypercorn.asyncio import serve
+
+        configuracao = Config()
+        configuracao.bind = [f"127.0.0.1:{porta}"]
+        configuracao.accesslog = None
+        self.server_port = porta
+        self._loop = asyncio.new_event_loop()
+        self._parar = asyncio.Event()
+        pronto = threading.Event()
+
+        async def executar():
+            # O warmup (before_serving) roda antes de aceitar conexões
+            await aplicacao.startup()
+            pronto.set()
+            await serve(aplicacao, configuracao, shutdown_trigger=self._parar.wait)
+
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(executar(),), daemon=True)
+        self._thread.start()
+        pronto.wait()
+        time.sleep(0.5)  # Tempo para o Hypercorn abrir a porta
+
+    def shutdown(self):
+        self._loop.call_soon_threadsafe(self._parar.set)
+        self._thread.join(timeout=10)
+
+
+def _porta_livre():
+    import socket
+    with socket.socket() as soquete:
+        soquete.bind(("127.0.0.1", 0))
+        return soquete.getsockname()[1]
+
+
+def iniciar_servidor_local(porta=0, latencia_llm=0.5, variacao_llm=0.0, usar_cache=True, assincrono=False):
+    """
+    Sobe a API (app.py) nesta mesma máquina, num servidor com threads, trocando o
+    cliente do Gemini pela LLM falsa do benchmark_rag.py. Usa o banco e o ChromaDB
+    configurados (a Fase 1 precisa ter sido executada).
+    Com usar_cache=False o cache semântico e a coalescência são desligados: as
+    perguntas se repetem, então quase todas seriam respondidas sem chamar a LLM.
+    Com assincrono=True sobe o app_async.py (Quart + Hypercorn) no lugar do app.py.
+
+    Retorna: Tupla (url_base, servidor) — chame servidor.shutdown() ao final
+    """
+    import logging
+    from werkzeug.serving import make_server
+    import genai_api
+    from cache_respostas import cache_respostas
+    from coalescencia import coalescedor
+
+    # Uma linha de log por requisição atrapalharia a leitura do relatório
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    if not usar_cache:
+        cache_respostas.tamanho_maximo = 0
+        coalescedor.espera_maxima = 0
+
+    cliente_falso = ClienteLLMFalso(latencia=latencia_llm, variacao=variacao_llm)
+    genai_api.client = cliente_falso
+
+    if assincrono:
+        import app_async
+        servidor = _ServidorAssincrono(app_async.app, porta or _porta_livre())
+        return f"http://127.0.0.1:{servidor.server_port}", servidor
+
+    import app as aplicacao
+    servidor = make_server("127.0.0.1", porta, aplicacao.app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}", servidor
+
+
+def aguardar_pronto(url_base, timeout=300):
+    """
+    Espera /saude/pronto responder 200 (modelo e índice carregados), para o
+    aquecimento da API não entrar nas latências medidas.
+
+    Retorna: True se ficou pronta dentro do timeout
+    """
+    limite = time.perf_counter() + timeout
+    while time.perf_counter() < limite:
+        try:
+            if requests.get(f"{url_base}/saude/pronto", timeout=5).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def imprimir_relatorio(resultado):
+    """Mostra um resumo legível do relatório."""
+    print(f"\n{'='*80}")
+    print(f"📈 TESTE DE CARGA: {resultado['segundos']}s")
+    print(f"{'='*80}")
+    linhas = [("TOTAL", resultado["total"])] + list(resultado["por_endpoint"].items())
+    for nome, resumo in linhas:
+        latencia = resumo.get("latencia", {})
+        ttfb = resumo.get("ttfb", {})
+        print(f"{nome:<16} {resumo['requisicoes']:>6} req  {resumo['vazao_rps']:>8} req/s  "
+              f"erros {resumo['taxa_erros']:>7.2%}  "
+              f"lat p50/p95/p99 {latencia.get('p50_ms', '-')}/{latencia.get('p95_ms', '-')}/{latencia.get('p99_ms', '-')} ms  "
+              f"TTFB p50/p95 {ttfb.get('p50_ms', '-')}/{ttfb.get('p95_ms', '-')} ms")
+        if "primeiro_trecho" in resumo:
+            trecho = resumo["primeiro_trecho"]
+            print(f"{'':<16} primeiro trecho da LLM p50/p95/p99 "
+                  f"{trecho['p50_ms']}/{trecho['p95_ms']}/{trecho['p99_ms']} ms")
+        for erro, quantidade in resumo.get("tipos_erro", {}).items():
+            print(f"{'':<16} ❌ {quantidade}x {erro}")
+    atraso = resultado["atraso_agendamento"]
+    if atraso and atraso["p95_ms"] > 100:
+        print(f"⚠️  Requisições saindo atrasadas (p95 {atraso['p95_ms']} ms): aumente --clientes")
+
+
+def _ler_mix(texto):
+    mix = {}
+    for item in texto.split(","):
+        tipo, _, peso = item.partition("=")
+        tipo = tipo.strip()
+        if tipo not in ROTAS:
+            raise argparse.ArgumentTypeError(f"Tipo inválido: {tipo}. Use {', '.join(ROTAS)}")
+        mix[tipo] = float(peso or 1)
+    return mix
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Teste de carga da API RAG")
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--clientes", type=int, default=8, help="Clientes simultâneos")
+    parser.add_argument("--taxa", type=float, default=10.0, help="Requisições por segundo (0 = sem limite)")
+    parser.add_argument("--duracao", type=float, default=30.0, help="Duração da carga em segundos")
+    parser.add_argument("--requisicoes", type=int, help="Total de requisições (em vez da duração)")
+    parser.add_argument("--mix", type=_ler_mix, default=MIX_PADRAO,
+                        help="Pesos por tipo, ex.: fase_2=6,stream=2,lote=1,perguntar=1")
+    parser.add_argument("--perguntas-por-lote", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--servidor-local", action="store_true",
+                        help="Sobe a API neste processo com a LLM falsa (ignora --url)")
+    parser.add_argument("--latencia-llm", type=float, default=0.5, help="Latência da LLM falsa (segundos)")
+    parser.add_argument("--variacao-llm", type=float, default=0.1, help="Variação (+/-) da latência da LLM falsa")
+    parser.add_argument("--sem-cache", action="store_true",
+                        help="Com --servidor-local, desliga o cache semântico e a coalescência da API")
+    parser.add_argument("--assincrono", action="store_true",
+                        help="Com --servidor-local, sobe o app_async.py (Quart) em vez do app.py")
+    parser.add_argument("--saida", help="Arquivo JSON onde gravar o relatório")
+    opcoes = parser.parse_args(argumentos)
+
+    servidor = None
+    url_base = opcoes.url
+    if opcoes.servidor_local:
+        print("🚀 Iniciando a API local com a LLM falsa...")
+        url_base, servidor = iniciar_servidor_local(latencia_llm=opcoes.latencia_llm,
+                                                    variacao_llm=opcoes.variacao_llm,
+                                                    usar_cache=not opcoes.sem_cache,
+                                                    assincrono=opcoes.assincrono)
+
+    try:
+        if not aguardar_pronto(url_base):
+            print("⚠️  A API não ficou pronta (/saude/pronto); a carga inclui o aquecimento")
+        print(f"🔥 Carga em {url_base}: {opcoes.clientes} clientes, "
+              f"{opcoes.taxa or 'máx.'} req/s, mix {opcoes.mix}")
+        resultado = executar_carga(
+            url_base=url_base,
+            clientes=opcoes.clientes,
+            taxa=opcoes.taxa,
+            duracao=opcoes.duracao,
+            requisicoes=opcoes.requisicoes,
+            mix=opcoes.mix,
+            perguntas_por_lote=opcoes.perguntas_por_lote,
+            timeout=opcoes.timeout,
+            semente=opcoes.semente,
+        )
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+
+    imprimir_relatorio(resultado)
+    if opcoes.saida:
+        with open(opcoes.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"💾 Relatório gravado em {opcoes.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
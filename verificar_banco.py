@@ -1,28 +1,22 @@
 # Script para verificar a quantidade de registros no banco IMDB
-import sqlite3
+from acesso_dados import banco_leitura
 
 def verificar_quantidade_registros():
     """Verifica quantos registros existem no banco de dados"""
     
     try:
-        # Conectar ao banco
-        conexao = sqlite3.connect("imdb.db")
-        cursor = conexao.cursor()
-        
-        # Buscar todas as tabelas
-        tabelas = cursor.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+        # Buscar todas as tabelas (pool somente leitura; estrutura e contagens em cache)
+        tabelas = banco_leitura.listar_tabelas()
         
         print("Informacoes do Banco de Dados IMDB\n")
         print("=" * 60)
         
-        for tabela in tabelas:
-            nome_tabela = tabela[0]
-            
+        for nome_tabela in tabelas:
             # Contar registros
-            count = cursor.execute(f"SELECT COUNT(*) FROM {nome_tabela}").fetchone()[0]
+            count = banco_leitura.contar_registros(nome_tabela)
             
             # Pegar nomes das colunas
-            colunas = cursor.execute(f"PRAGMA table_info({nome_tabela})").fetchall()
+            colunas = banco_leitura.colunas_tabela(nome_tabela)
             num_colunas = len(colunas)
             
             print(f"\nTabela: {nome_tabela}")
@@ -31,10 +25,8 @@ def verificar_quantidade_registros():
             print(f"   Estimativa de tempo: ~{int(count/100 * 30)} segundos")
             
         print("\n" + "=" * 60)
-        print("\nDica: Ajuste o timeout do Insomnia para pelo menos 5 minutos")
-        print("   (Preferences -> Request -> Request timeout -> 300000ms)\n")
-        
-        conexao.close()
+        print("\nDica: A vetorizacao roda em segundo plano; acompanhe o progresso em")
+        print("   GET /fase_1/status/<id_tarefa>\n")
         
     except Exception as erro:
         print(f"Erro: {erro}")
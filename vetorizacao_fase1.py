@@ -1,124 +1,620 @@
 # Arquivo responsável pela vetorização do banco de dados IMDB
+import os
 import sqlite3
-import chromadb
-from sentence_transformers import SentenceTransformer
+import hashlib
+import json
+import logging
+import time
+from configuracao import (
+    CAMINHO_CHROMA, NOME_COLECAO, MODELO_EMBEDDINGS,
+    TAMANHO_BLOCO_VETORIZACAO, TRABALHADORES_VETORIZACAO, BACKEND_BUSCA, BACKEND_CODIFICADOR,
+    CAMINHO_INDICE_NUMPY, VIZINHOS_SIMILARES, COLUNAS_DOCUMENTO, PUBLICAR_SNAPSHOT,
+)
+from recursos import (
+    obter_modelo, abrir_colecao, parametros_hnsw, parametros_colecao,
+    SUFIXO_RECONSTRUCAO, SUFIXO_ANTIGA,
+)
+from codificacao_paralela import PoolCodificacao
+from acesso_dados import banco_leitura, citar_identificador
+from lotes_tokens import EstatisticasTokens, codificar_por_orcamento
+from metadados import montar_metadados
+from contexto import CAMPO_TRECHO, montar_trecho_contexto
+from backends_busca import BACKEND_NUMPY, BACKEND_SNAPSHOT, ler_vetores_colecao, publicar_indice_numpy
+from snapshots import publicar_snapshot
+from filmes_similares import atualizar_grafo_similares
+from metricas import importar, medir, arredondar_tempos, configurar_logs, DOCUMENTOS_VETORIZADOS, DOCUMENTOS_POR_SEGUNDO
+from busca_lexical import (
+    abrir_indice_lexical, indice_lexical_vazio, atualizar_indice_lexical,
+    remover_do_indice_lexical, limpar_indice_lexical,
+)
 
-def vetorizar_banco():
+# Modos de vetorização aceitos
+MODO_INCREMENTAL = "incremental"  # Só re-vetoriza linhas novas/alteradas (upsert)
+MODO_COMPLETO = "completo"        # Apaga a coleção e re-vetoriza tudo
+
+# Arquivo de checkpoint: guarda o progresso para retomar uma vetorização interrompida
+CAMINHO_CHECKPOINT = os.path.join(CAMINHO_CHROMA, "checkpoint_fase1.db")
+
+# Nome da fase nas métricas de duração por etapa
+FASE = "fase_1"
+
+logger = logging.getLogger(__name__)
+
+
+def descobrir_chave_primaria(nome_tabela, banco=banco_leitura):
+    """
+    Descobre a coluna de chave primária da tabela (se houver exatamente uma).
+
+    Retorna: Nome da coluna ou None
+    """
+    colunas = banco.colunas_tabela(nome_tabela)
+    # Cada linha do PRAGMA: (cid, name, type, notnull, dflt_value, pk)
+    chaves = [coluna[1] for coluna in colunas if coluna[5]]
+    return chaves[0] if len(chaves) == 1 else None
+
+
+def posicoes_documento(colunas, colunas_documento=COLUNAS_DOCUMENTO):
+    """
+    Posições (na linha) das colunas que entram no texto vetorizado, na ordem do modelo
+    de documento. Com "*", ou se nenhuma coluna do modelo existir na tabela, usa todas.
+
+    Retorna: Lista de índices
+    """
+    if "*" not in colunas_documento:
+        posicoes = [colunas.index(coluna) for coluna in colunas_documento if coluna in colunas]
+        if posicoes:
+            return posicoes
+    return list(range(len(colunas)))
+
+
+def montar_documento(linha, colunas, posicoes=None):
+    """
+    Monta o texto (documento) e os metadados de uma linha da tabela.
+
+    Args:
+        linha (tuple): Valores da linha
+        colunas (list): Nomes das colunas
+        posicoes (list): Colunas do texto (posicoes_documento); None = calcula a partir de colunas
+
+    Retorna: Tupla (texto, metadata)
+    """
+    if posicoes is None:
+        posicoes = posicoes_documento(colunas)
+    # Combina os campos escolhidos (não vazios) em um texto único
+    texto = " ".join([str(linha[posicao]) for posicao in posicoes if linha[posicao]])
+
+    # Metadados tipados (números como números) + campos usados nos filtros da Fase 2
+    metadata = montar_metadados(linha, colunas)
+    # Trecho compacto do filme, pronto para o contexto da LLM na Fase 2
+    metadata[CAMPO_TRECHO] = montar_trecho_contexto(metadata)
+    return texto, metadata
+
+
+def calcular_hash(texto, metadata, modelo=MODELO_EMBEDDINGS, codificador=BACKEND_CODIFICADOR):
+    """
+    Calcula o hash do conteúdo de uma linha (documento + metadados), junto com o
+    modelo e o codificador que geram o vetor: trocar qualquer um deles também muda
+    o hash, e todas as linhas são vetorizadas de novo (as colunas do documento,
+    COLUNAS_DOCUMENTO, já entram pelo próprio texto).
+    Se o hash não mudar, a linha não precisa ser vetorizada de novo.
+    """
+    conteudo = f"{modelo}\n{codificador}\n" + texto + json.dumps(metadata, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def gerar_id(linha, colunas, chave_primaria, hash_conteudo):
+    """
+    Gera um ID estável para o documento: usa a chave primária da linha quando
+    existir e, caso contrário, o próprio hash do conteúdo.
+    """
+    if chave_primaria is not None:
+        return f"pk_{linha[colunas.index(chave_primaria)]}"
+    return f"hash_{hash_conteudo[:32]}"
+
+
+def ler_blocos(cursor, nome_tabela, tamanho_bloco, apos_rowid=0, tempos=None):
+    """
+    Gerador que lê a tabela em blocos, sem carregar tudo na memória.
+    Lê em ordem de rowid para que a leitura possa ser retomada de um checkpoint.
+    O tempo de leitura de cada bloco é somado em tempos["leitura"].
+
+    Retorna (yield): Tuplas (ultimo_rowid_do_bloco, linhas_do_bloco)
+    """
+    tempos = {} if tempos is None else tempos
+    cursor.execute(
+        f"SELECT rowid, * FROM {citar_identificador(nome_tabela)} WHERE rowid > ? ORDER BY rowid",
+        (apos_rowid,)
+    )
+    while True:
+        with medir(tempos, "leitura", FASE):
+            linhas = cursor.fetchmany(tamanho_bloco)
+        if not linhas:
+            break
+        # A primeira coluna é o rowid (usado só para o checkpoint)
+        yield linhas[-1][0], [linha[1:] for linha in linhas]
+
+
+def abrir_checkpoint(nome_tabela, modo):
+    """
+    Abre o checkpoint da vetorização. Se existir um checkpoint de uma execução
+    interrompida para a mesma tabela e modo, ele é retomado; caso contrário,
+    um novo é criado.
+
+    Retorna: Tupla (conexao_checkpoint, progresso)
+    """
+    os.makedirs(CAMINHO_CHROMA, exist_ok=True)
+    conexao = sqlite3.connect(CAMINHO_CHECKPOINT)
+    conexao.execute("CREATE TABLE IF NOT EXISTS progresso (chave TEXT PRIMARY KEY, valor TEXT)")
+    # IDs já vistos nesta execução (em disco, para não crescer a memória)
+    conexao.execute("CREATE TABLE IF NOT EXISTS ids_vistos (id TEXT PRIMARY KEY)")
+
+    linha = conexao.execute("SELECT valor FROM progresso WHERE chave = 'estado'").fetchone()
+    progresso = json.loads(linha[0]) if linha else None
+
+    if not progresso or progresso.get("tabela") != nome_tabela or progresso.get("modo") != modo:
+        conexao.execute("DELETE FROM progresso")
+        conexao.execute("DELETE FROM ids_vistos")
+        progresso = {
+            "tabela": nome_tabela,
+            "modo": modo,
+            "ultimo_rowid": 0,
+            "linhas_lidas": 0,
+            "documentos_novos": 0,
+            "documentos_alterados": 0,
+        }
+        salvar_checkpoint(conexao, progresso)
+        progresso["retomado"] = False
+    else:
+        progresso["retomado"] = True
+    return conexao, progresso
+
+
+def salvar_checkpoint(conexao, progresso):
+    """Grava o progresso atual no checkpoint (junto com os IDs vistos pendentes)."""
+    estado = {chave: valor for chave, valor in progresso.items() if chave != "retomado"}
+    conexao.execute(
+        "INSERT OR REPLACE INTO progresso (chave, valor) VALUES ('estado', ?)",
+        (json.dumps(estado),)
+    )
+    conexao.commit()
+
+
+def remover_checkpoint(conexao):
+    """Apaga o checkpoint ao final de uma vetorização bem-sucedida."""
+    conexao.close()
+    if os.path.exists(CAMINHO_CHECKPOINT):
+        os.remove(CAMINHO_CHECKPOINT)
+
+
+def vetorizar_bloco(colecao, modelo, linhas, colunas, chave_primaria, checkpoint,
+                    indice_lexical, indexar_todos=False, tempos=None, estatisticas_tokens=None):
+    """
+    Vetoriza um bloco de linhas: monta os documentos, descarta as linhas
+    inalteradas (mesmo hash já armazenado) e faz upsert do restante.
+    O índice lexical (FTS5) recebe as mesmas linhas; com indexar_todos=True,
+    recebe também as inalteradas (para popular um índice novo).
+    A duração de cada etapa é somada em tempos (segundos por etapa) e as contagens
+    de tokens, em estatisticas_tokens (EstatisticasTokens).
+
+    Retorna: Tupla (novos, alterados)
+    """
+    tempos = {} if tempos is None else tempos
+    with medir(tempos, "montar_documentos", FASE):
+        documentos, metadados, ids = _montar_documentos_bloco(linhas, colunas, chave_primaria, checkpoint)
+
+    if not ids:
+        return 0, 0
+
+    if indexar_todos:
+        with medir(tempos, "indice_lexical", FASE):
+            atualizar_indice_lexical(indice_lexical, ids, documentos, metadados)
+            indice_lexical.commit()
+
+    # Hashes já armazenados para os IDs deste bloco (id -> hash_conteudo)
+    with medir(tempos, "comparar_hashes", FASE):
+        existentes = colecao.get(ids=ids, include=["metadatas"])
+    hashes_existentes = {
+        id_doc: (metadata or {}).get("hash_conteudo")
+        for id_doc, metadata in zip(existentes["ids"], existentes["metadatas"])
+    }
+
+    # Mantém só as linhas novas ou alteradas
+    selecionados = [
+        i for i, id_doc in enumerate(ids)
+        if hashes_existentes.get(id_doc) != metadados[i]["hash_conteudo"]
+    ]
+    if not selecionados:
+        return 0, 0
+
+    documentos = [documentos[i] for i in selecionados]
+    metadados = [metadados[i] for i in selecionados]
+    ids = [ids[i] for i in selecionados]
+
+    # Lotes por orçamento de tokens (textos de tamanho parecido juntos); os vetores
+    # voltam na ordem dos documentos
+    with medir(tempos, "vetorizacao", FASE):
+        embeddings, tokens = codificar_por_orcamento(modelo, documentos, estatisticas=estatisticas_tokens)
+        embeddings = embeddings.tolist()
+    # Depois do hash (que continua dependendo só do conteúdo da linha)
+    for metadata, tokens_documento in zip(metadados, tokens):
+        metadata["tokens_documento"] = int(tokens_documento)
+
+    # O índice lexical é gravado antes do ChromaDB: se a execução for interrompida
+    # entre os dois, as linhas continuam "alteradas" e são refeitas na retomada
+    if not indexar_todos:
+        with medir(tempos, "indice_lexical", FASE):
+            atualizar_indice_lexical(indice_lexical, ids, documentos, metadados)
+            indice_lexical.commit()
+
+    # Upsert: insere os novos e substitui os alterados, sem apagar a coleção
+    # (a Fase 2 continua respondendo enquanto isso)
+    with medir(tempos, "gravacao", FASE):
+        colecao.upsert(
+            embeddings=embeddings,
+            documents=documentos,
+            metadatas=metadados,
+            ids=ids
+        )
+    DOCUMENTOS_VETORIZADOS.inc(len(ids))
+
+    novos = sum(1 for id_doc in ids if id_doc not in hashes_existentes)
+    return novos, len(ids) - novos
+
+
+def _montar_documentos_bloco(linhas, colunas, chave_primaria, checkpoint):
+    """
+    Monta documentos, metadados e IDs das linhas do bloco, ignorando as linhas
+    duplicadas (ID já visto nesta execução).
+
+    Retorna: Tupla (documentos, metadados, ids)
+    """
+    documentos = []
+    metadados = []
+    ids = []
+    posicoes = posicoes_documento(colunas)
+
+    for linha in linhas:
+        texto, metadata = montar_documento(linha, colunas, posicoes)
+        hash_conteudo = calcular_hash(texto, metadata)
+        id_doc = gerar_id(linha, colunas, chave_primaria, hash_conteudo)
+
+        # Registra o ID como visto; se já existia, a linha é duplicada
+        cursor_checkpoint = checkpoint.execute(
+            "INSERT OR IGNORE INTO ids_vistos (id) VALUES (?)", (id_doc,)
+        )
+        if cursor_checkpoint.rowcount == 0:
+            continue
+
+        metadata["hash_conteudo"] = hash_conteudo
+        documentos.append(texto)
+        metadados.append(metadata)
+        ids.append(id_doc)
+    return documentos, metadados, ids
+
+
+def remover_ausentes(colecao, checkpoint, tamanho_bloco, indice_lexical):
+    """
+    Remove da coleção os documentos cujas linhas não existem mais na tabela
+    (IDs que não foram vistos nesta execução). Percorre a coleção em blocos.
+
+    Retorna: Quantidade de documentos removidos
+    """
+    ids_removidos = []
+    deslocamento = 0
+    while True:
+        pagina = colecao.get(include=[], limit=tamanho_bloco, offset=deslocamento)
+        if not pagina["ids"]:
+            break
+        marcadores = ",".join("?" * len(pagina["ids"]))
+        vistos = {
+            linha[0] for linha in checkpoint.execute(
+                f"SELECT id FROM ids_vistos WHERE id IN ({marcadores})", pagina["ids"]
+            )
+        }
+        ids_removidos.extend(id_doc for id_doc in pagina["ids"] if id_doc not in vistos)
+        deslocamento += len(pagina["ids"])
+
+    for inicio in range(0, len(ids_removidos), tamanho_bloco):
+        colecao.delete(ids=ids_removidos[inicio:inicio + tamanho_bloco])
+    remover_do_indice_lexical(indice_lexical, ids_removidos)
+    indice_lexical.commit()
+    return len(ids_removidos)
+
+
+def reconstruir_indice_hnsw(cliente_chroma, colecao, tamanho_bloco):
+    """
+    Recria a coleção com os parâmetros HNSW configurados, copiando os vetores,
+    documentos e metadados já gravados (nada é vetorizado de novo). A cópia é
+    montada com outro nome e só então substitui a coleção antiga: a antiga é
+    renomeada para o lado, a cópia assume o nome e só depois a antiga é apagada
+    (em nenhum momento as duas deixam de existir; abrir_colecao recupera uma
+    troca interrompida).
+
+    Retorna: A coleção nova
+    """
+    nome_temporario = f"{NOME_COLECAO}{SUFIXO_RECONSTRUCAO}"
+    nome_antiga = f"{NOME_COLECAO}{SUFIXO_ANTIGA}"
+    # Sobras de uma reconstrução interrompida (a coleção em uso já foi aberta por abrir_colecao)
+    for sobra in (nome_temporario, nome_antiga):
+        try:
+            cliente_chroma.delete_collection(name=sobra)
+        except ValueError:
+            pass
+    nova = cliente_chroma.create_collection(name=nome_temporario, metadata=parametros_hnsw())
+
+    for deslocamento in range(0, colecao.count(), tamanho_bloco):
+        pagina = colecao.get(
+            include=["embeddings", "documents", "metadatas"], limit=tamanho_bloco, offset=deslocamento
+        )
+        nova.add(ids=pagina["ids"], embeddings=pagina["embeddings"],
+                 documents=pagina["documents"], metadatas=pagina["metadatas"])
+
+    colecao.modify(name=nome_antiga)
+    nova.modify(name=NOME_COLECAO)
+    cliente_chroma.delete_collection(name=nome_antiga)
+    return nova
+
+
+def vetorizar_banco(modo=MODO_INCREMENTAL, tamanho_bloco=TAMANHO_BLOCO_VETORIZACAO,
+                    trabalhadores=TRABALHADORES_VETORIZACAO, ao_progresso=None):
     """
     Função que realiza a vetorização dos dados do banco IMDB.
-    
+
     Passos:
     1. Conecta ao banco SQLite (imdb.db)
-    2. Busca os dados da tabela
-    3. Transforma os textos em vetores usando SentenceTransformer
-    4. Armazena os vetores no ChromaDB
-    
-    Retorna: Mensagem de sucesso ou erro
+    2. Lê a tabela em blocos (a memória não cresce com o tamanho da tabela)
+    3. Em cada bloco, compara as linhas com o que já está no ChromaDB (hash do conteúdo)
+    4. Transforma em vetores apenas as linhas novas ou alteradas e faz upsert
+    5. Grava um checkpoint após cada bloco (uma execução interrompida é retomada)
+    6. Remove as linhas que saíram da tabela
+    7. Exporta os vetores para o índice NumPy (quando BACKEND_BUSCA = "numpy")
+    8. Atualiza o grafo de filmes similares (quando VIZINHOS_SIMILARES > 0)
+    9. Publica um snapshot versionado do índice (quando BACKEND_BUSCA = "snapshot"
+       ou PUBLICAR_SNAPSHOT = "1")
+    Em paralelo, mantém o índice lexical (SQLite FTS5) usado pela busca híbrida.
+
+    Args:
+        modo (str): "incremental" (padrão) ou "completo" (apaga e recria a coleção)
+        tamanho_bloco (int): Quantidade de linhas lidas, vetorizadas e gravadas por vez
+        trabalhadores (int): Processos de vetorização em paralelo (0 = desativado,
+            usa o modelo compartilhado no próprio processo)
+        ao_progresso (callable): Função opcional chamada após cada bloco com um
+            dicionário de progresso (usada pelas tarefas em segundo plano)
+
+    Retorna: Mensagem de sucesso ou erro (com "timings": segundos por etapa)
     """
-    
+
+    if modo not in (MODO_INCREMENTAL, MODO_COMPLETO):
+        return {
+            "status": "erro",
+            "mensagem": f"Modo inválido: {modo}. Use '{MODO_INCREMENTAL}' ou '{MODO_COMPLETO}'."
+        }
+    if not isinstance(tamanho_bloco, int) or isinstance(tamanho_bloco, bool) or tamanho_bloco < 1:
+        # Com bloco < 1 o fetchmany e a paginação da remoção nunca avançariam
+        return {
+            "status": "erro",
+            "mensagem": f"Tamanho de bloco inválido: {tamanho_bloco!r}. Use um inteiro maior que zero."
+        }
+
+    inicio = time.perf_counter()
+    tempos = {}
+    conexao = None
+    checkpoint = None
+    indice_lexical = None
     try:
-        # PASSO 1: Conectar ao banco de dados SQLite
-        print("📂 Conectando ao banco de dados...")
-        conexao = sqlite3.connect("imdb.db")
-        cursor = conexao.cursor()
-        
-        # PASSO 2: Buscar dados da tabela (ajuste o nome da tabela conforme necessário)
-        print("📊 Buscando dados da tabela...")
-        # Primeiro, vamos descobrir qual tabela existe
-        tabelas = cursor.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
-        
+        # PASSO 1: Descobrir a tabela (ajuste o nome da tabela conforme necessário)
+        # A estrutura e a contagem vêm do cache do pool enquanto o banco não mudar.
+        # Consultadas ANTES de pegar a conexão da leitura em blocos: cada consulta usa
+        # uma conexão do pool e, com CONEXOES_LEITURA_SQLITE=1, esperaria por ela
+        logger.info("📊 Buscando dados da tabela...")
+        tabelas = banco_leitura.listar_tabelas()
+
         if not tabelas:
             return {"erro": "Nenhuma tabela encontrada no banco de dados"}
-        
+
         # Pega a primeira tabela (você pode ajustar isso depois)
-        nome_tabela = tabelas[0][0]
-        print(f"✅ Tabela encontrada: {nome_tabela}")
-        
-        # Busca todos os dados da tabela
-        dados = cursor.execute(f"SELECT * FROM {nome_tabela}").fetchall()
-        
-        # Pega os nomes das colunas
-        colunas = [descricao[0] for descricao in cursor.description]
-        print(f"📋 Colunas: {colunas}")
-        print(f"📈 Total de registros a vetorizar: {len(dados)}")
-        
-        # PASSO 3: Preparar o modelo de vetorização
-        print("🤖 Carregando modelo de vetorização...")
-        modelo = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # PASSO 4: Conectar ao ChromaDB com persistência em arquivo
-        print("💾 Conectando ao ChromaDB (modo persistente)...")
-        cliente_chroma = chromadb.PersistentClient(path="./chroma_db")
-        
-        # Criar ou obter a coleção (onde os vetores serão armazenados)
-        colecao = cliente_chroma.get_or_create_collection(name="imdb_vetores")
-        
-        # Verificar se já existem vetores na coleção
-        count_existente = colecao.count()
-        if count_existente > 0:
-            print(f"⚠️  Atenção: Já existem {count_existente} vetores na coleção.")
-            print("   Deletando vetores antigos para re-vetorizar...")
-            cliente_chroma.delete_collection(name="imdb_vetores")
-            colecao = cliente_chroma.get_or_create_collection(name="imdb_vetores")
-            print("✅ Coleção limpa e pronta para nova vetorização!")
-        
-        # PASSO 5: Vetorizar e armazenar os dados
-        print("⚙️ Iniciando vetorização...")
-        documentos = []
-        metadados = []
-        ids = []
-        
-        for indice, linha in enumerate(dados):
-            # Combina todos os campos da linha em um texto único
-            texto = " ".join([str(campo) for campo in linha if campo])
-            documentos.append(texto)
-            
-            # Cria metadados com informações da linha
-            metadata = {}
-            for i, coluna in enumerate(colunas):
-                if i < len(linha):
-                    metadata[coluna] = str(linha[i])
-            metadados.append(metadata)
-            
-            # Cria um ID único para cada documento
-            ids.append(f"doc_{indice}")
-        
-        # Adiciona os documentos à coleção do ChromaDB
-        # O ChromaDB automaticamente vetoriza usando o modelo padrão
-        # Mas vamos usar nosso modelo SentenceTransformer
-        embeddings = modelo.encode(documentos).tolist()
-        
-        colecao.add(
-            embeddings=embeddings,
-            documents=documentos,
-            metadatas=metadados,
-            ids=ids
-        )
-        
-        # PASSO 6: Fechar conexão com o banco
-        conexao.close()
-        
-        print("✅ Vetorização concluída com sucesso!")
-        
+        nome_tabela = tabelas[0]
+        logger.info(f"✅ Tabela encontrada: {nome_tabela}")
+
+        chave_primaria = descobrir_chave_primaria(nome_tabela)
+        logger.info(f"🔑 Chave primária: {chave_primaria or 'nenhuma (IDs pelo conteúdo)'}")
+
+        # Pega os nomes das colunas (sem ler os dados)
+        colunas = [coluna[1] for coluna in banco_leitura.colunas_tabela(nome_tabela)]
+        total_registros = banco_leitura.contar_registros(nome_tabela)
+        logger.info(f"📋 Colunas: {colunas}")
+        logger.info(f"📈 Total de registros na tabela: {total_registros}")
+
+        # PASSO 2: Conectar ao banco de dados SQLite (conexão somente leitura do pool)
+        logger.info("📂 Conectando ao banco de dados...")
+        with medir(tempos, "conectar", FASE):
+            conexao = banco_leitura.adquirir()
+        cursor = conexao.cursor()
+
+        # PASSO 3: Conectar ao ChromaDB com persistência em arquivo
+        logger.info("💾 Conectando ao ChromaDB (modo persistente)...")
+        with medir(tempos, "conectar", FASE):
+            cliente_chroma = importar("chromadb").PersistentClient(path=CAMINHO_CHROMA)
+
+            # Criar ou obter a coleção (onde os vetores serão armazenados)
+            colecao = abrir_colecao(cliente_chroma)
+
+            # Índice lexical (FTS5) usado pela busca híbrida da Fase 2
+            indice_lexical = abrir_indice_lexical()
+
+        checkpoint, progresso = abrir_checkpoint(nome_tabela, modo)
+        if progresso["retomado"]:
+            logger.info(f"⏯️  Retomando vetorização interrompida após {progresso['linhas_lidas']} linhas...")
+        elif modo == MODO_COMPLETO and colecao.count() > 0:
+            logger.info(f"⚠️  Modo completo: deletando {colecao.count()} vetores antigos...")
+            cliente_chroma.delete_collection(name=NOME_COLECAO)
+            colecao = abrir_colecao(cliente_chroma)
+            limpar_indice_lexical(indice_lexical)
+            logger.info("✅ Coleção limpa e pronta para nova vetorização!")
+
+        # Parâmetros HNSW alterados na configuração: o índice é recriado com os vetores já gravados
+        reconstruido = False
+        if parametros_colecao(colecao) != parametros_hnsw():
+            logger.info(f"🔧 Parâmetros HNSW mudaram ({parametros_colecao(colecao)} -> {parametros_hnsw()}): "
+                        f"recriando o índice com os {colecao.count()} vetores existentes...")
+            with medir(tempos, "reconstruir_hnsw", FASE):
+                colecao = reconstruir_indice_hnsw(cliente_chroma, colecao, max(tamanho_bloco, 1000))
+            reconstruido = True
+
+        # Índice lexical ainda vazio (primeira execução com ele): indexa todas as
+        # linhas, mesmo as que não precisam ser vetorizadas de novo
+        indexar_todos = progresso.get("indexar_todos_lexico", indice_lexical_vazio(indice_lexical))
+        progresso["indexar_todos_lexico"] = indexar_todos
+
+        if trabalhadores > 0:
+            # Modo paralelo: cada bloco é dividido entre os processos trabalhadores.
+            # Blocos pequenos demais deixariam processos ociosos.
+            tamanho_bloco = max(tamanho_bloco, trabalhadores * 64)
+            modelo = PoolCodificacao(trabalhadores)
+        else:
+            # (o modelo é compartilhado com a Fase 2 e só é carregado uma vez)
+            modelo = obter_modelo()
+
+        def informar_progresso():
+            if ao_progresso is not None:
+                vetorizados = progresso["documentos_novos"] + progresso["documentos_alterados"]
+                ao_progresso({
+                    "total_registros": total_registros,
+                    "linhas_iniciais": linhas_iniciais,
+                    "linhas_lidas": progresso["linhas_lidas"],
+                    "documentos_vetorizados": vetorizados,
+                    "documentos_gravados": vetorizados,
+                })
+
+        # PASSO 4: Pipeline em blocos: ler -> vetorizar -> gravar -> checkpoint
+        logger.info(f"⚙️ Iniciando vetorização em blocos de {tamanho_bloco} linhas...")
+        linhas_iniciais = progresso["linhas_lidas"]
+        informar_progresso()
+        desempenho_trabalhadores = None
+        estatisticas_tokens = EstatisticasTokens()
+        try:
+            blocos = ler_blocos(cursor, nome_tabela, tamanho_bloco, progresso["ultimo_rowid"], tempos)
+            for ultimo_rowid, linhas in blocos:
+                novos, alterados = vetorizar_bloco(
+                    colecao, modelo, linhas, colunas, chave_primaria, checkpoint,
+                    indice_lexical, indexar_todos, tempos, estatisticas_tokens
+                )
+
+                progresso["ultimo_rowid"] = ultimo_rowid
+                progresso["linhas_lidas"] += len(linhas)
+                progresso["documentos_novos"] += novos
+                progresso["documentos_alterados"] += alterados
+                salvar_checkpoint(checkpoint, progresso)
+                informar_progresso()
+                logger.info(f"   📦 {progresso['linhas_lidas']}/{total_registros} linhas processadas")
+        finally:
+            # Os processos trabalhadores são encerrados mesmo se houver erro
+            if trabalhadores > 0:
+                desempenho_trabalhadores = modelo.estatisticas()
+                modelo.fechar()
+
+        for desempenho in desempenho_trabalhadores or []:
+            logger.info(f"   🧵 Processo {desempenho['pid']}: {desempenho['documentos']} documentos "
+                        f"({desempenho['documentos_por_segundo']} docs/s)")
+
+        tokens = estatisticas_tokens.resumo()
+        if tokens.get("documentos_truncados"):
+            logger.info(f"✂️  {tokens['documentos_truncados']} documentos ({tokens['percentual_truncados']}%) "
+                        f"passam de {tokens['limite_tokens']} tokens e foram truncados "
+                        f"({tokens['tokens_descartados']} tokens descartados)")
+
+        # PASSO 5: Remover da coleção as linhas que não existem mais na tabela
+        with medir(tempos, "remover_ausentes", FASE):
+            removidos = remover_ausentes(colecao, checkpoint, tamanho_bloco, indice_lexical)
+        total_vistos = checkpoint.execute("SELECT COUNT(*) FROM ids_vistos").fetchone()[0]
+        novos = progresso["documentos_novos"]
+        alterados = progresso["documentos_alterados"]
+        logger.info(f"🆕 Novos: {novos} | ✏️  Alterados: {alterados} | 🗑️  Removidos: {removidos}")
+
+        # PASSO 6: Exportar os vetores para o backend NumPy da Fase 2, atualizar o
+        # grafo de similares e publicar o snapshot (se configurados); os vetores são
+        # lidos da coleção uma vez só
+        indice_numpy = None
+        grafo_similares = None
+        snapshot = None
+        publicar = BACKEND_BUSCA == BACKEND_SNAPSHOT or PUBLICAR_SNAPSHOT
+        if BACKEND_BUSCA == BACKEND_NUMPY or VIZINHOS_SIMILARES > 0 or publicar:
+            with medir(tempos, "ler_vetores", FASE):
+                ids_colecao, documentos_colecao, metadados_colecao, vetores_colecao = ler_vetores_colecao(colecao)
+        if BACKEND_BUSCA == BACKEND_NUMPY:
+            logger.info("📤 Exportando vetores para o índice NumPy da Fase 2...")
+            with medir(tempos, "exportar_numpy", FASE):
+                indice_numpy = publicar_indice_numpy(
+                    CAMINHO_INDICE_NUMPY, ids_colecao, documentos_colecao, metadados_colecao, vetores_colecao
+                )
+        if VIZINHOS_SIMILARES > 0:
+            logger.info(f"🕸️  Atualizando o grafo de filmes similares ({VIZINHOS_SIMILARES} por filme)...")
+            with medir(tempos, "grafo_similares", FASE):
+                grafo_similares = atualizar_grafo_similares(
+                    ids_colecao, metadados_colecao, vetores_colecao, completo=modo == MODO_COMPLETO
+                )
+        if publicar:
+            logger.info("📦 Publicando snapshot do índice...")
+            with medir(tempos, "snapshot", FASE):
+                snapshot = publicar_snapshot(ids_colecao, documentos_colecao, metadados_colecao, vetores_colecao)
+
+        # PASSO 7: Fechar conexões e apagar o checkpoint (execução concluída)
+        # (a conexão do banco de origem volta para o pool no finally)
+        remover_checkpoint(checkpoint)
+        indice_lexical.close()
+
+        tempos["total"] = time.perf_counter() - inicio
+        if tempos.get("vetorizacao"):
+            DOCUMENTOS_POR_SEGUNDO.definir(round((novos + alterados) / tempos["vetorizacao"], 2))
+        logger.info("✅ Vetorização concluída com sucesso!")
+
         return {
             "status": "sucesso",
             "mensagem": "Vetorização concluída com sucesso!",
+            "modo": modo,
+            "retomado": progresso["retomado"],
             "tabela_vetorizada": nome_tabela,
-            "total_documentos": len(dados),
+            "total_documentos": total_registros,
+            "documentos_novos": novos,
+            "documentos_alterados": alterados,
+            "documentos_removidos": removidos,
+            "documentos_inalterados": total_vistos - novos - alterados,
             "colunas": colunas,
-            "modelo_usado": "all-MiniLM-L6-v2"
+            "colunas_documento": [colunas[posicao] for posicao in posicoes_documento(colunas)],
+            "tokens": tokens,
+            "modelo_usado": MODELO_EMBEDDINGS,
+            "codificador": BACKEND_CODIFICADOR,
+            "trabalhadores": trabalhadores,
+            "desempenho_trabalhadores": desempenho_trabalhadores,
+            "indice_hnsw": {"parametros": parametros_colecao(colecao), "reconstruido": reconstruido},
+            "indice_numpy": indice_numpy,
+            "grafo_similares": grafo_similares,
+            "snapshot": snapshot,
+            "timings": arredondar_tempos(tempos)
         }
-        
+
     except Exception as erro:
-        print(f"❌ Erro durante a vetorização: {erro}")
+        logger.exception(f"❌ Erro durante a vetorização: {erro}")
         return {
             "status": "erro",
             "mensagem": f"Erro durante a vetorização: {str(erro)}"
         }
+    finally:
+        if conexao is not None:
+            # Fecha o cursor da leitura (uma consulta pela metade seguraria a transação de leitura)
+            cursor.close()
+            banco_leitura.devolver(conexao)
+        # Numa falha, o checkpoint e o índice lexical também são fechados (fechar de novo
+        # após o sucesso não faz nada); o arquivo do checkpoint fica para a retomada
+        if checkpoint is not None:
+            checkpoint.close()
+        if indice_lexical is not None:
+            indice_lexical.close()
 
 
 # Teste local (apenas para desenvolvimento)
 if __name__ == "__main__":
+    configurar_logs()
     resultado = vetorizar_banco()
     print("\n📊 Resultado:")
     print(resultado)